@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
@@ -11,12 +11,72 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./urbix.db")
 is_sqlite = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
 connect_args = {"check_same_thread": False} if is_sqlite else {}
 
+# Threads do pool do FastAPI para rotas síncronas; o pool de leitura acompanha esse tamanho
+# para que nenhuma requisição fique esperando conexão enquanto há thread livre.
+THREADS_API = int(os.getenv("URBIX_THREADS_API", "40"))
+TAMANHO_POOL_LEITURA = int(os.getenv("URBIX_POOL_LEITURA", str(THREADS_API)))
+
+# PRAGMAs por conexão no SQLite (valem só para a conexão em que são executados).
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("URBIX_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_MB = int(os.getenv("URBIX_SQLITE_MMAP_MB", "256"))
+SQLITE_CACHE_KB = int(os.getenv("URBIX_SQLITE_CACHE_KB", "16384"))
+
+# Engine de escrita: ETL, ferramentas, inicialização e rotas que gravam dados.
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
     connect_args=connect_args
 )
+# Engine de leitura: rotas de consulta/ranking, conexões somente leitura.
+engine_leitura = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args=connect_args,
+    pool_size=TAMANHO_POOL_LEITURA,
+    max_overflow=0,
+    pool_pre_ping=not is_sqlite,
+)
+
+
+def _executar_pragmas(conexao_dbapi, pragmas) -> None:
+    cursor = conexao_dbapi.cursor()
+    try:
+        for pragma in pragmas:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+@event.listens_for(engine, "connect")
+def _configurar_conexao_escrita(conexao_dbapi, registro):
+    if not is_sqlite:
+        return
+    _executar_pragmas(conexao_dbapi, [
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+    ])
+
+
+@event.listens_for(engine_leitura, "connect")
+def _configurar_conexao_leitura(conexao_dbapi, registro):
+    # Marcador consultado por quem precisaria escrever (ex.: tabela temporária de seleção).
+    registro.info["somente_leitura"] = True
+    if not is_sqlite:
+        _executar_pragmas(conexao_dbapi, ["SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY"])
+        # SET é transacional no PostgreSQL: confirma antes que o pool faça rollback.
+        conexao_dbapi.commit()
+        return
+    _executar_pragmas(conexao_dbapi, [
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_KB}",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA query_only=ON",
+    ])
+
+
 # Cria a fábrica de sessões do banco de dados
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLeitura = sessionmaker(autocommit=False, autoflush=False, bind=engine_leitura)
 
 # A classe Base que o models.py estava sentindo falta!
 Base = declarative_base()
@@ -33,29 +93,27 @@ def ensure_sqlite_optimizations(create_indexes: bool = False) -> None:
 
     try:
         with engine.begin() as conn:
-            # Melhor concorrência/leitura para API (especialmente com ETL pesado).
+            # WAL é persistente no arquivo: leitores não bloqueiam o ETL e vice-versa.
+            # Os demais PRAGMAs valem por conexão e são aplicados nos eventos "connect".
             conn.execute(text("PRAGMA journal_mode=WAL"))
-            conn.execute(text("PRAGMA synchronous=NORMAL"))
-            conn.execute(text("PRAGMA temp_store=MEMORY"))
 
             if not create_indexes:
                 return
 
-            # Índice composto para seleção do registro mais recente por cidade+indicador.
-            conn.execute(text(
-                """
-                CREATE INDEX IF NOT EXISTS ix_vi_cidade_indicador_ano_id
-                ON valores_indicadores (codigo_ibge, id_indicador, ano_referencia DESC, id DESC)
-                """
-            ))
+            # No armazenamento codificado valores_indicadores é uma VIEW; o fato tem índices próprios.
+            tipo_valores = conn.execute(text(
+                "SELECT type FROM sqlite_master WHERE name = 'valores_indicadores'"
+            )).scalar()
+            if tipo_valores != "view":
+                # Índice composto para seleção do registro mais recente por cidade+indicador.
+                conn.execute(text(
+                    """
+                    CREATE INDEX IF NOT EXISTS ix_vi_cidade_indicador_ano_id
+                    ON valores_indicadores (codigo_ibge, id_indicador, ano_referencia DESC, id DESC)
+                    """
+                ))
 
-            # Índices auxiliares para busca de cidades e junções de ranking.
-            conn.execute(text(
-                """
-                CREATE INDEX IF NOT EXISTS ix_vi_cidade_indicador
-                ON valores_indicadores (codigo_ibge, id_indicador)
-                """
-            ))
+            # Índices auxiliares para busca de cidades.
             conn.execute(text(
                 """
                 CREATE INDEX IF NOT EXISTS ix_municipios_nome
@@ -72,10 +130,33 @@ def ensure_sqlite_optimizations(create_indexes: bool = False) -> None:
         # Em contexto sem tabelas (ex.: bootstrap inicial), segue normalmente.
         return
 
+    _criar_busca_municipios()
+
+
+def _criar_busca_municipios() -> None:
+    """Cria (e sincroniza com `municipios`) o índice FTS5 da busca de municípios."""
+    from app.services.busca_municipios import garantir_busca_municipios
+
+    try:
+        with engine.begin() as conn:
+            garantir_busca_municipios(conn)
+    except OperationalError:
+        # Sem a tabela municipios (bootstrap inicial): a busca usa o índice em memória.
+        return
+
 # Dependência para injetar o banco de dados nas rotas do FastAPI
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependência das rotas que só consultam: conexão do pool de leitura (somente leitura).
+def get_db_leitura():
+    db = SessionLeitura()
+    try:
+        yield db
+    finally:
+        db.close()
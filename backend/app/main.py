@@ -1,7 +1,13 @@
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import topsis, indicadores # <-- 1. ADICIONEI O INDICADORES AQUI
-from app.database import Base, engine, ensure_sqlite_optimizations
+from app.database import THREADS_API, Base, SessionLocal, engine, ensure_sqlite_optimizations
+from app.services.plano_indicadores import obter_plano
+from app.services.matriz_residente import recarregar_matriz_residente
+from app.services.indice_cidades import recarregar_indice_cidades
+from app.services.carga_valores import garantir_indice_unico
+from app.services.snapshot_latest import instalar_manutencao_snapshot, reconstruir_snapshot_latest
 
 app = FastAPI(
     title="Urbix API - Offline Engine",
@@ -23,11 +29,33 @@ app.include_router(topsis.router)
 app.include_router(indicadores.router) # <-- 2. TIREI O COMENTÁRIO DESTA LINHA
 
 
+@app.on_event("startup")
+async def ajustar_threads_api():
+    """Rotas síncronas rodam no pool de threads do AnyIO; o pool de leitura do banco tem o mesmo tamanho."""
+    to_thread.current_default_thread_limiter().total_tokens = THREADS_API
+
+
 @app.on_event("startup")
 def startup_database_tuning():
     """Garante tabelas e otimizações de banco antes de atender requisições."""
     Base.metadata.create_all(bind=engine)
     ensure_sqlite_optimizations(create_indexes=True)
+    # Compila uma única vez o plano de indicadores usado na montagem da matriz.
+    obter_plano()
+
+    # Carrega a matriz residente de valores mais recentes (ranking sem SQL por requisição).
+    db = SessionLocal()
+    try:
+        # Chave única (cidade, indicador, ano): bases antigas são deduplicadas uma única vez.
+        garantir_indice_unico(db)
+        # Triggers mantêm valores_indicadores_latest a cada escrita; na primeira instalação sincroniza.
+        if instalar_manutencao_snapshot(engine):
+            reconstruir_snapshot_latest(db)
+        recarregar_matriz_residente(db)
+        # Índice de busca de cidades (/topsis/cidades responde sem consultar o banco).
+        recarregar_indice_cidades(db)
+    finally:
+        db.close()
 
 @app.get("/")
 def read_root():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -29,6 +29,10 @@ class ValorIndicador(Base):
     Tabela Fato: O cruzamento entre Município, Indicador e o Valor em um determinado Ano.
     """
     __tablename__ = "valores_indicadores"
+    __table_args__ = (
+        # Chave natural: uma linha por cidade, indicador e ano (cargas fazem upsert).
+        Index("ux_valores_indicadores_chave", "codigo_ibge", "id_indicador", "ano_referencia", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     codigo_ibge = Column(String(7), ForeignKey("municipios.codigo_ibge"), index=True, nullable=False)
@@ -57,4 +61,59 @@ class ValorIndicadorLatest(Base):
     id_origem = Column(Integer, nullable=False, index=True)
 
     municipio = relationship("Municipio")
-    indicador = relationship("Indicador")
\ No newline at end of file
+    indicador = relationship("Indicador")
+
+
+class VersaoDados(Base):
+    """
+    Contador global da versão dos dados (linha única, id=1).
+    O ETL incrementa a versão ao final de cada carga; caches em memória da API
+    comparam a versão para saber quando precisam ser recarregados.
+    """
+    __tablename__ = "versao_dados"
+
+    id = Column(Integer, primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime, nullable=True)
+
+
+class RankingTopsis(Base):
+    """
+    Ranking TOPSIS materializado por versão dos dados, com os pesos padrão da tabela Indicador.
+    Escopo "BR" é o ranking nacional; siglas de UF (ex: "PR") são os rankings estaduais.
+    """
+    __tablename__ = "rankings_topsis"
+    __table_args__ = (
+        Index("ix_rankings_topsis_escopo_posicao", "escopo", "posicao"),
+    )
+
+    escopo = Column(String(2), primary_key=True)
+    codigo_ibge = Column(String(7), ForeignKey("municipios.codigo_ibge"), primary_key=True, index=True)
+    posicao = Column(Integer, nullable=False)
+    pontuacao = Column(Float, nullable=False)
+    distancia_positiva = Column(Float, nullable=False)
+    distancia_negativa = Column(Float, nullable=False)
+    versao = Column(Integer, nullable=False)
+
+
+class LayoutVetores(Base):
+    """
+    Ordem fixa das variáveis dentro de `vetores_municipios.valores` (posição -> id do indicador),
+    gravada junto com os vetores e marcada com a versão dos dados que os originou.
+    """
+    __tablename__ = "vetores_layout"
+
+    posicao = Column(Integer, primary_key=True)
+    id_indicador = Column(String, nullable=False)
+    versao = Column(Integer, nullable=False)
+
+
+class VetorMunicipio(Base):
+    """
+    Valor mais recente de todas as variáveis de um município numa única linha:
+    float64 little-endian empacotado na ordem de `vetores_layout` (NaN = sem dado).
+    """
+    __tablename__ = "vetores_municipios"
+
+    codigo_ibge = Column(String(7), primary_key=True)
+    valores = Column(LargeBinary, nullable=False)
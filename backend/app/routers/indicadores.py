@@ -1,14 +1,14 @@
 from typing import List
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db_leitura
 from app import models, schemas
 
 # Cria a rota raiz para os indicadores
 router = APIRouter(prefix="/indicadores", tags=["Indicadores"])
 
 @router.get("/", response_model=List[schemas.Indicador])
-def listar_indicadores(db: Session = Depends(get_db)):
+def listar_indicadores(db: Session = Depends(get_db_leitura)):
     """
     Retorna a lista de todos os indicadores cadastrados no banco,
     incluindo seus Pesos e Impactos, ordenados por nome.
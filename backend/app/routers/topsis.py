@@ -1,16 +1,55 @@
-import unicodedata
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 import logging
 
-from app.database import get_db
-from app.schemas import TopsisSimulationRequest, TopsisRankingResponse
+from app.database import get_db_leitura
+from app.schemas import (
+    TopsisSimulationRequest,
+    TopsisRankingResponse,
+    TopsisCenariosRequest,
+    TopsisCenariosResponse,
+    ResultadoCenario,
+    TopsisSensibilidadeRequest,
+    TopsisSensibilidadeResponse,
+    SensibilidadeCidade,
+    SessaoSimulacaoRequest,
+    SessaoDeltaRequest,
+    SessaoSimulacaoResponse,
+    SessaoDeltaResponse,
+)
 from app.services.topsis_core import (
     preparar_matriz_decisao,
+    montar_matriz_bruta,
     aplicar_topsis,
+    completar_pesos_impactos,
+    topsis_multicenario,
+    posicoes_por_pontuacao,
     _buscar_historico_por_cidade,
     _buscar_mais_recente_por_cidade,
+    _buscar_historico_colunar,
+)
+from app.services.matriz_residente import obter_matriz_residente
+from app.services.busca_municipios import FAIXAS_POPULACAO, buscar_municipios
+from app.services.cache_ranking import cache_ranking, chave_ranking, reordenar_resultados
+from app.services.sessoes_simulacao import (
+    TTL_SESSAO_S,
+    SessaoSimulacao,
+    encerrar_sessao,
+    obter_sessao,
+    registrar_sessao,
+)
+from app.services.topsis_incremental import TopsisIncremental
+from app.services.versao_dados import obter_versao_dados
+from app.services.sensibilidade_pesos import analisar_sensibilidade
+from app.services.normalizacao_global import aplicar_topsis_global, obter_normas_globais
+from app.services.plano_indicadores import obter_plano
+from app.services.selecao_cidades import filtro_cidades
+from app.services.rankings_materializados import (
+    ESCOPO_NACIONAL,
+    buscar_posicoes_cidade,
+    buscar_top_ranking,
 )
 from app.models import Municipio, Indicador, ValorIndicador
 
@@ -18,49 +57,64 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/topsis", tags=["TOPSIS"])
 
+MAX_CIDADES_HISTORICO = 50
+
 
-def _normalizar_busca(texto: str) -> str:
-    texto = unicodedata.normalize("NFKD", str(texto))
-    texto = texto.encode("ascii", "ignore").decode("ascii")
-    return texto.strip().lower()
+def _nomes_cidades(cidades_ibge: List[str], residente, db: Session) -> dict:
+    """Nome de cada cidade (da matriz residente, ou do banco quando ela não está carregada)."""
+    if residente is not None:
+        cidades_encontradas = {
+            ibge: residente.nomes[ibge] for ibge in cidades_ibge if ibge in residente.nomes
+        }
+    else:
+        cidades = db.query(Municipio).filter(filtro_cidades(db, Municipio.codigo_ibge, cidades_ibge)).all()
+        cidades_encontradas = {c.codigo_ibge: c.nome for c in cidades}
+
+    if not cidades_encontradas:
+        # Fallback de segurança se a tabela de Municípios ainda não foi populada
+        cidades_encontradas = {ibge: f"IBGE {ibge}" for ibge in cidades_ibge}
+    return cidades_encontradas
+
+
+def _metadados_indicadores(residente, db: Session) -> tuple:
+    """Pesos e impactos cadastrados na tabela Indicador."""
+    pesos = {}
+    impactos = {}
+
+    if residente is not None:
+        pesos.update(residente.pesos)
+        impactos.update(residente.impactos)
+    else:
+        for ind in db.query(Indicador).all():
+            pesos[ind.id] = ind.peso
+            impactos[ind.id] = ind.impacto
+    return pesos, impactos
 
 
 @router.get("/cidades")
-def buscar_cidades(q: str = Query(default="", description="Texto para buscar cidade pelo nome ou código IBGE"), limit: int = Query(default=10, ge=1, le=50), db: Session = Depends(get_db)):
+def buscar_cidades(
+    q: str = Query(default="", description="Texto para buscar cidade pelo nome ou código IBGE"),
+    limit: int = Query(default=10, ge=1, le=50),
+    uf: Optional[str] = Query(default=None, min_length=2, max_length=2, description="Filtra pela sigla da UF"),
+    faixa_populacao: Optional[Literal[tuple(FAIXAS_POPULACAO)]] = Query(
+        default=None, description="Filtra pela faixa de população (valor mais recente de populacao_total)"
+    ),
+    db: Session = Depends(get_db_leitura),
+):
     """Busca cidades por nome ou código IBGE, útil para montar o filtro do frontend."""
-    termo = _normalizar_busca(q)
-    query = db.query(Municipio).order_by(Municipio.nome.asc()).yield_per(1000)
-    cidades = []
-
-    for cidade in query:
-        if termo:
-            if not (
-                termo in _normalizar_busca(cidade.nome)
-                or termo in _normalizar_busca(cidade.codigo_ibge)
-                or termo in _normalizar_busca(cidade.estado)
-            ):
-                continue
-
-        cidades.append(cidade)
-        if len(cidades) >= limit:
-            break
-
-    return [{
-        "codigo_ibge": cidade.codigo_ibge,
-        "nome": cidade.nome,
-        "estado": cidade.estado,
-    } for cidade in cidades]
+    # Índice em memória (exato > prefixo > infixo > UF); FTS5 quando há filtro de população
+    return buscar_municipios(db, q, limit, uf, faixa_populacao)
 
 
 @router.get("/cidade/{codigo_ibge}/historico")
-def historico_cidade_topsis(codigo_ibge: str, db: Session = Depends(get_db)):
+def historico_cidade_topsis(codigo_ibge: str, db: Session = Depends(get_db_leitura)):
     """Retorna a série histórica por indicador para uma cidade, incluindo o valor mais recente usado no cálculo TOPSIS."""
     cidade = db.query(Municipio).filter(Municipio.codigo_ibge == codigo_ibge).first()
     if not cidade:
         raise HTTPException(status_code=404, detail=f"Cidade {codigo_ibge} não encontrada.")
 
     historico = _buscar_historico_por_cidade(db, codigo_ibge)
-    recente = _buscar_mais_recente_por_cidade(db, codigo_ibge)
+    recente = _buscar_mais_recente_por_cidade(db, codigo_ibge, historico)
 
     return {
         "codigo_ibge": cidade.codigo_ibge,
@@ -71,8 +125,59 @@ def historico_cidade_topsis(codigo_ibge: str, db: Session = Depends(get_db)):
     }
 
 
+@router.get("/historico")
+def historico_cidades(
+    cidades: List[str] = Query(..., description="Códigos IBGE (repita o parâmetro para várias cidades)"),
+    indicadores: Optional[List[str]] = Query(default=None, description="Ids de indicador/variável; omitido = todos"),
+    ano_inicio: Optional[int] = Query(default=None),
+    ano_fim: Optional[int] = Query(default=None),
+    db: Session = Depends(get_db_leitura),
+):
+    """
+    Séries históricas de várias cidades para os gráficos de tendência, em uma única consulta.
+    Resposta colunar: indicadores -> cidade -> {anos[], valores[], fontes[]}, com `fontes`
+    como índices na lista `fontes` do topo da resposta.
+    """
+    cidades = list(dict.fromkeys(cidades))
+    if len(cidades) > MAX_CIDADES_HISTORICO:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo de {MAX_CIDADES_HISTORICO} cidades por consulta de histórico.",
+        )
+    if ano_inicio is not None and ano_fim is not None and ano_inicio > ano_fim:
+        raise HTTPException(status_code=400, detail="ano_inicio deve ser menor ou igual a ano_fim.")
+
+    residente = obter_matriz_residente(db)
+    historico = _buscar_historico_colunar(db, cidades, indicadores, ano_inicio, ano_fim)
+
+    return {
+        "cidades": _nomes_cidades(cidades, residente, db),
+        **historico,
+    }
+
+
+@router.get("/ranking-materializado")
+def ranking_materializado(
+    escopo: str = Query(default=ESCOPO_NACIONAL, min_length=2, max_length=2, description="'BR' para o ranking nacional ou a sigla da UF"),
+    limite: int = Query(default=100, ge=1, le=6000),
+    offset: int = Query(default=0, ge=0),
+    db: Session = Depends(get_db_leitura),
+):
+    """Top-N do ranking pré-calculado (pesos padrão) para o Brasil ou para uma UF."""
+    return buscar_top_ranking(db, escopo.upper(), limite, offset)
+
+
+@router.get("/ranking-materializado/cidade/{codigo_ibge}")
+def posicao_cidade_ranking_materializado(codigo_ibge: str, db: Session = Depends(get_db_leitura)):
+    """Posição da cidade no ranking nacional e no ranking do seu estado."""
+    posicoes = buscar_posicoes_cidade(db, codigo_ibge)
+    if not posicoes:
+        raise HTTPException(status_code=404, detail=f"Cidade {codigo_ibge} não consta nos rankings materializados.")
+    return posicoes
+
+
 @router.post("/ranking-hibrido", response_model=List[TopsisRankingResponse])
-def calcular_ranking_topsis(request: TopsisSimulationRequest, db: Session = Depends(get_db)):
+def calcular_ranking_topsis(request: TopsisSimulationRequest, db: Session = Depends(get_db_leitura)):
     """
     Motor Central do Urbix.
     Gera o ranking TOPSIS buscando os dados reais do banco (Data Lake) e 
@@ -82,30 +187,50 @@ def calcular_ranking_topsis(request: TopsisSimulationRequest, db: Session = Depe
     if not request.cidades_ibge:
         raise HTTPException(status_code=400, detail="Nenhuma cidade selecionada para o cálculo.")
 
-    # 1. Busca os nomes das cidades para a interface
-    cidades = db.query(Municipio).filter(Municipio.codigo_ibge.in_(request.cidades_ibge)).all()
-    cidades_encontradas = {c.codigo_ibge: c.nome for c in cidades}
+    # Matriz residente em memória: nomes, metadados e valores sem consultas SQL por requisição
+    residente = obter_matriz_residente(db)
 
-    if not cidades_encontradas:
-        # Fallback de segurança se a tabela de Municípios ainda não foi populada
-        cidades_encontradas = {ibge: f"IBGE {ibge}" for ibge in request.cidades_ibge}
+    # 1. Busca os nomes das cidades para a interface
+    cidades_encontradas = _nomes_cidades(request.cidades_ibge, residente, db)
 
     # 2. Busca os Metadados dos Indicadores (Pesos e Impactos) do Banco
-    indicadores_db = db.query(Indicador).all()
-    pesos = {}
-    impactos = {}
-
-    if indicadores_db:
-        for ind in indicadores_db:
-            pesos[ind.id] = ind.peso
-            impactos[ind.id] = ind.impacto
+    pesos, impactos = _metadados_indicadores(residente, db)
 
     # Converte os modelos Pydantic de simulação para dicionários Python
     simulacoes_dict = [sim.model_dump() for sim in request.simulacoes] if request.simulacoes else []
 
+    normalizacao_global = request.normalizacao == "global"
+    if normalizacao_global and residente is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Normalização global indisponível: snapshot de valores ainda não carregado.",
+        )
+
+    # Cache de resultados: mesma requisição canônica + mesma versão dos dados = mesmo ranking
+    plano = obter_plano()
+    completar_pesos_impactos(plano.indicadores, pesos, impactos)
+    chave_cache = chave_ranking(
+        request.cidades_ibge,
+        simulacoes_dict,
+        pesos,
+        impactos,
+        plano.indicadores,
+        {"normalizacao": request.normalizacao, "ideais_globais": normalizacao_global and request.ideais_globais},
+        residente.versao if residente is not None else obter_versao_dados(db),
+    )
+    em_cache = cache_ranking.obter(chave_cache)
+    if em_cache is not None:
+        return [TopsisRankingResponse(**res) for res in reordenar_resultados(em_cache, request.cidades_ibge)]
+
     # 3. Constroi a Matriz de Decisão
     try:
-        df_matriz = preparar_matriz_decisao(request.cidades_ibge, simulacoes_dict, db)
+        df_matriz = preparar_matriz_decisao(
+            request.cidades_ibge,
+            simulacoes_dict,
+            db,
+            residente=residente,
+            manter_colunas_vazias=normalizacao_global,
+        )
     except Exception as e:
         logger.error(f"Erro ao preparar matriz: {e}")
         raise HTTPException(status_code=500, detail="Erro interno ao construir a matriz matemática.")
@@ -118,23 +243,13 @@ def calcular_ranking_topsis(request: TopsisSimulationRequest, db: Session = Depe
     if df_matriz.dropna(how="all").empty:
         raise HTTPException(status_code=404, detail="Nenhum dado encontrado para as cidades solicitadas.")
 
-    # Fallback Dinâmico: Se a tabela Indicador estiver vazia, define regras lógicas
-    for col in df_matriz.columns:
-        if col not in pesos:
-            pesos[col] = 0.02 # Peso igualitário padrão (1/50)
-        if col not in impactos:
-            # Se a palavra do indicador remeter a "custo/dano", o impacto é negativo (-1)
-            termos_negativos = ["desemprego", "endividamento", "homicidios", "mortes", 
-                                "inadequadas", "sem_teto", "acidentes", "corrupcao", 
-                                "mortalidade", "afetadas", "perdas", "danos"]
-            if any(termo in col for termo in termos_negativos):
-                impactos[col] = -1
-            else:
-                impactos[col] = 1 # Maior é melhor
-
     # 4. Executa o Algoritmo TOPSIS
     try:
-        resultados = aplicar_topsis(df_matriz, pesos, impactos)
+        if normalizacao_global:
+            normas = obter_normas_globais(residente, plano, pesos, impactos)
+            resultados = aplicar_topsis_global(df_matriz, normas, ideais_globais=request.ideais_globais)
+        else:
+            resultados = aplicar_topsis(df_matriz, pesos, impactos)
     except Exception as e:
         logger.error(f"Erro no algoritmo TOPSIS: {e}")
         raise HTTPException(status_code=500, detail="Erro interno durante o cálculo matemático.")
@@ -145,4 +260,234 @@ def calcular_ranking_topsis(request: TopsisSimulationRequest, db: Session = Depe
         res["nome_cidade"] = cidades_encontradas.get(res["codigo_ibge"], f"IBGE {res['codigo_ibge']}")
         resposta_final.append(TopsisRankingResponse(**res))
 
-    return resposta_final
\ No newline at end of file
+    cache_ranking.guardar(chave_cache, resultados)
+    return resposta_final
+
+
+@router.get("/cache/estatisticas")
+def estatisticas_cache_ranking():
+    """Contadores de acerto/falha do cache de /ranking-hibrido (memória e disco)."""
+    return cache_ranking.estatisticas()
+
+
+@router.post("/ranking-cenarios", response_model=TopsisCenariosResponse)
+def calcular_ranking_cenarios(request: TopsisCenariosRequest, db: Session = Depends(get_db_leitura)):
+    """
+    Avalia vários vetores de pesos sobre o mesmo conjunto de cidades em uma única chamada.
+    A matriz é montada e normalizada uma vez; os N rankings saem de um único cálculo vetorizado.
+    """
+    if not request.cidades_ibge:
+        raise HTTPException(status_code=400, detail="Nenhuma cidade selecionada para o cálculo.")
+    for cenario in request.cenarios:
+        if any(peso < 0 for peso in cenario.pesos.values()):
+            raise HTTPException(status_code=400, detail="Pesos dos cenários devem ser maiores ou iguais a zero.")
+
+    residente = obter_matriz_residente(db)
+    cidades_encontradas = _nomes_cidades(request.cidades_ibge, residente, db)
+    pesos, impactos = _metadados_indicadores(residente, db)
+    simulacoes_dict = [sim.model_dump() for sim in request.simulacoes] if request.simulacoes else []
+
+    try:
+        df_matriz = preparar_matriz_decisao(request.cidades_ibge, simulacoes_dict, db, residente=residente)
+    except Exception as e:
+        logger.error(f"Erro ao preparar matriz: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno ao construir a matriz matemática.")
+
+    if df_matriz.empty or df_matriz.dropna(how="all").empty:
+        raise HTTPException(status_code=404, detail="Nenhum dado encontrado para as cidades solicitadas.")
+
+    colunas = list(df_matriz.columns)
+    completar_pesos_impactos(colunas, pesos, impactos)
+    pesos_cenarios = np.array(
+        [[cenario.pesos.get(col, pesos[col]) for col in colunas] for cenario in request.cenarios],
+        dtype=np.float64,
+    )
+    vetor_impactos = np.array([impactos[col] for col in colunas])
+
+    try:
+        colunas_validas, pontuacoes, _, _ = topsis_multicenario(
+            df_matriz.to_numpy(dtype=np.float64, na_value=np.nan), pesos_cenarios, vetor_impactos
+        )
+        posicoes = posicoes_por_pontuacao(pontuacoes)
+    except Exception as e:
+        logger.error(f"Erro no algoritmo TOPSIS multi-cenário: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno durante o cálculo matemático.")
+
+    codigos = list(df_matriz.index)
+    return TopsisCenariosResponse(
+        cidades_ibge=codigos,
+        nomes_cidades=[cidades_encontradas.get(ibge, f"IBGE {ibge}") for ibge in codigos],
+        indicadores=[col for col, valida in zip(colunas, colunas_validas) if valida],
+        cenarios=[
+            ResultadoCenario(
+                nome=cenario.nome,
+                pontuacoes=np.round(pontuacoes[idx], 4).tolist(),
+                posicoes=posicoes[idx].tolist(),
+            )
+            for idx, cenario in enumerate(request.cenarios)
+        ],
+    )
+
+
+@router.post("/sensibilidade", response_model=TopsisSensibilidadeResponse)
+def analisar_sensibilidade_pesos(request: TopsisSensibilidadeRequest, db: Session = Depends(get_db_leitura)):
+    """
+    Relatório de estabilidade do ranking: sorteia milhares de vetores de pesos (Dirichlet
+    centrada nos pesos cadastrados) e retorna, por cidade, a distribuição de posições,
+    a probabilidade de 1º lugar e as faixas de pontuação.
+    """
+    if not request.cidades_ibge:
+        raise HTTPException(status_code=400, detail="Nenhuma cidade selecionada para o cálculo.")
+
+    residente = obter_matriz_residente(db)
+    cidades_encontradas = _nomes_cidades(request.cidades_ibge, residente, db)
+    pesos, impactos = _metadados_indicadores(residente, db)
+    simulacoes_dict = [sim.model_dump() for sim in request.simulacoes] if request.simulacoes else []
+
+    try:
+        df_matriz = preparar_matriz_decisao(request.cidades_ibge, simulacoes_dict, db, residente=residente)
+    except Exception as e:
+        logger.error(f"Erro ao preparar matriz: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno ao construir a matriz matemática.")
+
+    if df_matriz.empty or df_matriz.dropna(how="all").empty:
+        raise HTTPException(status_code=404, detail="Nenhum dado encontrado para as cidades solicitadas.")
+
+    colunas = list(df_matriz.columns)
+    completar_pesos_impactos(colunas, pesos, impactos)
+    matriz = df_matriz.to_numpy(dtype=np.float64, na_value=np.nan)
+    vetor_pesos = np.array([max(pesos[col], 0.0) for col in colunas], dtype=np.float64)
+    vetor_impactos = np.array([impactos[col] for col in colunas])
+
+    try:
+        analise = analisar_sensibilidade(
+            matriz,
+            vetor_pesos,
+            vetor_impactos,
+            amostras=request.amostras,
+            concentracao=request.concentracao,
+            semente=request.semente,
+        )
+        _, pontuacao_base, _, _ = topsis_multicenario(matriz, vetor_pesos, vetor_impactos)
+        pontuacao_base = pontuacao_base[0]
+        posicao_base = posicoes_por_pontuacao(pontuacao_base)[0]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro na análise de sensibilidade: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno durante o cálculo matemático.")
+
+    distribuicao = analise["contagem_posicoes"] / request.amostras
+    percentis = analise["percentis_pontuacao"]
+    cidades = [
+        SensibilidadeCidade(
+            codigo_ibge=ibge,
+            nome_cidade=cidades_encontradas.get(ibge, f"IBGE {ibge}"),
+            posicao_base=int(posicao_base[idx]),
+            pontuacao_base=round(float(pontuacao_base[idx]), 4),
+            probabilidade_primeiro=round(float(analise["probabilidade_primeiro"][idx]), 4),
+            posicao_media=round(float(analise["posicao_media"][idx]), 4),
+            distribuicao_posicoes=np.round(distribuicao[idx], 4).tolist(),
+            faixas_pontuacao={nome: round(float(valores[idx]), 4) for nome, valores in percentis.items()},
+        )
+        for idx, ibge in enumerate(df_matriz.index)
+    ]
+    cidades.sort(key=lambda item: item.posicao_base)
+
+    return TopsisSensibilidadeResponse(
+        amostras=request.amostras,
+        concentracao=request.concentracao,
+        indicadores=[col for col, valida in zip(colunas, analise["colunas_validas"]) if valida],
+        cidades=cidades,
+    )
+
+
+def _resposta_sessao(sessao: SessaoSimulacao) -> SessaoSimulacaoResponse:
+    return SessaoSimulacaoResponse(
+        sessao_id=sessao.id,
+        versao_dados=sessao.versao_dados,
+        expira_em_s=TTL_SESSAO_S,
+        ranking=sessao.ranking(),
+    )
+
+
+@router.post("/sessoes", response_model=SessaoSimulacaoResponse, status_code=201)
+def abrir_sessao_simulacao(request: SessaoSimulacaoRequest, db: Session = Depends(get_db_leitura)):
+    """
+    Abre uma sessão de simulação: a matriz bruta das cidades fica no servidor e as
+    alterações seguintes são enviadas como deltas (PATCH /topsis/sessoes/{sessao_id}).
+    """
+    if not request.cidades_ibge:
+        raise HTTPException(status_code=400, detail="Nenhuma cidade selecionada para o cálculo.")
+
+    residente = obter_matriz_residente(db)
+    cidades_encontradas = _nomes_cidades(request.cidades_ibge, residente, db)
+    pesos, impactos = _metadados_indicadores(residente, db)
+    simulacoes_dict = [sim.model_dump() for sim in request.simulacoes] if request.simulacoes else []
+
+    plano = obter_plano()
+    try:
+        linha_por_cidade, brutos = montar_matriz_bruta(
+            request.cidades_ibge, simulacoes_dict, db, plano, residente=residente
+        )
+    except Exception as e:
+        logger.error(f"Erro ao preparar matriz: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno ao construir a matriz matemática.")
+
+    completar_pesos_impactos(plano.indicadores, pesos, impactos)
+    try:
+        motor = TopsisIncremental(
+            list(linha_por_cidade),
+            brutos,
+            plano,
+            np.array([pesos[ind] for ind in plano.indicadores], dtype=np.float64),
+            np.array([impactos[ind] for ind in plano.indicadores]),
+        )
+    except Exception as e:
+        logger.error(f"Erro no algoritmo TOPSIS: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno durante o cálculo matemático.")
+
+    if not (motor.presentes > 0).any():
+        raise HTTPException(status_code=404, detail="Nenhum dado encontrado para as cidades solicitadas.")
+
+    versao = residente.versao if residente is not None else obter_versao_dados(db)
+    sessao = registrar_sessao(SessaoSimulacao(motor, cidades_encontradas, versao))
+    return _resposta_sessao(sessao)
+
+
+def _sessao_ou_404(sessao_id: str) -> SessaoSimulacao:
+    sessao = obter_sessao(sessao_id)
+    if sessao is None:
+        raise HTTPException(status_code=404, detail="Sessão de simulação não encontrada ou expirada.")
+    return sessao
+
+
+@router.get("/sessoes/{sessao_id}", response_model=SessaoSimulacaoResponse)
+def obter_sessao_simulacao(sessao_id: str):
+    """Ranking completo da sessão (ex.: após recarregar a página)."""
+    sessao = _sessao_ou_404(sessao_id)
+    with sessao.lock:
+        return _resposta_sessao(sessao)
+
+
+@router.patch("/sessoes/{sessao_id}", response_model=SessaoDeltaResponse)
+def aplicar_delta_sessao(sessao_id: str, request: SessaoDeltaRequest):
+    """Aplica valores brutos alterados e devolve apenas as mudanças no ranking."""
+    sessao = _sessao_ou_404(sessao_id)
+    with sessao.lock:
+        try:
+            alteracoes = sessao.aplicar([sim.model_dump() for sim in request.simulacoes])
+        except Exception as e:
+            logger.error(f"Erro no algoritmo TOPSIS incremental: {e}")
+            raise HTTPException(status_code=500, detail="Erro interno durante o cálculo matemático.")
+        return SessaoDeltaResponse(
+            sessao_id=sessao.id,
+            total_cidades=len(sessao.motor.cidades),
+            alteracoes=alteracoes,
+        )
+
+
+@router.delete("/sessoes/{sessao_id}", status_code=204)
+def encerrar_sessao_simulacao(sessao_id: str):
+    if not encerrar_sessao(sessao_id):
+        raise HTTPException(status_code=404, detail="Sessão de simulação não encontrada ou expirada.")
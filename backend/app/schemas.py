@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Literal
 
 # ==========================================
 # 🏛️ SCHEMAS DE LEITURA DO BANCO DE DADOS
@@ -60,6 +60,14 @@ class TopsisSimulationRequest(BaseModel):
         default=None, 
         description="Dados alterados manualmente pelo usuário para sobrepor o banco de dados oficial"
     )
+    normalizacao: Literal["local", "global"] = Field(
+        default="local",
+        description="'local' normaliza só pelas cidades da requisição; 'global' usa normas nacionais (pontuações comparáveis entre requisições)"
+    )
+    ideais_globais: bool = Field(
+        default=False,
+        description="No modo 'global', usa também a solução ideal e anti-ideal calculadas sobre todos os municípios"
+    )
 
 class TopsisRankingResponse(BaseModel):
     """
@@ -72,4 +80,100 @@ class TopsisRankingResponse(BaseModel):
     distancia_negativa: float
     valores_calculados: Dict[str, float] = Field(
         description="Os valores finais já processados (taxas/porcentagens) usados na matriz"
-    )
\ No newline at end of file
+    )
+
+# ==========================================
+# 🧪 SCHEMAS DE CENÁRIOS DE PESOS (MULTI-CENÁRIO)
+# ==========================================
+
+class CenarioPesos(BaseModel):
+    """Um vetor de pesos alternativo. Indicadores omitidos mantêm o peso padrão do banco."""
+    nome: Optional[str] = Field(default=None, description="Rótulo livre do cenário")
+    pesos: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Pesos (>= 0) por id de indicador. Ex: {'homicidios': 0.1, 'ideb_iniciais': 0.05}"
+    )
+
+class TopsisCenariosRequest(BaseModel):
+    """
+    Mesmo conjunto de cidades (e simulações) avaliado com vários vetores de pesos de uma vez.
+    """
+    cidades_ibge: List[str] = Field(..., description="Lista de cidades para comparar no ranking")
+    simulacoes: Optional[List[DadosManuaisSimulador]] = Field(default=None)
+    cenarios: List[CenarioPesos] = Field(..., min_length=1, max_length=1000)
+
+class ResultadoCenario(BaseModel):
+    nome: Optional[str] = None
+    pontuacoes: List[float] = Field(description="Pontuação TOPSIS por cidade, na ordem de `cidades_ibge` da resposta")
+    posicoes: List[int] = Field(description="Posição (1 = melhor) por cidade, na ordem de `cidades_ibge` da resposta")
+
+class TopsisCenariosResponse(BaseModel):
+    """Resposta compacta: arrays alinhados à lista de cidades, um bloco por cenário."""
+    cidades_ibge: List[str]
+    nomes_cidades: List[str]
+    indicadores: List[str]
+    cenarios: List[ResultadoCenario]
+
+
+# ==========================================
+# 🎲 SCHEMAS DA ANÁLISE DE SENSIBILIDADE (MONTE CARLO)
+# ==========================================
+
+class TopsisSensibilidadeRequest(BaseModel):
+    """
+    Sorteia vetores de pesos em torno dos pesos cadastrados e mede a estabilidade do ranking.
+    """
+    cidades_ibge: List[str] = Field(..., max_length=500, description="Lista de cidades para comparar no ranking")
+    simulacoes: Optional[List[DadosManuaisSimulador]] = Field(default=None)
+    amostras: int = Field(default=10000, ge=100, le=100000, description="Quantidade de vetores de pesos sorteados")
+    concentracao: float = Field(
+        default=50.0, gt=0,
+        description="Concentração da Dirichlet: valores maiores sorteiam pesos mais próximos dos cadastrados"
+    )
+    semente: Optional[int] = Field(default=None, description="Semente para resultados reprodutíveis")
+
+class SensibilidadeCidade(BaseModel):
+    codigo_ibge: str
+    nome_cidade: str
+    posicao_base: int = Field(description="Posição com os pesos cadastrados")
+    pontuacao_base: float
+    probabilidade_primeiro: float = Field(description="Fração das amostras em que a cidade ficou em 1º lugar")
+    posicao_media: float
+    distribuicao_posicoes: List[float] = Field(description="Frequência de cada posição (índice 0 = 1º lugar)")
+    faixas_pontuacao: Dict[str, float] = Field(description="Percentis da pontuação (p5, p25, p50, p75, p95)")
+
+class TopsisSensibilidadeResponse(BaseModel):
+    amostras: int
+    concentracao: float
+    indicadores: List[str]
+    cidades: List[SensibilidadeCidade]
+
+
+# ==========================================
+# 🗂️ SCHEMAS DAS SESSÕES DE SIMULAÇÃO (DELTAS)
+# ==========================================
+
+class SessaoSimulacaoRequest(BaseModel):
+    """Abre uma sessão com o conjunto de cidades; as simulações seguintes chegam por PATCH."""
+    cidades_ibge: List[str] = Field(..., description="Lista de cidades para comparar no ranking")
+    simulacoes: Optional[List[DadosManuaisSimulador]] = Field(default=None)
+
+class SessaoDeltaRequest(BaseModel):
+    """Apenas os valores brutos alterados desde a última chamada."""
+    simulacoes: List[DadosManuaisSimulador] = Field(..., min_length=1)
+
+class ItemRankingSessao(TopsisRankingResponse):
+    posicao: int
+
+class SessaoSimulacaoResponse(BaseModel):
+    sessao_id: str
+    versao_dados: int
+    expira_em_s: float = Field(description="Tempo de inatividade até a sessão expirar")
+    ranking: List[ItemRankingSessao]
+
+class SessaoDeltaResponse(BaseModel):
+    sessao_id: str
+    total_cidades: int
+    alteracoes: List[ItemRankingSessao] = Field(
+        description="Somente cidades cuja posição, pontuação ou valores mudaram, ordenadas pela nova posição"
+    )
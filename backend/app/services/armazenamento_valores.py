@@ -0,0 +1,219 @@
+"""Armazenamento codificado (chaves inteiras) de `valores_indicadores` no SQLite.
+
+No formato original cada linha do fato repete o código IBGE, o id textual do
+indicador e a fonte. No formato codificado:
+
+- `dim_municipios`, `dim_indicadores` e `dim_fontes` mapeiam cada texto para um
+  inteiro pequeno (dicionário);
+- `fatos_valores_indicadores` guarda só inteiros + ano + valor, com índice único
+  (id_municipio, id_indicador, ano_referencia DESC);
+- `valores_indicadores` passa a ser uma VIEW com os mesmos nomes de coluna, e
+  triggers INSTEAD OF traduzem INSERT/UPDATE/DELETE. ORM, API e consultas
+  existentes continuam vendo os ids textuais.
+
+A conversão é explícita (tools/compactar_valores_indicadores.py) e só de ida.
+As cargas gravam direto no fato por `carga_valores.gravar_valores`.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List
+
+from sqlalchemy import text
+
+TABELA_FATOS = "fatos_valores_indicadores"
+NOME_INDICE_UNICO_FATOS = "ux_fatos_valores_chave"
+
+# dimensão -> coluna textual
+DIMENSOES = {
+    "dim_municipios": "codigo_ibge",
+    "dim_indicadores": "id_indicador",
+    "dim_fontes": "fonte",
+}
+
+DDL_DIMENSOES = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {tabela} (
+        id INTEGER PRIMARY KEY,
+        {coluna} VARCHAR NOT NULL UNIQUE
+    )
+    """
+    for tabela, coluna in DIMENSOES.items()
+]
+
+DDL_FATOS = f"""
+    CREATE TABLE IF NOT EXISTS {TABELA_FATOS} (
+        id INTEGER PRIMARY KEY,
+        id_municipio INTEGER NOT NULL REFERENCES dim_municipios (id),
+        id_indicador INTEGER NOT NULL REFERENCES dim_indicadores (id),
+        ano_referencia INTEGER NOT NULL,
+        valor FLOAT,
+        id_fonte INTEGER REFERENCES dim_fontes (id)
+    )
+"""
+
+INDICES_FATOS = [
+    f"""
+    CREATE UNIQUE INDEX IF NOT EXISTS {NOME_INDICE_UNICO_FATOS}
+    ON {TABELA_FATOS} (id_municipio, id_indicador, ano_referencia DESC)
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_fatos_valores_indicador ON {TABELA_FATOS} (id_indicador)",
+]
+
+DDL_VIEW = f"""
+    CREATE VIEW valores_indicadores AS
+    SELECT f.id, m.codigo_ibge, i.id_indicador, f.ano_referencia, f.valor, s.fonte
+    FROM {TABELA_FATOS} f
+    JOIN dim_municipios m ON m.id = f.id_municipio
+    JOIN dim_indicadores i ON i.id = f.id_indicador
+    LEFT JOIN dim_fontes s ON s.id = f.id_fonte
+"""
+
+_GARANTIR_DIMENSOES = """
+    INSERT OR IGNORE INTO dim_municipios (codigo_ibge) VALUES (new.codigo_ibge);
+    INSERT OR IGNORE INTO dim_indicadores (id_indicador) VALUES (new.id_indicador);
+    INSERT OR IGNORE INTO dim_fontes (fonte) SELECT new.fonte WHERE new.fonte IS NOT NULL;
+"""
+
+_ID_MUNICIPIO = "(SELECT id FROM dim_municipios WHERE codigo_ibge = new.codigo_ibge)"
+_ID_INDICADOR = "(SELECT id FROM dim_indicadores WHERE id_indicador = new.id_indicador)"
+_ID_FONTE = "(SELECT id FROM dim_fontes WHERE fonte = new.fonte)"
+
+TRIGGERS_VIEW = {
+    "trg_vi_view_insert": f"""
+        CREATE TRIGGER trg_vi_view_insert INSTEAD OF INSERT ON valores_indicadores BEGIN
+            {_GARANTIR_DIMENSOES}
+            INSERT INTO {TABELA_FATOS} (id, id_municipio, id_indicador, ano_referencia, valor, id_fonte)
+            VALUES (new.id, {_ID_MUNICIPIO}, {_ID_INDICADOR}, new.ano_referencia, new.valor, {_ID_FONTE});
+        END
+    """,
+    "trg_vi_view_update": f"""
+        CREATE TRIGGER trg_vi_view_update INSTEAD OF UPDATE ON valores_indicadores BEGIN
+            {_GARANTIR_DIMENSOES}
+            UPDATE {TABELA_FATOS} SET
+                id_municipio = {_ID_MUNICIPIO},
+                id_indicador = {_ID_INDICADOR},
+                ano_referencia = new.ano_referencia,
+                valor = new.valor,
+                id_fonte = {_ID_FONTE}
+            WHERE id = old.id;
+        END
+    """,
+    "trg_vi_view_delete": f"""
+        CREATE TRIGGER trg_vi_view_delete INSTEAD OF DELETE ON valores_indicadores BEGIN
+            DELETE FROM {TABELA_FATOS} WHERE id = old.id;
+        END
+    """,
+}
+
+
+def armazenamento_codificado(conn) -> bool:
+    """Indica se `valores_indicadores` é a VIEW sobre o fato codificado."""
+    if conn.dialect.name != "sqlite":
+        return False
+    tipo = conn.execute(text(
+        "SELECT type FROM sqlite_master WHERE name = 'valores_indicadores'"
+    )).scalar()
+    return tipo == "view"
+
+
+def carregar_dicionarios(conn) -> Dict[str, Dict[str, int]]:
+    """Mapeamentos texto -> id de cada dimensão."""
+    return {
+        tabela: dict(conn.execute(text(f"SELECT {coluna}, id FROM {tabela}")).all())
+        for tabela, coluna in DIMENSOES.items()
+    }
+
+
+def garantir_chaves(conn, dicionarios: Dict[str, Dict[str, int]], tabela: str, valores: Iterable[str]) -> None:
+    """Cadastra na dimensão os textos ainda sem id e atualiza o dicionário em memória."""
+    coluna = DIMENSOES[tabela]
+    mapa = dicionarios[tabela]
+    novos = sorted({valor for valor in valores if valor is not None and valor not in mapa})
+    if not novos:
+        return
+    conn.execute(
+        text(f"INSERT OR IGNORE INTO {tabela} ({coluna}) VALUES (:valor)"),
+        [{"valor": valor} for valor in novos],
+    )
+    consulta = text(f"SELECT {coluna}, id FROM {tabela} WHERE {coluna} = :valor")
+    for valor in novos:
+        chave, identificador = conn.execute(consulta, {"valor": valor}).one()
+        mapa[chave] = identificador
+
+
+def converter_para_armazenamento_codificado(engine) -> Dict[str, int]:
+    """
+    Converte a tabela `valores_indicadores` no fato codificado + VIEW, numa única transação.
+    Os ids das linhas são preservados (o snapshot referencia `id_origem`). Exige a chave
+    única (cidade, indicador, ano) já garantida. Retorna a cardinalidade de cada tabela.
+    """
+    from app.services.snapshot_latest import instalar_manutencao_snapshot
+
+    with engine.begin() as conn:
+        if conn.dialect.name != "sqlite":
+            raise RuntimeError("Armazenamento codificado disponível apenas para SQLite.")
+        if armazenamento_codificado(conn):
+            raise RuntimeError("valores_indicadores já está no formato codificado.")
+
+        for ddl in DDL_DIMENSOES:
+            conn.execute(text(ddl))
+        conn.execute(text("""
+            INSERT OR IGNORE INTO dim_municipios (codigo_ibge)
+            SELECT codigo_ibge FROM municipios
+            UNION SELECT codigo_ibge FROM valores_indicadores
+            ORDER BY 1
+        """))
+        conn.execute(text("""
+            INSERT OR IGNORE INTO dim_indicadores (id_indicador)
+            SELECT id FROM indicadores
+            UNION SELECT id_indicador FROM valores_indicadores
+            ORDER BY 1
+        """))
+        conn.execute(text("""
+            INSERT OR IGNORE INTO dim_fontes (fonte)
+            SELECT DISTINCT fonte FROM valores_indicadores WHERE fonte IS NOT NULL
+            ORDER BY 1
+        """))
+
+        conn.execute(text(DDL_FATOS))
+        conn.execute(text(f"""
+            INSERT INTO {TABELA_FATOS} (id, id_municipio, id_indicador, ano_referencia, valor, id_fonte)
+            SELECT v.id, m.id, i.id, v.ano_referencia, v.valor, s.id
+            FROM valores_indicadores v
+            JOIN dim_municipios m ON m.codigo_ibge = v.codigo_ibge
+            JOIN dim_indicadores i ON i.id_indicador = v.id_indicador
+            LEFT JOIN dim_fontes s ON s.fonte = v.fonte
+            ORDER BY v.id
+        """))
+        for ddl in INDICES_FATOS:
+            conn.execute(text(ddl))
+
+        # Remove a tabela original (índices e triggers de snapshot vão junto) e expõe a VIEW.
+        conn.execute(text("DROP TABLE valores_indicadores"))
+        conn.execute(text(DDL_VIEW))
+        for ddl in TRIGGERS_VIEW.values():
+            conn.execute(text(ddl))
+
+        contagens = {
+            tabela: conn.execute(text(f"SELECT COUNT(*) FROM {tabela}")).scalar() or 0
+            for tabela in [*DIMENSOES, TABELA_FATOS]
+        }
+
+    # Os triggers do snapshot passam a observar o fato codificado.
+    instalar_manutencao_snapshot(engine)
+    return contagens
+
+
+def objetos_armazenamento(conn) -> List[str]:
+    """Tabelas e índices que compõem o armazenamento atual do fato (para medir tamanho)."""
+    if armazenamento_codificado(conn):
+        tabelas = [TABELA_FATOS, *DIMENSOES]
+    else:
+        tabelas = ["valores_indicadores"]
+    marcadores = ", ".join(f":t{i}" for i in range(len(tabelas)))
+    linhas = conn.execute(
+        text(f"SELECT name FROM sqlite_master WHERE type IN ('table', 'index') AND tbl_name IN ({marcadores})"),
+        {f"t{i}": tabela for i, tabela in enumerate(tabelas)},
+    ).all()
+    return [linha[0] for linha in linhas]
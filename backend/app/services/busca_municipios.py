@@ -0,0 +1,195 @@
+"""Busca de municípios com filtros por UF e faixa de população.
+
+Dois caminhos, com a mesma semântica (substring do nome normalizado, prefixo do
+código IBGE ou UF; relevância exato > prefixo > infixo > código > UF) e o mesmo
+formato de resposta:
+
+- índice em memória (`indice_cidades`): padrão para buscas só por texto/UF;
+- FTS5 do SQLite (`municipios_fts`): usado quando há filtro de população (o
+  filtro vira um JOIN pela chave de `valores_indicadores_latest`, só para os
+  candidatos do FTS) ou quando URBIX_BUSCA_CIDADES=fts.
+
+`municipios_fts` guarda nome (normalizado por `normalizar_busca`), código e UF
+com o tokenizador trigram, em que cada termo da consulta é um token de
+substring — o mesmo "contém" do índice em memória. É criado e sincronizado por
+`ensure_sqlite_optimizations` e reconstruído por `seed_municipios`.
+
+Sem SQLite/FTS5 o filtro de população é aplicado sobre o índice em memória,
+consultando a população só dos candidatos, em lotes, na ordem de relevância.
+"""
+
+from __future__ import annotations
+
+import os
+from itertools import islice
+from typing import List, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+
+from app.services.indice_cidades import normalizar_busca, obter_indice_cidades
+
+MODO_BUSCA = os.getenv("URBIX_BUSCA_CIDADES", "memoria").lower()
+VARIAVEL_POPULACAO = "populacao_total"
+TABELA_FTS = "municipios_fts"
+
+# Faixas de população (limite inferior inclusivo, superior exclusivo).
+FAIXAS_POPULACAO = {
+    "ate_5k": (None, 5_000),
+    "5k_20k": (5_000, 20_000),
+    "20k_100k": (20_000, 100_000),
+    "100k_500k": (100_000, 500_000),
+    "acima_500k": (500_000, None),
+}
+
+# O tokenizador trigram só consegue usar o índice com termos de 3+ caracteres.
+TAMANHO_MINIMO_MATCH = 3
+# Candidatos do índice em memória conferidos por consulta de população (caminho sem FTS5).
+LOTE_CANDIDATOS = 200
+
+_RELEVANCIA = """
+    CASE
+        WHEN f.nome = :termo THEN 0
+        WHEN substr(f.nome, 1, :tamanho) = :termo THEN 1
+        WHEN instr(f.nome, :termo) > 0 THEN 2
+        WHEN substr(f.codigo_ibge, 1, :tamanho) = :termo THEN 3
+        ELSE 4
+    END
+"""
+
+
+def garantir_busca_municipios(conn, reconstruir: bool = False) -> bool:
+    """
+    Cria `municipios_fts` se preciso e o repopula a partir de `municipios` quando
+    `reconstruir` ou quando as contagens divergem. Retorna False sem SQLite/FTS5.
+    """
+    if conn.dialect.name != "sqlite":
+        return False
+    try:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} "
+            "USING fts5(nome, codigo_ibge, estado, tokenize='trigram')"
+        ))
+    except OperationalError:
+        # SQLite compilado sem FTS5 (ou sem o tokenizador trigram).
+        return False
+
+    if not reconstruir:
+        indexados = conn.execute(text(f"SELECT COUNT(*) FROM {TABELA_FTS}")).scalar()
+        reconstruir = indexados != conn.execute(text("SELECT COUNT(*) FROM municipios")).scalar()
+    if reconstruir:
+        conn.execute(text(f"DELETE FROM {TABELA_FTS}"))
+        linhas = conn.execute(text("SELECT codigo_ibge, nome, estado FROM municipios")).all()
+        if linhas:
+            conn.execute(
+                text(f"INSERT INTO {TABELA_FTS} (nome, codigo_ibge, estado) VALUES (:nome, :codigo, :estado)"),
+                [
+                    {"nome": normalizar_busca(nome), "codigo": codigo, "estado": (estado or "").lower()}
+                    for codigo, nome, estado in linhas
+                ],
+            )
+    return True
+
+
+def reconstruir_busca_municipios(conn) -> bool:
+    """Repopula `municipios_fts` a partir de `municipios` (ex.: após semear municípios)."""
+    return garantir_busca_municipios(conn, reconstruir=True)
+
+
+def busca_fts_disponivel(db_session) -> bool:
+    """Indica se `municipios_fts` existe no banco da sessão."""
+    if db_session.get_bind().dialect.name != "sqlite":
+        return False
+    return db_session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nome"
+    ), {"nome": TABELA_FTS}).first() is not None
+
+
+def _filtro_populacao(faixa: str, params: dict) -> List[str]:
+    minimo, maximo = FAIXAS_POPULACAO[faixa]
+    condicoes = ["pop.id_indicador = :var_pop"]
+    params["var_pop"] = VARIAVEL_POPULACAO
+    if minimo is not None:
+        condicoes.append("pop.valor >= :pop_min")
+        params["pop_min"] = minimo
+    if maximo is not None:
+        condicoes.append("pop.valor < :pop_max")
+        params["pop_max"] = maximo
+    return condicoes
+
+
+def _buscar_fts(db_session, q: str, limite: int, uf: Optional[str], faixa_populacao: Optional[str]) -> List[dict]:
+    termo = normalizar_busca(q)
+    params: dict = {"limite": limite}
+    juncoes = ["JOIN municipios m ON m.codigo_ibge = f.codigo_ibge"]
+    condicoes = []
+    ordem = "f.nome, m.nome"
+
+    if termo:
+        params.update(termo=termo, tamanho=len(termo))
+        condicoes.append(
+            "(instr(f.nome, :termo) > 0 OR substr(f.codigo_ibge, 1, :tamanho) = :termo OR f.estado = :termo)"
+        )
+        if len(termo) >= TAMANHO_MINIMO_MATCH:
+            # Nome ou código contendo o termo (token de substring); a condição acima refina o código para prefixo.
+            colunas = "{nome codigo_ibge}" if termo.isdigit() else "nome"
+            params["consulta"] = f'{colunas} : "{termo.replace(chr(34), chr(34) * 2)}"'
+            condicoes.append(f"{TABELA_FTS} MATCH :consulta")
+        ordem = f"{_RELEVANCIA}, {ordem}"
+    if uf:
+        condicoes.append("f.estado = :uf")
+        params["uf"] = uf.strip().lower()
+    if faixa_populacao:
+        juncoes.append("JOIN valores_indicadores_latest pop ON pop.codigo_ibge = f.codigo_ibge")
+        condicoes.extend(_filtro_populacao(faixa_populacao, params))
+
+    sql = (
+        f"SELECT m.codigo_ibge, m.nome, m.estado FROM {TABELA_FTS} f "
+        + " ".join(juncoes)
+        + (" WHERE " + " AND ".join(condicoes) if condicoes else "")
+        + f" ORDER BY {ordem} LIMIT :limite"
+    )
+    return [
+        {"codigo_ibge": codigo, "nome": nome, "estado": estado or ""}
+        for codigo, nome, estado in db_session.execute(text(sql), params).all()
+    ]
+
+
+def _codigos_na_faixa(db_session, faixa_populacao: str, codigos: List[str]) -> set:
+    """Quais dos `codigos` estão na faixa (busca pela chave do snapshot, sem varrer a tabela)."""
+    params: dict = {"codigos": codigos}
+    condicoes = ["pop.codigo_ibge IN :codigos", *_filtro_populacao(faixa_populacao, params)]
+    consulta = text(
+        "SELECT pop.codigo_ibge FROM valores_indicadores_latest pop WHERE " + " AND ".join(condicoes)
+    ).bindparams(bindparam("codigos", expanding=True))
+    return {linha[0] for linha in db_session.execute(consulta, params).all()}
+
+
+def _buscar_memoria(db_session, q: str, limite: int, uf: Optional[str], faixa_populacao: Optional[str]) -> List[dict]:
+    indice = obter_indice_cidades(db_session)
+    if faixa_populacao is None:
+        return indice.buscar(q, limite, uf)
+
+    candidatos = indice.iterar(q, uf)
+    resultados: List[dict] = []
+    while len(resultados) < limite:
+        lote = list(islice(candidatos, LOTE_CANDIDATOS))
+        if not lote:
+            break
+        na_faixa = _codigos_na_faixa(db_session, faixa_populacao, [cidade["codigo_ibge"] for cidade in lote])
+        resultados.extend(cidade for cidade in lote if cidade["codigo_ibge"] in na_faixa)
+    return resultados[:limite]
+
+
+def buscar_municipios(
+    db_session,
+    q: str,
+    limite: int = 10,
+    uf: Optional[str] = None,
+    faixa_populacao: Optional[str] = None,
+) -> List[dict]:
+    """Busca por nome, código IBGE ou UF, com filtros opcionais de UF e faixa de população."""
+    usar_fts = faixa_populacao is not None or MODO_BUSCA == "fts"
+    if usar_fts and busca_fts_disponivel(db_session):
+        return _buscar_fts(db_session, q, limite, uf, faixa_populacao)
+    return _buscar_memoria(db_session, q, limite, uf, faixa_populacao)
@@ -0,0 +1,194 @@
+"""Cache de resultados da rota /topsis/ranking-hibrido em dois níveis.
+
+A chave é um hash canônico da requisição: cidades ordenadas (com repetições,
+que alteram a normalização), simulações consolidadas por cidade e variável,
+pesos e impactos efetivos, modo de normalização e a versão dos dados
+incrementada pelo ETL. Uma nova carga de dados muda a versão e, portanto, todas
+as chaves, sem necessidade de invalidação explícita.
+
+Nível 1: LRU em memória limitado pelo total de linhas de ranking guardadas.
+Nível 2 (opcional, URBIX_CACHE_RANKING_DIR): um arquivo JSON por chave, em um
+subdiretório por versão dos dados, que sobrevive a reinícios da API.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_LINHAS_MEMORIA = int(os.getenv("URBIX_CACHE_RANKING_MAX_LINHAS", "100000"))
+DIRETORIO_DISCO = os.getenv("URBIX_CACHE_RANKING_DIR") or None
+
+
+def chave_ranking(
+    cidades_ibge: List[str],
+    simulacoes: List[dict],
+    pesos: Dict[str, float],
+    impactos: Dict[str, int],
+    indicadores: List[str],
+    opcoes: dict,
+    versao_dados: int,
+) -> str:
+    """Hash canônico da requisição; requisições equivalentes em qualquer ordem geram a mesma chave."""
+    cidades = set(cidades_ibge)
+
+    # Simulações são aplicadas em ordem: a última escrita de cada (cidade, variável) prevalece.
+    consolidadas: Dict[str, Dict[str, float]] = {}
+    for sim in simulacoes:
+        ibge = sim.get("codigo_ibge")
+        if ibge in cidades:
+            for chave, valor in sim.get("valores_brutos", {}).items():
+                consolidadas.setdefault(ibge, {})[chave] = float(valor)
+
+    canonica = {
+        "versao": versao_dados,
+        "cidades": sorted(cidades_ibge),
+        "simulacoes": consolidadas,
+        "pesos": [pesos.get(ind) for ind in indicadores],
+        "impactos": [impactos.get(ind) for ind in indicadores],
+        "indicadores": indicadores,
+        "opcoes": opcoes,
+    }
+    texto = json.dumps(canonica, sort_keys=True, separators=(",", ":"))
+    return f"{versao_dados}:{hashlib.sha256(texto.encode('utf-8')).hexdigest()}"
+
+
+def reordenar_resultados(linhas: List[dict], cidades_ibge: List[str]) -> List[dict]:
+    """
+    Reproduz a ordem da rota para a ordem de cidades desta requisição:
+    pontuação decrescente, empates na ordem em que as cidades foram enviadas.
+    """
+    por_cidade = {linha["codigo_ibge"]: linha for linha in linhas}
+    resultados = [por_cidade[ibge] for ibge in cidades_ibge if ibge in por_cidade]
+    return sorted(resultados, key=lambda x: x["pontuacao_topsis"], reverse=True)
+
+
+class CacheRanking:
+    """LRU em memória (limitado por linhas) com nível opcional em disco e contadores de uso."""
+
+    def __init__(self, max_linhas: int = MAX_LINHAS_MEMORIA, diretorio: Optional[str] = DIRETORIO_DISCO):
+        self.max_linhas = max_linhas
+        self.diretorio = Path(diretorio) if diretorio else None
+        self._itens: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._linhas = 0
+        self._lock = threading.Lock()
+        self._contadores = {
+            "acertos_memoria": 0,
+            "acertos_disco": 0,
+            "falhas": 0,
+            "gravacoes": 0,
+            "descartes": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Nível 1: memória
+    # ------------------------------------------------------------------
+    def _guardar_memoria(self, chave: str, linhas: List[dict]) -> None:
+        if len(linhas) > self.max_linhas:
+            return
+        anterior = self._itens.pop(chave, None)
+        if anterior is not None:
+            self._linhas -= len(anterior)
+        self._itens[chave] = linhas
+        self._linhas += len(linhas)
+        while self._linhas > self.max_linhas:
+            _, descartado = self._itens.popitem(last=False)
+            self._linhas -= len(descartado)
+            self._contadores["descartes"] += 1
+
+    # ------------------------------------------------------------------
+    # Nível 2: disco
+    # ------------------------------------------------------------------
+    def _arquivo(self, chave: str) -> Path:
+        versao, digest = chave.split(":", 1)
+        return self.diretorio / f"v{versao}" / f"{digest}.json"
+
+    def _ler_disco(self, chave: str) -> Optional[List[dict]]:
+        if self.diretorio is None:
+            return None
+        try:
+            with open(self._arquivo(chave), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Cache de ranking em disco ilegível ({chave}): {e}")
+            return None
+
+    def _gravar_disco(self, chave: str, linhas: List[dict]) -> None:
+        if self.diretorio is None:
+            return
+        arquivo = self._arquivo(chave)
+        try:
+            if not arquivo.parent.exists():
+                # Primeira gravação de uma nova versão: versões anteriores nunca mais serão lidas.
+                for antigo in self.diretorio.glob("v*"):
+                    if antigo.is_dir():
+                        shutil.rmtree(antigo, ignore_errors=True)
+                arquivo.parent.mkdir(parents=True, exist_ok=True)
+            temporario = arquivo.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(linhas, f, ensure_ascii=False)
+            os.replace(temporario, arquivo)
+        except OSError as e:
+            logger.warning(f"⚠️ Falha ao gravar cache de ranking em disco: {e}")
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def obter(self, chave: str) -> Optional[List[dict]]:
+        with self._lock:
+            linhas = self._itens.get(chave)
+            if linhas is not None:
+                self._itens.move_to_end(chave)
+                self._contadores["acertos_memoria"] += 1
+                return linhas
+
+        linhas = self._ler_disco(chave)
+        with self._lock:
+            if linhas is None:
+                self._contadores["falhas"] += 1
+                return None
+            self._contadores["acertos_disco"] += 1
+            self._guardar_memoria(chave, linhas)
+            return linhas
+
+    def guardar(self, chave: str, linhas: List[dict]) -> None:
+        with self._lock:
+            self._guardar_memoria(chave, linhas)
+            self._contadores["gravacoes"] += 1
+        self._gravar_disco(chave, linhas)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+            self._linhas = 0
+        if self.diretorio is not None:
+            shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            contadores = dict(self._contadores)
+            itens, linhas = len(self._itens), self._linhas
+        consultas = contadores["acertos_memoria"] + contadores["acertos_disco"] + contadores["falhas"]
+        acertos = contadores["acertos_memoria"] + contadores["acertos_disco"]
+        return {
+            **contadores,
+            "taxa_acerto": round(acertos / consultas, 4) if consultas else 0.0,
+            "itens_memoria": itens,
+            "linhas_memoria": linhas,
+            "max_linhas_memoria": self.max_linhas,
+            "disco_ativo": self.diretorio is not None,
+        }
+
+
+cache_ranking = CacheRanking()
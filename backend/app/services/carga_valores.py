@@ -0,0 +1,190 @@
+"""Gravação em lote de `valores_indicadores` com upsert pela chave natural.
+
+A tabela fato tem índice único em (codigo_ibge, id_indicador, ano_referencia):
+uma recarga do mesmo ano sobrescreve valor e fonte em vez de acumular
+duplicatas, e o passo de deduplicação pós-carga deixa de existir. Todos os
+carregadores (ETL local, APIs SIDRA/SICONFI, backfill e extratores de
+denominadores) gravam por `gravar_valores`.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import text
+
+from app.services.armazenamento_valores import (
+    TABELA_FATOS,
+    armazenamento_codificado,
+    carregar_dicionarios,
+    garantir_chaves,
+)
+
+logger = logging.getLogger(__name__)
+
+NOME_INDICE_UNICO = "ux_valores_indicadores_chave"
+# (cidade, indicador) é prefixo da chave única: sem seletividade própria, só desviava o
+# planejador do SQLite para um índice que exige buscar cada linha na tabela.
+INDICES_REDUNDANTES = ("ix_vi_cidade_indicador",)
+TAMANHO_LOTE = 5000
+
+Chave = Tuple[str, str, int]
+
+
+def _dialeto(conexao) -> str:
+    dialeto = getattr(conexao, "dialect", None) or conexao.get_bind().dialect
+    return dialeto.name
+
+
+def _sql_upsert(sobrescrever: bool) -> str:
+    if not sobrescrever:
+        acao = "DO NOTHING"
+    else:
+        # Linhas idênticas não são reescritas (nem disparam a manutenção do snapshot).
+        acao = """DO UPDATE SET valor = excluded.valor, fonte = excluded.fonte
+            WHERE valores_indicadores.valor IS DISTINCT FROM excluded.valor
+               OR valores_indicadores.fonte IS DISTINCT FROM excluded.fonte"""
+    return f"""
+        INSERT INTO valores_indicadores (codigo_ibge, id_indicador, ano_referencia, valor, fonte)
+        VALUES (:codigo_ibge, :id_indicador, :ano_referencia, :valor, :fonte)
+        ON CONFLICT (codigo_ibge, id_indicador, ano_referencia) {acao}
+    """
+
+
+def _conexao_sql(conexao):
+    return conexao.connection() if hasattr(conexao, "get_bind") else conexao
+
+
+def _gravar_codificado(conn, linhas: List[dict], sobrescrever: bool, tamanho_lote: int) -> int:
+    """Upsert direto no fato de chaves inteiras, traduzindo os textos pelos dicionários."""
+    dicionarios = carregar_dicionarios(conn)
+    garantir_chaves(conn, dicionarios, "dim_municipios", (linha["codigo_ibge"] for linha in linhas))
+    garantir_chaves(conn, dicionarios, "dim_indicadores", (linha["id_indicador"] for linha in linhas))
+    garantir_chaves(conn, dicionarios, "dim_fontes", (linha["fonte"] for linha in linhas))
+    municipios, indicadores, fontes = (
+        dicionarios["dim_municipios"], dicionarios["dim_indicadores"], dicionarios["dim_fontes"]
+    )
+
+    if sobrescrever:
+        acao = f"""DO UPDATE SET valor = excluded.valor, id_fonte = excluded.id_fonte
+            WHERE {TABELA_FATOS}.valor IS NOT excluded.valor
+               OR {TABELA_FATOS}.id_fonte IS NOT excluded.id_fonte"""
+    else:
+        acao = "DO NOTHING"
+    instrucao = text(f"""
+        INSERT INTO {TABELA_FATOS} (id_municipio, id_indicador, ano_referencia, valor, id_fonte)
+        VALUES (:id_municipio, :id_indicador, :ano_referencia, :valor, :id_fonte)
+        ON CONFLICT (id_municipio, id_indicador, ano_referencia) {acao}
+    """)
+
+    parametros = [
+        {
+            "id_municipio": municipios[linha["codigo_ibge"]],
+            "id_indicador": indicadores[linha["id_indicador"]],
+            "ano_referencia": linha["ano_referencia"],
+            "valor": linha["valor"],
+            "id_fonte": fontes.get(linha["fonte"]),
+        }
+        for linha in linhas
+    ]
+    for inicio in range(0, len(parametros), tamanho_lote):
+        conn.execute(instrucao, parametros[inicio:inicio + tamanho_lote])
+    return len(parametros)
+
+
+def gravar_valores(
+    conexao,
+    linhas: Iterable[tuple],
+    sobrescrever: bool = True,
+    tamanho_lote: int = TAMANHO_LOTE,
+) -> int:
+    """
+    Upsert de linhas (codigo_ibge, id_indicador, ano_referencia, valor, fonte).
+
+    `conexao` pode ser uma Session ou Connection do SQLAlchemy; o commit fica com o chamador.
+    Repetições da mesma chave na entrada são resolvidas antes do envio (a última vence),
+    pois um único INSERT multi-linha não pode atualizar a mesma linha duas vezes.
+    Com `sobrescrever=False` linhas já existentes são mantidas. No armazenamento codificado
+    (`armazenamento_valores`) a gravação vai direto ao fato de chaves inteiras.
+    Retorna a quantidade de chaves distintas enviadas.
+    """
+    por_chave: Dict[Chave, dict] = {}
+    for codigo_ibge, id_indicador, ano_referencia, valor, fonte in linhas:
+        chave = (str(codigo_ibge), str(id_indicador), int(ano_referencia))
+        por_chave[chave] = {
+            "codigo_ibge": chave[0],
+            "id_indicador": chave[1],
+            "ano_referencia": chave[2],
+            "valor": None if valor is None else float(valor),
+            "fonte": fonte,
+        }
+
+    if not por_chave:
+        return 0
+
+    if _dialeto(conexao) == "sqlite" and armazenamento_codificado(_conexao_sql(conexao)):
+        return _gravar_codificado(_conexao_sql(conexao), list(por_chave.values()), sobrescrever, tamanho_lote)
+
+    sql = _sql_upsert(sobrescrever)
+    if _dialeto(conexao) == "sqlite":
+        # SQLite só aceita IS DISTINCT FROM a partir da 3.39; IS NOT tem a mesma semântica.
+        sql = sql.replace("IS DISTINCT FROM", "IS NOT")
+    instrucao = text(sql)
+
+    parametros: List[dict] = list(por_chave.values())
+    for inicio in range(0, len(parametros), tamanho_lote):
+        conexao.execute(instrucao, parametros[inicio:inicio + tamanho_lote])
+    return len(parametros)
+
+
+def garantir_indice_unico(db_session) -> bool:
+    """
+    Cria o índice único da chave natural em bases antigas. Antes remove, uma única vez,
+    duplicatas (cidade, indicador, ano) mantendo a linha de maior id — a mesma regra que o
+    ETL aplicava após cada carga. Também remove índices que a chave torna redundantes.
+    Retorna True se o índice foi criado agora.
+    """
+    conexao = db_session.connection()
+    if armazenamento_codificado(conexao):
+        # O fato codificado já nasce com a chave única.
+        return False
+    for indice in INDICES_REDUNDANTES:
+        conexao.execute(text(f"DROP INDEX IF EXISTS {indice}"))
+    db_session.commit()
+    conexao = db_session.connection()
+    if _dialeto(db_session) == "sqlite":
+        existe = conexao.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :nome"
+        ), {"nome": NOME_INDICE_UNICO}).first()
+    else:
+        existe = conexao.execute(text(
+            "SELECT 1 FROM pg_indexes WHERE indexname = :nome"
+        ), {"nome": NOME_INDICE_UNICO}).first()
+    if existe:
+        return False
+
+    removidos = conexao.execute(text("""
+        DELETE FROM valores_indicadores
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT
+                    id,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY codigo_ibge, id_indicador, ano_referencia
+                        ORDER BY id DESC
+                    ) AS rn
+                FROM valores_indicadores
+            ) t
+            WHERE t.rn > 1
+        )
+    """)).rowcount
+    conexao.execute(text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {NOME_INDICE_UNICO} "
+        "ON valores_indicadores (codigo_ibge, id_indicador, ano_referencia)"
+    ))
+    db_session.commit()
+    if removidos > 0:
+        logger.info(f"🧹 {removidos} duplicata(s) (cidade, indicador, ano) removida(s) de valores_indicadores")
+    logger.info("✅ Índice único (cidade, indicador, ano) criado em valores_indicadores")
+    return True
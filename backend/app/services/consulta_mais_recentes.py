@@ -0,0 +1,145 @@
+"""Consulta do valor mais recente por cidade + indicador direto no fato.
+
+Uma única passada sobre o índice (cidade, indicador, ano DESC, id DESC), com a
+formulação mais barata de cada dialeto:
+
+- SQLite: `max_nua` — GROUP BY com MAX(ano_referencia); o SQLite devolve as
+  colunas "nuas" da linha que atingiu o máximo (a chave (cidade, indicador, ano)
+  é única, então não há empate);
+- PostgreSQL: `distinct_on` — DISTINCT ON (cidade, indicador) ordenado por ano DESC;
+- demais: `row_number` — janela ROW_NUMBER() particionada pela chave.
+
+Substitui os dois GROUP BY aninhados (MAX(ano) e depois MAX(id)) religados ao
+fato. Usada no fallback de `_buscar_valores_mais_recentes` e na reconstrução do
+snapshot; tests/test_consulta_mais_recentes.py confere o uso do índice.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, text
+
+from app.services.armazenamento_valores import TABELA_FATOS, armazenamento_codificado
+from app.services.selecao_cidades import sql_in_cidades
+
+FORMULACOES = ("max_nua", "row_number", "distinct_on")
+
+# Fato com colunas textuais (tabela original).
+_ORIGEM_TEXTO = {
+    "tabela": "valores_indicadores",
+    "chave": "codigo_ibge, id_indicador",
+    "colunas": "codigo_ibge, id_indicador, ano_referencia, valor, fonte, id",
+    "ordem": "ano_referencia DESC, id DESC",
+    "filtro_cidades": "codigo_ibge IN {cidades}",
+    "filtro_indicadores": "id_indicador IN :indicadores",
+}
+
+# Fato codificado (armazenamento_valores): filtra por ids e resolve os textos no fim.
+_ORIGEM_CODIFICADA = {
+    "tabela": TABELA_FATOS,
+    "chave": "id_municipio, id_indicador",
+    "colunas": "id_municipio, id_indicador, ano_referencia, valor, id_fonte, id",
+    "ordem": "ano_referencia DESC",
+    "filtro_cidades": "id_municipio IN (SELECT id FROM dim_municipios WHERE codigo_ibge IN {cidades})",
+    "filtro_indicadores": "id_indicador IN (SELECT id FROM dim_indicadores WHERE id_indicador IN :indicadores)",
+}
+
+_RESOLVER_CODIFICADO = """
+    SELECT m.codigo_ibge, i.id_indicador, f.ano_referencia, f.valor, s.fonte, f.id
+    FROM ({interna}) f
+    JOIN dim_municipios m ON m.id = f.id_municipio
+    JOIN dim_indicadores i ON i.id = f.id_indicador
+    LEFT JOIN dim_fontes s ON s.id = f.id_fonte
+"""
+
+
+def formulacao_padrao(conn) -> str:
+    """Formulação mais barata para o dialeto da conexão."""
+    dialeto = conn.dialect.name
+    if dialeto == "sqlite":
+        return "max_nua"
+    if dialeto == "postgresql":
+        return "distinct_on"
+    return "row_number"
+
+
+def sql_mais_recentes(
+    conn,
+    filtrar_cidades: bool = False,
+    filtrar_indicadores: bool = False,
+    formulacao: Optional[str] = None,
+    expressao_cidades: str = ":cidades",
+) -> str:
+    """
+    SQL com uma linha por cidade + indicador: (codigo_ibge, id_indicador, ano_referencia,
+    valor, fonte, id). Os filtros usam os parâmetros expansíveis `:cidades` e `:indicadores`;
+    `expressao_cidades` substitui o primeiro (ver `selecao_cidades.sql_in_cidades`).
+    """
+    formulacao = formulacao or formulacao_padrao(conn)
+    if formulacao not in FORMULACOES:
+        raise ValueError(f"Formulação desconhecida: {formulacao}")
+    codificado = armazenamento_codificado(conn)
+    origem = _ORIGEM_CODIFICADA if codificado else _ORIGEM_TEXTO
+
+    filtros = []
+    if filtrar_cidades:
+        filtros.append(origem["filtro_cidades"].format(cidades=expressao_cidades))
+    if filtrar_indicadores:
+        filtros.append(origem["filtro_indicadores"])
+    where = (" WHERE " + " AND ".join(filtros)) if filtros else ""
+    tabela, chave, colunas, ordem = origem["tabela"], origem["chave"], origem["colunas"], origem["ordem"]
+
+    if formulacao == "max_nua":
+        interna = (
+            f"SELECT {colunas} FROM ("
+            f"SELECT {colunas}, MAX(ano_referencia) AS ano_max FROM {tabela}{where} GROUP BY {chave}"
+            f") t"
+        )
+    elif formulacao == "distinct_on":
+        interna = (
+            f"SELECT DISTINCT ON ({chave}) {colunas} FROM {tabela}{where} "
+            f"ORDER BY {chave}, {ordem}"
+        )
+    else:
+        interna = (
+            f"SELECT {colunas} FROM ("
+            f"SELECT {colunas}, ROW_NUMBER() OVER (PARTITION BY {chave} ORDER BY {ordem}) AS rn "
+            f"FROM {tabela}{where}"
+            f") t WHERE rn = 1"
+        )
+
+    if codificado:
+        return _RESOLVER_CODIFICADO.format(interna=interna)
+    return interna
+
+
+def consulta_mais_recentes(
+    conn,
+    cidades: Optional[Iterable[str]] = None,
+    ids_indicadores: Optional[Iterable[str]] = None,
+    formulacao: Optional[str] = None,
+):
+    """`text()` pronto para execução, com os filtros de cidades/indicadores já vinculados."""
+    ids_indicadores = list(ids_indicadores) if ids_indicadores is not None else None
+    expressao_cidades, parametros_cidades = ":cidades", []
+    if cidades is not None:
+        # Seleções grandes viram tabela temporária / parâmetro JSON em vez de IN gigante.
+        expressao_cidades, parametros_cidades = sql_in_cidades(conn, cidades)
+    sql = sql_mais_recentes(conn, cidades is not None, ids_indicadores is not None, formulacao, expressao_cidades)
+
+    consulta = text(sql)
+    if parametros_cidades:
+        consulta = consulta.bindparams(*parametros_cidades)
+    if ids_indicadores is not None:
+        consulta = consulta.bindparams(bindparam("indicadores", value=ids_indicadores, expanding=True))
+    return consulta
+
+
+def buscar_mais_recentes(
+    db_session,
+    cidades: Optional[Iterable[str]] = None,
+    ids_indicadores: Optional[Iterable[str]] = None,
+) -> list:
+    """Linhas (codigo_ibge, id_indicador, ano_referencia, valor, fonte, id) mais recentes."""
+    return db_session.execute(consulta_mais_recentes(db_session.connection(), cidades, ids_indicadores)).all()
@@ -9,10 +9,16 @@ from __future__ import annotations
 import json
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
 
 CATALOG_PATH = Path(__file__).parent.parent / "data" / "ibge_catalog.json"
 
+# Códigos-sentinela das bases oficiais ("município ignorado"), nunca resolvidos.
+SENTINEL_CODES = frozenset({"0999999", "9999999"})
+
 
 @lru_cache(maxsize=1)
 def load_ibge_catalog() -> Dict[str, Any]:
@@ -40,6 +46,52 @@ def state_by_abbr() -> Dict[str, Dict[str, Any]]:
     return {item["abbr"].casefold(): item for item in catalog.get("states", []) if item.get("abbr")}
 
 
+@lru_cache(maxsize=1)
+def ibge_prefix_lookup() -> np.ndarray:
+    """
+    Tabela densa prefixo de 6 dígitos -> código de 7 dígitos (0 = inexistente). O 7º dígito
+    do código IBGE é verificador, então o prefixo identifica o município sozinho.
+    """
+    lookup = np.zeros(1_000_000, dtype=np.int32)
+    for code in municipality_by_code():
+        code = str(code).strip().zfill(7)
+        if len(code) != 7 or not code.isdigit() or code in SENTINEL_CODES:
+            continue
+        lookup[int(code[:6])] = int(code)
+    return lookup
+
+
+def resolve_ibge_codes(values: Iterable[Any]) -> np.ndarray:
+    """
+    Versão vetorizada da normalização de código IBGE usada no ETL: mantém só os dígitos de
+    cada valor; com 7 ou mais, usa os 7 últimos; com exatamente 6, o próprio prefixo; e
+    resolve pelo prefixo de 6 dígitos no catálogo. Retorna um array object com o código de
+    7 dígitos ou None (inválido, fora do catálogo ou sentinela).
+    """
+    series = pd.Series(values, copy=False)
+    resolved = np.full(len(series), None, dtype=object)
+    if series.empty:
+        return resolved
+
+    if series.dtype.kind == "f":
+        # Colunas numéricas com nulos chegam como float (4101408.0): inteiro antes do texto.
+        series = series.where(np.isfinite(series)).round().astype("Int64")
+    # Planilhas mistas trazem o mesmo ".0" já como texto.
+    texts = series.astype(str).str.replace(r"\.0+\s*$", "", regex=True)
+
+    digits = texts.str.replace(r"\D", "", regex=True)
+    lengths = digits.str.len()
+    prefixes = digits.str[-7:].str[:6].where(lengths >= 7, digits.where(lengths == 6))
+    prefixes = pd.to_numeric(prefixes, errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+
+    codes = np.zeros(len(series), dtype=np.int32)
+    valid = prefixes >= 0
+    codes[valid] = ibge_prefix_lookup()[prefixes[valid]]
+    found = codes > 0
+    resolved[found] = codes[found].astype(str)
+    return resolved
+
+
 def find_municipality_by_name(name: str) -> Optional[Dict[str, Any]]:
     if not name:
         return None
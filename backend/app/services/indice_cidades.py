@@ -0,0 +1,212 @@
+"""Índice em memória para a busca de cidades (/topsis/cidades).
+
+Montado uma vez a partir de `municipios` e do catálogo `ibge_catalog.json`,
+com os nomes já normalizados (sem acento, minúsculos). A busca não toca o banco:
+
+- prefixo: busca binária sobre os nomes normalizados ordenados;
+- infixo: listas invertidas de n-gramas (1 a 3 caracteres), intersectadas e
+  confirmadas com `in` apenas nos candidatos;
+- código IBGE: busca binária sobre os códigos ordenados.
+
+Resultados são ordenados por relevância (exato > prefixo > infixo > UF) e,
+dentro de cada faixa, por nome.
+
+O índice guarda o estado de `municipios` de que foi montado (versão dos dados,
+quantidade e maior código). Como na matriz residente, o estado é reconferido no
+máximo a cada INTERVALO_VERIFICACAO_S e o índice é remontado quando muda — por
+exemplo, após `seed_municipios` ou uma carga do ETL em outro processo.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+import time
+import unicodedata
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import func
+
+from app.services.matriz_residente import INTERVALO_VERIFICACAO_S
+from app.services.versao_dados import obter_versao_dados
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_NGRAMA = 3
+
+
+def normalizar_busca(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = texto.encode("ascii", "ignore").decode("ascii")
+    return texto.strip().lower()
+
+
+class IndiceCidades:
+    """Nomes normalizados ordenados + n-gramas -> posições, para buscas sem varredura."""
+
+    def __init__(self, cidades: Iterable[tuple]):
+        # Ordem canônica: nome normalizado, depois nome original (posição = id da cidade no índice).
+        registros = sorted(
+            ((normalizar_busca(nome), nome, codigo, estado or "") for codigo, nome, estado in cidades),
+            key=lambda item: (item[0], item[1]),
+        )
+        self.nomes_normalizados: List[str] = [registro[0] for registro in registros]
+        self.cidades: List[dict] = [
+            {"codigo_ibge": codigo, "nome": nome, "estado": estado}
+            for _, nome, codigo, estado in registros
+        ]
+        self.estados: List[str] = [registro[3].lower() for registro in registros]
+
+        self.codigos_ordenados = sorted((cidade["codigo_ibge"], idx) for idx, cidade in enumerate(self.cidades))
+        self._codigos = [codigo for codigo, _ in self.codigos_ordenados]
+
+        self.ngramas: Dict[str, List[int]] = {}
+        for idx, nome in enumerate(self.nomes_normalizados):
+            vistos = set()
+            for tamanho in range(1, TAMANHO_NGRAMA + 1):
+                for inicio in range(len(nome) - tamanho + 1):
+                    vistos.add(nome[inicio:inicio + tamanho])
+            for ngrama in vistos:
+                # Percorrer as cidades em ordem mantém cada lista ordenada por nome.
+                self.ngramas.setdefault(ngrama, []).append(idx)
+
+        self.por_estado: Dict[str, List[int]] = {}
+        for idx, estado in enumerate(self.estados):
+            self.por_estado.setdefault(estado, []).append(idx)
+
+        # Estado de `municipios` que originou o índice (ver `estado_municipios`).
+        self.estado: Optional[tuple] = None
+
+    def __len__(self) -> int:
+        return len(self.cidades)
+
+    def _prefixo(self, termo: str) -> range:
+        inicio = bisect.bisect_left(self.nomes_normalizados, termo)
+        fim = bisect.bisect_left(self.nomes_normalizados, termo + "\uffff", lo=inicio)
+        return range(inicio, fim)
+
+    def _infixo(self, termo: str) -> List[int]:
+        if len(termo) <= TAMANHO_NGRAMA:
+            return self.ngramas.get(termo, [])
+
+        listas = [
+            self.ngramas.get(termo[inicio:inicio + TAMANHO_NGRAMA], [])
+            for inicio in range(len(termo) - TAMANHO_NGRAMA + 1)
+        ]
+        listas.sort(key=len)
+        if not listas[0]:
+            return []
+        candidatos = set(listas[0])
+        for lista in listas[1:]:
+            candidatos.intersection_update(lista)
+            if not candidatos:
+                return []
+        return sorted(idx for idx in candidatos if termo in self.nomes_normalizados[idx])
+
+    def _codigo(self, termo: str) -> List[int]:
+        inicio = bisect.bisect_left(self._codigos, termo)
+        fim = bisect.bisect_left(self._codigos, termo + "\uffff", lo=inicio)
+        # Resultados de código seguem a ordem por nome, como as demais faixas.
+        return sorted(idx for _, idx in self.codigos_ordenados[inicio:fim])
+
+    def iterar(self, q: str, uf: Optional[str] = None) -> Iterator[dict]:
+        """Cidades cujo nome, código IBGE ou UF contém `q`, em ordem de relevância, sob demanda."""
+        termo = normalizar_busca(q)
+        uf = uf.strip().lower() if uf else None
+
+        if not termo:
+            candidatos = self.por_estado.get(uf, []) if uf else range(len(self.cidades))
+            for idx in candidatos:
+                yield self.cidades[idx]
+            return
+
+        faixas: List[Iterable[int]] = []
+        prefixo = self._prefixo(termo)
+        exatos = [idx for idx in prefixo if self.nomes_normalizados[idx] == termo]
+        faixas.append(exatos)
+        faixas.append(prefixo)
+        faixas.append(self._infixo(termo))
+        if termo.isdigit():
+            faixas.append(self._codigo(termo))
+        faixas.append(self.por_estado.get(termo, []))
+
+        incluidos = set()
+        for faixa in faixas:
+            for idx in faixa:
+                if idx in incluidos or (uf and self.estados[idx] != uf):
+                    continue
+                incluidos.add(idx)
+                yield self.cidades[idx]
+
+    def buscar(self, q: str, limite: int = 10, uf: Optional[str] = None) -> List[dict]:
+        """Até `limite` cidades cujo nome, código IBGE ou UF contém `q`, filtradas opcionalmente por UF."""
+        return list(islice(self.iterar(q, uf), limite))
+
+
+def carregar_indice_cidades(db_session) -> IndiceCidades:
+    """Une `municipios` (prioritário) e o catálogo IBGE local em um índice novo."""
+    from app.models import Municipio
+    from app.services.ibge_catalog import load_ibge_catalog
+
+    cidades: Dict[str, tuple] = {}
+    for item in load_ibge_catalog().get("municipalities", []):
+        if item.get("codigo_ibge") and item.get("nome"):
+            cidades[item["codigo_ibge"]] = (item["codigo_ibge"], item["nome"], item.get("uf_abbr", ""))
+    for codigo, nome, estado in db_session.query(Municipio.codigo_ibge, Municipio.nome, Municipio.estado).all():
+        cidades[codigo] = (codigo, nome, estado)
+
+    return IndiceCidades(cidades.values())
+
+
+def estado_municipios(db_session) -> tuple:
+    """(versão dos dados, quantidade, maior código) de `municipios`: muda com cargas e cadastros."""
+    from app.models import Municipio
+
+    total, maior = db_session.query(func.count(Municipio.codigo_ibge), func.max(Municipio.codigo_ibge)).one()
+    return obter_versao_dados(db_session), total, maior
+
+
+_indice: Optional[IndiceCidades] = None
+_ultima_verificacao = 0.0
+_lock_indice = threading.Lock()
+
+
+def recarregar_indice_cidades(db_session) -> IndiceCidades:
+    """Reconstrói o índice e o publica atomicamente (ex.: na inicialização ou após semear municípios)."""
+    global _indice, _ultima_verificacao
+
+    inicio = time.perf_counter()
+    # Lido antes da montagem: uma mudança concorrente só provoca outra recarga na próxima verificação.
+    estado = estado_municipios(db_session)
+    novo = carregar_indice_cidades(db_session)
+    novo.estado = estado
+    _indice = novo
+    _ultima_verificacao = time.monotonic()
+    logger.info(f"✅ Índice de busca de cidades: {len(novo)} municípios em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    return novo
+
+
+def obter_indice_cidades(db_session) -> IndiceCidades:
+    """
+    Retorna o índice atual, conferindo o estado de `municipios` no máximo a cada
+    INTERVALO_VERIFICACAO_S. Apenas uma thread remonta; as demais seguem com o índice anterior.
+    """
+    global _ultima_verificacao
+
+    atual = _indice
+    if atual is not None and time.monotonic() - _ultima_verificacao < INTERVALO_VERIFICACAO_S:
+        return atual
+
+    if not _lock_indice.acquire(blocking=atual is None):
+        return atual
+    try:
+        if _indice is not None and time.monotonic() - _ultima_verificacao < INTERVALO_VERIFICACAO_S:
+            return _indice
+        _ultima_verificacao = time.monotonic()
+        if _indice is None or _indice.estado != estado_municipios(db_session):
+            return recarregar_indice_cidades(db_session)
+        return _indice
+    finally:
+        _lock_indice.release()
@@ -0,0 +1,173 @@
+"""Matriz residente em memória com o valor mais recente por município x variável.
+
+Carregada de `vetores_municipios` (ou, se defasados, de `valores_indicadores_latest`)
+na inicialização da API e recarregada quando o ETL incrementa a versão dos dados
+(ver `versao_dados`). A rota de
+ranking apenas fatia linhas pelo índice código IBGE -> linha, sem tocar o banco.
+
+A troca é atômica: uma nova instância é montada por completo e só então passa a
+ser a referência global; requisições em andamento continuam com a anterior.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from app.services.versao_dados import obter_versao_dados
+from app.services.vetores_municipios import pivotar_snapshot, ler_todos_vetores
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre consultas à versão dos dados (em segundos).
+INTERVALO_VERIFICACAO_S = float(os.getenv("URBIX_VERSAO_DADOS_INTERVALO_S", "30"))
+
+
+class MatrizResidente:
+    """Matriz densa float64 (municípios x variáveis), com NaN marcando ausência de dado."""
+
+    def __init__(
+        self,
+        versao: int,
+        codigos: List[str],
+        variaveis: List[str],
+        valores: np.ndarray,
+        nomes: Dict[str, str],
+        pesos: Dict[str, float],
+        impactos: Dict[str, int],
+    ):
+        self.versao = versao
+        self.codigos = codigos
+        self.variaveis = variaveis
+        self.linha_por_codigo: Dict[str, int] = {codigo: idx for idx, codigo in enumerate(codigos)}
+        self.indice_variavel: Dict[str, int] = {var: idx for idx, var in enumerate(variaveis)}
+        self.nomes = nomes
+        self.pesos = pesos
+        self.impactos = impactos
+
+        # Linha e coluna extras totalmente NaN: índice -1 aponta para "sem dado".
+        self._valores = np.full((len(codigos) + 1, len(variaveis) + 1), np.nan, dtype=np.float64)
+        self._valores[:-1, :-1] = valores
+        self._valores.setflags(write=False)
+        self._colunas_por_plano: Dict[str, np.ndarray] = {}
+
+    @property
+    def valores(self) -> np.ndarray:
+        return self._valores[:-1, :-1]
+
+    def linhas_de(self, cidades_ibge: List[str]) -> np.ndarray:
+        return np.fromiter(
+            (self.linha_por_codigo.get(ibge, -1) for ibge in cidades_ibge),
+            dtype=np.intp,
+            count=len(cidades_ibge),
+        )
+
+    def colunas_do_plano(self, plano) -> np.ndarray:
+        """Posição de cada variável do plano na matriz residente (-1 se a variável não tem dados)."""
+        colunas = self._colunas_por_plano.get(plano.hash_config)
+        if colunas is None:
+            colunas = np.array([self.indice_variavel.get(var, -1) for var in plano.variaveis], dtype=np.intp)
+            self._colunas_por_plano = {plano.hash_config: colunas}
+        return colunas
+
+    def brutos_do_plano(self, plano) -> np.ndarray:
+        """Matriz bruta de todos os municípios (na ordem de `codigos`) nas colunas do plano."""
+        return self._valores[:-1][:, self.colunas_do_plano(plano)]
+
+    def fatiar_brutos(self, cidades_ibge: List[str], plano) -> np.ndarray:
+        """Retorna uma cópia (cidades x variáveis do plano) pronta para receber simulações."""
+        return self._valores[np.ix_(self.linhas_de(cidades_ibge), self.colunas_do_plano(plano))]
+
+
+def carregar_matriz_residente(db_session) -> Optional[MatrizResidente]:
+    """
+    Monta a matriz a partir dos vetores por município (uma linha por cidade) ou, se estiverem
+    defasados em relação à versão dos dados, do snapshot longo `valores_indicadores_latest`.
+    Retorna None se o snapshot estiver vazio.
+    """
+    from app.models import Indicador, Municipio
+
+    versao = obter_versao_dados(db_session)
+    vetores = ler_todos_vetores(db_session)
+    if vetores is not None:
+        versao, codigos_com_dados, variaveis, valores_com_dados = vetores
+    else:
+        codigos_com_dados, variaveis, valores_com_dados = pivotar_snapshot(db_session)
+    if not codigos_com_dados:
+        return None
+
+    nomes = {codigo: nome for codigo, nome in db_session.query(Municipio.codigo_ibge, Municipio.nome).all()}
+    pesos: Dict[str, float] = {}
+    impactos: Dict[str, int] = {}
+    for id_ind, peso, impacto in db_session.query(Indicador.id, Indicador.peso, Indicador.impacto).all():
+        pesos[id_ind] = peso
+        impactos[id_ind] = impacto
+
+    # Municípios cadastrados sem nenhum dado entram com a linha toda NaN.
+    codigos = sorted(nomes.keys() | set(codigos_com_dados))
+    linha_por_codigo = {codigo: idx for idx, codigo in enumerate(codigos)}
+    valores = np.full((len(codigos), len(variaveis)), np.nan, dtype=np.float64)
+    idx_linhas = np.fromiter(
+        (linha_por_codigo[codigo] for codigo in codigos_com_dados), dtype=np.intp, count=len(codigos_com_dados)
+    )
+    valores[idx_linhas] = valores_com_dados
+
+    return MatrizResidente(versao, codigos, variaveis, valores, nomes, pesos, impactos)
+
+
+_residente: Optional[MatrizResidente] = None
+_ultima_verificacao = 0.0
+_lock_recarga = threading.Lock()
+
+
+def recarregar_matriz_residente(db_session) -> Optional[MatrizResidente]:
+    """Recarrega a matriz e a publica atomicamente como a nova referência global."""
+    global _residente, _ultima_verificacao
+
+    inicio = time.perf_counter()
+    nova = carregar_matriz_residente(db_session)
+    _residente = nova
+    _ultima_verificacao = time.monotonic()
+
+    if nova is None:
+        logger.info("ℹ️ Snapshot vazio: matriz residente desativada (fallback via SQL).")
+    else:
+        logger.info(
+            f"✅ Matriz residente v{nova.versao}: {len(nova.codigos)} municípios x "
+            f"{len(nova.variaveis)} variáveis em {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
+    return nova
+
+
+def matriz_residente_atual() -> Optional[MatrizResidente]:
+    """Referência atual, sem verificar a versão dos dados."""
+    return _residente
+
+
+def obter_matriz_residente(db_session) -> Optional[MatrizResidente]:
+    """
+    Retorna a matriz residente, consultando a versão dos dados no máximo a cada
+    INTERVALO_VERIFICACAO_S. Apenas uma thread recarrega; as demais seguem com a versão anterior.
+    """
+    global _ultima_verificacao
+
+    atual = _residente
+    if time.monotonic() - _ultima_verificacao < INTERVALO_VERIFICACAO_S:
+        return atual
+
+    if not _lock_recarga.acquire(blocking=atual is None):
+        return atual
+    try:
+        if time.monotonic() - _ultima_verificacao < INTERVALO_VERIFICACAO_S:
+            return _residente
+        _ultima_verificacao = time.monotonic()
+        versao = obter_versao_dados(db_session)
+        if atual is None or atual.versao != versao:
+            return recarregar_matriz_residente(db_session)
+        return atual
+    finally:
+        _lock_recarga.release()
@@ -0,0 +1,136 @@
+"""Normalização global do TOPSIS (normas e ideais sobre todos os municípios).
+
+No modo local o divisor da normalização vetorial usa apenas as cidades da
+requisição, então a pontuação de uma cidade muda conforme a seleção. No modo
+global as normas de coluna (e, opcionalmente, as soluções ideais) são
+calculadas uma única vez sobre a matriz residente nacional, por versão dos
+dados, e ranquear qualquer subconjunto custa apenas O(k·m).
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.topsis_core import _formatar_resultados
+
+
+class NormasGlobais:
+    """Normas, valores de preenchimento e vetores ponderados nacionais para um conjunto de pesos/impactos."""
+
+    def __init__(
+        self,
+        versao: int,
+        indicadores: List[str],
+        pior_valor: np.ndarray,
+        norma: np.ndarray,
+        pesos: np.ndarray,
+        beneficio: np.ndarray,
+        ponderada: np.ndarray,
+    ):
+        self.versao = versao
+        self.indicadores = indicadores
+        self.indice_indicador: Dict[str, int] = {ind: idx for idx, ind in enumerate(indicadores)}
+        self.pior_valor = pior_valor
+        self.norma = norma
+        self.pesos = pesos
+        self.beneficio = beneficio
+        # Vetor ponderado normalizado de cada município com algum dado nas variáveis do plano.
+        self.ponderada = ponderada
+
+        maximo = ponderada.max(axis=0)
+        minimo = ponderada.min(axis=0)
+        self.sip = np.where(beneficio, maximo, minimo)
+        self.sin = np.where(beneficio, minimo, maximo)
+
+    def ponderar(self, matriz: np.ndarray) -> tuple:
+        """Preenche ausências e aplica normas e pesos nacionais; retorna (ponderada, preenchida)."""
+        matriz = np.where(np.isnan(matriz), self.pior_valor, matriz)
+        return matriz * (self.pesos / self.norma), matriz
+
+
+def calcular_normas_globais(residente, plano, pesos: dict, impactos: dict) -> NormasGlobais:
+    """
+    Calcula as normas nacionais a partir da matriz residente e do plano de indicadores.
+    Municípios sem nenhum indicador observado ficam de fora: preenchidos com o pior valor,
+    eles inflariam as normas e deslocariam a anti-ideal conforme a cobertura dos dados.
+    """
+    matriz = plano.montar_matriz(residente.brutos_do_plano(plano))
+    matriz = matriz[~np.isnan(matriz).all(axis=1)]
+
+    ausentes = np.isnan(matriz)
+    colunas_validas = ~ausentes.all(axis=0)
+    matriz = matriz[:, colunas_validas]
+    ausentes = ausentes[:, colunas_validas]
+    indicadores = [ind for ind, valida in zip(plano.indicadores, colunas_validas) if valida]
+
+    vetor_pesos = np.array([pesos.get(ind, 0.0) for ind in indicadores], dtype=np.float64)
+    beneficio = np.array([impactos.get(ind, 1) == 1 for ind in indicadores], dtype=bool)
+
+    # Mesma regra de ausência do modo local, mas com o pior valor nacional.
+    pior_valor = np.where(beneficio, 0.0, np.nanmax(matriz, axis=0))
+    matriz = np.where(ausentes, pior_valor, matriz)
+
+    norma = np.sqrt(np.einsum("ij,ij->j", matriz, matriz))
+    norma[norma == 0] = 1.0
+    ponderada = matriz * (vetor_pesos / norma)
+
+    return NormasGlobais(residente.versao, indicadores, pior_valor, norma, vetor_pesos, beneficio, ponderada)
+
+
+_normas_cache: Optional[NormasGlobais] = None
+_normas_chave: Optional[tuple] = None
+_normas_lock = threading.Lock()
+
+
+def obter_normas_globais(residente, plano, pesos: dict, impactos: dict) -> NormasGlobais:
+    """Retorna as normas da versão atual dos dados, recalculando só quando versão, plano ou metadados mudam."""
+    global _normas_cache, _normas_chave
+
+    chave = (
+        id(residente),
+        residente.versao,
+        plano.hash_config,
+        tuple(pesos.get(ind, 0.0) for ind in plano.indicadores),
+        tuple(impactos.get(ind, 1) for ind in plano.indicadores),
+    )
+    if _normas_cache is not None and _normas_chave == chave:
+        return _normas_cache
+
+    with _normas_lock:
+        if _normas_cache is None or _normas_chave != chave:
+            _normas_cache = calcular_normas_globais(residente, plano, pesos, impactos)
+            _normas_chave = chave
+        return _normas_cache
+
+
+def aplicar_topsis_global(df: pd.DataFrame, normas: NormasGlobais, ideais_globais: bool = False) -> List[dict]:
+    """
+    TOPSIS com normas nacionais. `df` deve trazer as colunas do plano completo
+    (preparar_matriz_decisao com manter_colunas_vazias=True), já com simulações aplicadas.
+    Com `ideais_globais` a SIP/SIN também são as nacionais; caso contrário, as do subconjunto.
+    """
+    if df.empty or not normas.indicadores:
+        return []
+
+    matriz = df.loc[:, normas.indicadores].to_numpy(dtype=np.float64, na_value=np.nan)
+    pond, preenchida = normas.ponderar(matriz)
+
+    if ideais_globais:
+        sip, sin = normas.sip, normas.sin
+    else:
+        maximo = pond.max(axis=0)
+        minimo = pond.min(axis=0)
+        sip = np.where(normas.beneficio, maximo, minimo)
+        sin = np.where(normas.beneficio, minimo, maximo)
+
+    dist_positiva = np.sqrt(np.square(pond - sip).sum(axis=1))
+    dist_negativa = np.sqrt(np.square(pond - sin).sum(axis=1))
+    soma_distancias = dist_positiva + dist_negativa
+    soma_distancias[soma_distancias == 0] = 1.0
+    pontuacao = dist_negativa / soma_distancias
+
+    return _formatar_resultados(df.index, normas.indicadores, preenchida, pontuacao, dist_positiva, dist_negativa)
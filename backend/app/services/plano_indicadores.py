@@ -0,0 +1,141 @@
+"""Plano compilado de indicadores para montagem vetorizada da matriz de decisão.
+
+Percorre `etl_config.INDICADORES` uma única vez e traduz as regras de cálculo
+(direto, porcentagem, taxa_100k) em arrays de índices inteiros sobre uma matriz
+bruta (cidades x variáveis). Com o plano, a matriz de decisão inteira vira uma
+única divisão com broadcast, em vez de buscas em dicionário por cidade.
+
+O plano é compilado uma vez (na inicialização da API) e fica em cache até
+`invalidar_plano`, chamado por quem grava metadados de indicadores ou altera as
+regras; ele não depende dos valores carregados, então cargas do ETL não o
+recompilam. `hash_config` (hash de INDICADORES e DADOS_BASE, calculado na
+compilação) identifica o conteúdo do plano para os caches derivados.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app import etl_config
+
+
+class PlanoIndicadores:
+    """Estrutura imutável com as colunas brutas, os indicadores de saída e os índices de cálculo."""
+
+    def __init__(self, indicadores: List[str], variaveis: List[str], regras: List[tuple], hash_config: str = ""):
+        self.indicadores = indicadores
+        # Identifica o conteúdo do plano para caches derivados (não usar id(), que é reaproveitado).
+        self.hash_config = hash_config
+        self.variaveis = variaveis
+        self.indice_variavel: Dict[str, int] = {var: idx for idx, var in enumerate(variaveis)}
+        self.indice_indicador: Dict[str, int] = {ind: idx for idx, ind in enumerate(indicadores)}
+
+        self.direto = np.array([regra[0] for regra in regras], dtype=bool)
+        self.idx_numerador = np.array([regra[1] for regra in regras], dtype=np.intp)
+        # Para indicadores diretos o denominador aponta para a própria variável (ignorado no cálculo).
+        self.idx_denominador = np.array([regra[2] for regra in regras], dtype=np.intp)
+        self.multiplicador = np.array([regra[3] for regra in regras], dtype=np.float64)
+
+        # Variável bruta -> indicadores que a usam (como valor direto, numerador ou denominador).
+        self.indicadores_por_variavel: Dict[int, np.ndarray] = {}
+        for idx_var in range(len(variaveis)):
+            usa = (self.idx_numerador == idx_var) | (~self.direto & (self.idx_denominador == idx_var))
+            self.indicadores_por_variavel[idx_var] = np.flatnonzero(usa)
+
+    def matriz_bruta_vazia(self, n_linhas: int) -> np.ndarray:
+        return np.full((n_linhas, len(self.variaveis)), np.nan, dtype=np.float64)
+
+    def montar_matriz(self, brutos: np.ndarray, indicadores: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Converte a matriz bruta (linhas x variáveis) na matriz de indicadores (linhas x indicadores).
+        Com `indicadores` (índices) calcula apenas essas colunas, na ordem informada.
+        """
+        if indicadores is None:
+            indicadores = slice(None)
+        direto = self.direto[indicadores]
+        numerador = brutos[:, self.idx_numerador[indicadores]]
+        denominador = np.where(direto, 1.0, brutos[:, self.idx_denominador[indicadores]])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matriz = (numerador / denominador) * self.multiplicador[indicadores]
+
+        # Taxas sem denominador positivo são tratadas como ausência de dado.
+        invalido = ~direto & ~(denominador > 0)
+        matriz[invalido] = np.nan
+        return matriz
+
+
+_plano_cache: Optional[PlanoIndicadores] = None
+_plano_lock = threading.Lock()
+
+
+def _hash_config() -> str:
+    """Impressão digital do conteúdo das regras: muda com qualquer edição, não com a identidade dos objetos."""
+    conteudo = json.dumps(
+        [etl_config.INDICADORES, etl_config.DADOS_BASE], sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha1(conteudo.encode("utf-8")).hexdigest()
+
+
+def compilar_plano() -> PlanoIndicadores:
+    """Compila o plano a partir das regras validadas do etl_config."""
+    from app.services.topsis_core import _indicadores_validos_para_topsis
+
+    validos = set(_indicadores_validos_para_topsis())
+    indicadores: List[str] = []
+    variaveis: List[str] = []
+    indice: Dict[str, int] = {}
+    regras_compiladas: List[tuple] = []
+
+    def _idx(variavel: str) -> int:
+        if variavel not in indice:
+            indice[variavel] = len(variaveis)
+            variaveis.append(variavel)
+        return indice[variavel]
+
+    for _, indicadores_dominio in etl_config.INDICADORES.items():
+        for id_ind, regras in indicadores_dominio.items():
+            if id_ind not in validos:
+                continue
+
+            if regras.get("tipo_calculo") == "direto":
+                idx = _idx(id_ind)
+                regras_compiladas.append((True, idx, idx, 1.0))
+            else:
+                denominador_chave = regras.get("denominador")
+                if not denominador_chave:
+                    # Sem denominador a taxa nunca é calculável; a coluna seria descartada.
+                    continue
+                idx_num = _idx(f"{id_ind}_numerador")
+                idx_den = _idx(denominador_chave)
+                regras_compiladas.append((False, idx_num, idx_den, float(regras.get("multiplicador", 1))))
+
+            indicadores.append(id_ind)
+
+    return PlanoIndicadores(indicadores, variaveis, regras_compiladas, _hash_config())
+
+
+def obter_plano() -> PlanoIndicadores:
+    """Retorna o plano compilado, compilando-o apenas na primeira chamada após a carga ou `invalidar_plano`."""
+    global _plano_cache
+
+    plano = _plano_cache
+    if plano is not None:
+        return plano
+
+    with _plano_lock:
+        if _plano_cache is None:
+            _plano_cache = compilar_plano()
+        return _plano_cache
+
+
+def invalidar_plano() -> None:
+    """Descarta o plano compilado (ex.: após gravar metadados de indicadores ou alterar as regras)."""
+    global _plano_cache
+    with _plano_lock:
+        _plano_cache = None
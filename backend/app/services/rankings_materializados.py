@@ -0,0 +1,150 @@
+"""Rankings TOPSIS nacional e por UF materializados por versão dos dados.
+
+Consultas como "todos os municípios do PR" ou "top 100 do Brasil" não precisam
+remontar a matriz e rodar o TOPSIS sobre milhares de cidades a cada requisição:
+o job roda ao final do ETL (ou via CLI em tools/materializar_rankings.py) e grava
+posição, pontuação e distâncias em `rankings_topsis`. A leitura usa os índices
+(escopo, posicao) e (codigo_ibge), ou seja, O(log n) por consulta.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, insert
+
+from app.models import Municipio, RankingTopsis
+from app.services.matriz_residente import carregar_matriz_residente
+from app.services.plano_indicadores import obter_plano
+from app.services.topsis_core import completar_pesos_impactos, topsis_matricial
+
+logger = logging.getLogger(__name__)
+
+ESCOPO_NACIONAL = "BR"
+
+
+def _ranquear(escopo: str, codigos: List[str], matriz: np.ndarray, pesos: np.ndarray, impactos: np.ndarray, versao: int) -> List[dict]:
+    _, _, pontuacao, dist_positiva, dist_negativa = topsis_matricial(matriz, pesos, impactos)
+    ordem = np.argsort(-pontuacao, kind="stable")
+    return [
+        {
+            "escopo": escopo,
+            "codigo_ibge": codigos[idx],
+            "posicao": posicao,
+            "pontuacao": float(pontuacao[idx]),
+            "distancia_positiva": float(dist_positiva[idx]),
+            "distancia_negativa": float(dist_negativa[idx]),
+            "versao": versao,
+        }
+        for posicao, idx in enumerate(ordem.tolist(), start=1)
+    ]
+
+
+def materializar_rankings(db_session) -> Dict[str, int]:
+    """Recalcula o ranking nacional e os estaduais e substitui o conteúdo de `rankings_topsis`."""
+    inicio = time.perf_counter()
+    residente = carregar_matriz_residente(db_session)
+    if residente is None:
+        logger.warning("⚠️ Snapshot vazio: nenhum ranking materializado.")
+        return {}
+
+    plano = obter_plano()
+    matriz = plano.montar_matriz(residente.brutos_do_plano(plano))
+
+    pesos = dict(residente.pesos)
+    impactos = dict(residente.impactos)
+    completar_pesos_impactos(plano.indicadores, pesos, impactos)
+    vetor_pesos = np.array([pesos[ind] for ind in plano.indicadores], dtype=np.float64)
+    vetor_impactos = np.array([impactos[ind] for ind in plano.indicadores])
+
+    # Só entram no ranking municípios cadastrados e com ao menos um indicador informado.
+    uf_por_codigo = dict(db_session.query(Municipio.codigo_ibge, Municipio.estado).all())
+    com_dados = ~np.isnan(matriz).all(axis=1)
+    linhas = [
+        idx for idx, codigo in enumerate(residente.codigos)
+        if com_dados[idx] and codigo in uf_por_codigo
+    ]
+
+    escopos: Dict[str, List[int]] = {ESCOPO_NACIONAL: linhas}
+    for idx in linhas:
+        uf = uf_por_codigo[residente.codigos[idx]]
+        if uf:
+            escopos.setdefault(uf, []).append(idx)
+
+    registros: List[dict] = []
+    totais: Dict[str, int] = {}
+    for escopo, idx_escopo in escopos.items():
+        if not idx_escopo:
+            continue
+        codigos = [residente.codigos[idx] for idx in idx_escopo]
+        registros.extend(
+            _ranquear(escopo, codigos, matriz[idx_escopo], vetor_pesos, vetor_impactos, residente.versao)
+        )
+        totais[escopo] = len(idx_escopo)
+
+    # Substituição atômica: leitores veem a versão anterior até o commit.
+    db_session.query(RankingTopsis).delete(synchronize_session=False)
+    if registros:
+        db_session.execute(insert(RankingTopsis), registros)
+    db_session.commit()
+
+    logger.info(
+        f"✅ Rankings materializados (versão {residente.versao}): {len(totais)} escopos, "
+        f"{len(registros)} linhas em {time.perf_counter() - inicio:.2f}s"
+    )
+    return totais
+
+
+def _serializar(registro: RankingTopsis, nome: Optional[str], total: Optional[int] = None) -> dict:
+    item = {
+        "escopo": registro.escopo,
+        "posicao": registro.posicao,
+        "codigo_ibge": registro.codigo_ibge,
+        "nome_cidade": nome or f"IBGE {registro.codigo_ibge}",
+        "pontuacao_topsis": round(registro.pontuacao, 4),
+        "distancia_positiva": round(registro.distancia_positiva, 4),
+        "distancia_negativa": round(registro.distancia_negativa, 4),
+        "versao": registro.versao,
+    }
+    if total is not None:
+        item["total_no_escopo"] = total
+    return item
+
+
+def buscar_top_ranking(db_session, escopo: str, limite: int, offset: int = 0) -> List[dict]:
+    """Top-N de um escopo via índice (escopo, posicao)."""
+    registros = (
+        db_session.query(RankingTopsis, Municipio.nome)
+        .outerjoin(Municipio, Municipio.codigo_ibge == RankingTopsis.codigo_ibge)
+        .filter(RankingTopsis.escopo == escopo, RankingTopsis.posicao > offset)
+        .order_by(RankingTopsis.posicao.asc())
+        .limit(limite)
+        .all()
+    )
+    return [_serializar(registro, nome) for registro, nome in registros]
+
+
+def buscar_posicoes_cidade(db_session, codigo_ibge: str) -> List[dict]:
+    """Posição da cidade no ranking nacional e no estadual, com o total de cada escopo."""
+    registros = (
+        db_session.query(RankingTopsis, Municipio.nome)
+        .outerjoin(Municipio, Municipio.codigo_ibge == RankingTopsis.codigo_ibge)
+        .filter(RankingTopsis.codigo_ibge == codigo_ibge)
+        .all()
+    )
+
+    posicoes = []
+    for registro, nome in registros:
+        # MAX(posicao) por escopo é resolvido pelo índice (escopo, posicao) sem varrer o escopo.
+        total = (
+            db_session.query(func.max(RankingTopsis.posicao))
+            .filter(RankingTopsis.escopo == registro.escopo)
+            .scalar()
+        )
+        posicoes.append(_serializar(registro, nome, total))
+
+    posicoes.sort(key=lambda item: (item["escopo"] != ESCOPO_NACIONAL, item["escopo"]))
+    return posicoes
@@ -0,0 +1,113 @@
+"""Filtro por lista de cidades que escala para seleções nacionais.
+
+Até `LIMITE_IN_CIDADES` códigos o filtro continua um `IN (...)` com um parâmetro
+por cidade. Acima disso (rankings nacionais ou de vários estados), em vez de
+milhares de parâmetros — que estouram o limite de variáveis do SQLite e geram
+planos ruins —, a seleção vira uma tabela e o filtro um semi-join:
+
+- SQLite: tabela temporária da conexão (`temp.selecao_cidades`, chave primária
+  em codigo_ibge). Ela só é recarregada quando a seleção muda; a impressão
+  digital fica numa tabela temporária irmã, então um rollback desfaz as duas juntas.
+  Conexões do pool de leitura (`query_only`, que barra até tabelas temporárias)
+  usam um parâmetro JSON único expandido por `json_each`;
+- demais dialetos (PostgreSQL): parâmetro JSON único expandido por
+  `json_array_elements_text`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import JSON, bindparam, column, func, select, table, text
+
+LIMITE_IN_CIDADES = int(os.getenv("URBIX_LIMITE_IN_CIDADES", "500"))
+
+TABELA_SELECAO = "selecao_cidades"
+_TABELA_IMPRESSAO = "selecao_cidades_impressao"
+
+
+def _conexao(db_session):
+    return db_session.connection() if hasattr(db_session, "get_bind") else db_session
+
+
+def _somente_leitura(conn) -> bool:
+    return bool(conn.info.get("somente_leitura"))
+
+
+def _impressao(cidades: List[str]) -> str:
+    return hashlib.sha1("\n".join(cidades).encode("utf-8")).hexdigest()
+
+
+def _carregar_tabela_temporaria(conn, cidades: List[str]) -> None:
+    """Garante que `temp.selecao_cidades` contenha exatamente a seleção pedida."""
+    conn.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {TABELA_SELECAO} (codigo_ibge VARCHAR PRIMARY KEY) WITHOUT ROWID"
+    ))
+    conn.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS {_TABELA_IMPRESSAO} (impressao VARCHAR)"))
+
+    impressao = _impressao(cidades)
+    if conn.execute(text(f"SELECT impressao FROM temp.{_TABELA_IMPRESSAO}")).scalar() == impressao:
+        return
+
+    conn.execute(text(f"DELETE FROM temp.{TABELA_SELECAO}"))
+    conn.execute(
+        text(f"INSERT INTO temp.{TABELA_SELECAO} (codigo_ibge) VALUES (:codigo)"),
+        [{"codigo": codigo} for codigo in cidades],
+    )
+    conn.execute(text(f"DELETE FROM temp.{_TABELA_IMPRESSAO}"))
+    conn.execute(text(f"INSERT INTO temp.{_TABELA_IMPRESSAO} (impressao) VALUES (:impressao)"), {"impressao": impressao})
+
+
+def _distintas(cidades: Iterable[str]) -> List[str]:
+    return sorted({str(codigo) for codigo in cidades})
+
+
+def usar_selecao_em_tabela(cidades: List[str]) -> bool:
+    return len(cidades) > LIMITE_IN_CIDADES
+
+
+def filtro_cidades(db_session, coluna, cidades: Iterable[str]):
+    """Condição `coluna IN seleção` para o ORM, escolhendo a estratégia pelo tamanho da seleção."""
+    cidades = _distintas(cidades)
+    if not usar_selecao_em_tabela(cidades):
+        return coluna.in_(cidades)
+
+    conn = _conexao(db_session)
+    parametro = bindparam("cidades_json", value=cidades, type_=JSON, unique=True)
+    if conn.dialect.name == "sqlite":
+        if _somente_leitura(conn):
+            return coluna.in_(select(func.json_each(parametro).table_valued("value").c.value))
+        _carregar_tabela_temporaria(conn, cidades)
+        selecao = table(TABELA_SELECAO, column("codigo_ibge"), schema="temp")
+        return coluna.in_(select(selecao.c.codigo_ibge))
+
+    elementos = func.json_array_elements_text(parametro).table_valued("value")
+    return coluna.in_(select(elementos.c.value))
+
+
+def sql_in_cidades(db_session, cidades: Iterable[str], nome: str = "cidades") -> Tuple[str, list]:
+    """
+    Equivalente para SQL textual: devolve (expressão após `IN`, bindparams a vincular).
+    Seleções pequenas usam o parâmetro expansível `:<nome>`.
+    """
+    cidades = _distintas(cidades)
+    if not usar_selecao_em_tabela(cidades):
+        return f":{nome}", [bindparam(nome, value=cidades, expanding=True)]
+
+    conn = _conexao(db_session)
+    if conn.dialect.name == "sqlite":
+        if _somente_leitura(conn):
+            return (
+                f"(SELECT value FROM json_each(:{nome}_json))",
+                [bindparam(f"{nome}_json", value=json.dumps(cidades))],
+            )
+        _carregar_tabela_temporaria(conn, cidades)
+        return f"(SELECT codigo_ibge FROM temp.{TABELA_SELECAO})", []
+
+    return (
+        f"(SELECT value FROM json_array_elements_text(CAST(:{nome}_json AS json)))",
+        [bindparam(f"{nome}_json", value=json.dumps(cidades))],
+    )
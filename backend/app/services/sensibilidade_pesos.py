@@ -0,0 +1,121 @@
+"""Análise de sensibilidade do ranking TOPSIS a variações de pesos (Monte Carlo).
+
+Sorteia milhares de vetores de pesos de uma Dirichlet centrada nos pesos
+cadastrados (`Indicador.peso`) e mede quão estável é a posição de cada cidade.
+A matriz é preenchida e normalizada uma única vez (`diferencas_ideais`); cada
+lote de amostras custa dois produtos matriciais. Posições e pontuações não são
+guardadas por amostra: cada lote só incrementa histogramas de tamanho fixo
+(cidades x posições e cidades x faixas de pontuação), então a memória não
+cresce com o número de amostras.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.services.topsis_core import diferencas_ideais, posicoes_por_pontuacao
+
+# Resolução do histograma de pontuações (pontuações TOPSIS estão em [0, 1]).
+FAIXAS_PONTUACAO = 1000
+PERCENTIS = (5, 25, 50, 75, 95)
+
+# Limite de elementos por matriz intermediária de um lote (~16 MB em float64).
+ELEMENTOS_POR_LOTE = 2_000_000
+
+
+def _sortear_pesos(rng: np.random.Generator, alpha: np.ndarray, n_amostras: int) -> np.ndarray:
+    # Dirichlet via Gammas normalizadas: equivalente a rng.dirichlet, porém vetorizado por lote.
+    gammas = rng.standard_gamma(alpha, size=(n_amostras, alpha.shape[0]))
+    return gammas / gammas.sum(axis=1, keepdims=True)
+
+
+def _percentis_do_histograma(histograma: np.ndarray, n_amostras: int) -> Dict[str, np.ndarray]:
+    """Percentis por cidade a partir do histograma de pontuações, com interpolação linear dentro da faixa."""
+    acumulado = np.cumsum(histograma, axis=1)
+    percentis = {}
+    for p in PERCENTIS:
+        alvo = max(p / 100 * n_amostras, 1e-12)
+        faixa = (acumulado < alvo).sum(axis=1)
+        linhas = np.arange(histograma.shape[0])
+        anterior = np.where(faixa > 0, acumulado[linhas, np.maximum(faixa - 1, 0)], 0)
+        contagem = histograma[linhas, faixa]
+        fracao = np.where(contagem > 0, (alvo - anterior) / np.maximum(contagem, 1), 0.0)
+        percentis[f"p{p}"] = np.clip((faixa + fracao) / FAIXAS_PONTUACAO, 0.0, 1.0)
+    return percentis
+
+
+def analisar_sensibilidade(
+    matriz: np.ndarray,
+    pesos: np.ndarray,
+    impactos: np.ndarray,
+    amostras: int = 10_000,
+    concentracao: float = 50.0,
+    semente: Optional[int] = None,
+    tamanho_lote: Optional[int] = None,
+) -> dict:
+    """
+    Monte Carlo de pesos sobre a matriz (cidades x indicadores, NaN = ausência).
+
+    Os pesos amostrados seguem Dirichlet(concentracao * pesos / soma(pesos)): a média é o
+    vetor de pesos informado e `concentracao` controla a dispersão (maior = mais próximo da base).
+    Indicadores com peso zero continuam com peso zero.
+    Retorna arrays por cidade: contagem de posições, probabilidade de 1º lugar, posição média
+    e percentis de pontuação, além das colunas válidas usadas.
+    """
+    colunas_validas, quad_positivos, quad_negativos = diferencas_ideais(matriz, impactos)
+    pesos = np.asarray(pesos, dtype=np.float64)[colunas_validas]
+    n_cidades, n_colunas = quad_positivos.shape
+
+    ativos = pesos > 0
+    if n_cidades == 0 or not ativos.any():
+        raise ValueError("A análise de sensibilidade exige cidades com dados e ao menos um peso positivo.")
+
+    alpha = concentracao * pesos[ativos] / pesos[ativos].sum()
+    quad_positivos = quad_positivos[:, ativos]
+    quad_negativos = quad_negativos[:, ativos]
+
+    if tamanho_lote is None:
+        tamanho_lote = max(64, ELEMENTOS_POR_LOTE // max(n_cidades, n_colunas))
+
+    rng = np.random.default_rng(semente)
+    base_linha = np.arange(n_cidades)[None, :]
+    contagem_posicoes = np.zeros(n_cidades * n_cidades, dtype=np.int64)
+    histograma = np.zeros(n_cidades * FAIXAS_PONTUACAO, dtype=np.int64)
+    soma_pontuacoes = np.zeros(n_cidades, dtype=np.float64)
+
+    restantes = amostras
+    while restantes > 0:
+        lote = min(tamanho_lote, restantes)
+        restantes -= lote
+
+        pesos_quadrado_t = np.square(_sortear_pesos(rng, alpha, lote)).T
+        dist_positivas = np.sqrt(quad_positivos @ pesos_quadrado_t).T
+        dist_negativas = np.sqrt(quad_negativos @ pesos_quadrado_t).T
+        soma_distancias = dist_positivas + dist_negativas
+        soma_distancias[soma_distancias == 0] = 1.0
+        pontuacoes = dist_negativas / soma_distancias
+
+        posicoes = posicoes_por_pontuacao(pontuacoes)
+        contagem_posicoes += np.bincount(
+            (base_linha * n_cidades + posicoes - 1).ravel(), minlength=n_cidades * n_cidades
+        )
+        faixas = np.minimum((pontuacoes * FAIXAS_PONTUACAO).astype(np.intp), FAIXAS_PONTUACAO - 1)
+        histograma += np.bincount(
+            (base_linha * FAIXAS_PONTUACAO + faixas).ravel(), minlength=n_cidades * FAIXAS_PONTUACAO
+        )
+        soma_pontuacoes += pontuacoes.sum(axis=0)
+
+    contagem_posicoes = contagem_posicoes.reshape(n_cidades, n_cidades)
+    histograma = histograma.reshape(n_cidades, FAIXAS_PONTUACAO)
+    posicoes_possiveis = np.arange(1, n_cidades + 1)
+
+    return {
+        "colunas_validas": colunas_validas,
+        "contagem_posicoes": contagem_posicoes,
+        "probabilidade_primeiro": contagem_posicoes[:, 0] / amostras,
+        "posicao_media": contagem_posicoes @ posicoes_possiveis / amostras,
+        "pontuacao_media": soma_pontuacoes / amostras,
+        "percentis_pontuacao": _percentis_do_histograma(histograma, amostras),
+    }
@@ -0,0 +1,144 @@
+"""Sessões de simulação mantidas no servidor.
+
+Uma sessão guarda a matriz bruta de um conjunto de cidades (já com as
+simulações iniciais) e o estado TOPSIS incremental correspondente. O frontend
+envia apenas os valores alterados (PATCH) e recebe só as cidades cuja posição,
+pontuação ou valores mudaram, sem reenviar a lista de cidades nem refazer
+consultas ao banco.
+
+As sessões ficam em um dicionário ordenado com expiração por inatividade (TTL)
+e descarte da menos usada (LRU) quando o limite é atingido. Cada sessão usa a
+versão dos dados vigente na abertura; uma recarga do ETL não altera sessões já abertas.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.topsis_incremental import TopsisIncremental
+
+TTL_SESSAO_S = float(os.getenv("URBIX_SESSAO_TTL_S", "1800"))
+MAX_SESSOES = int(os.getenv("URBIX_SESSOES_MAX", "100"))
+
+
+class SessaoSimulacao:
+    """Estado de uma sessão: motor incremental, nomes das cidades e o último ranking enviado."""
+
+    def __init__(self, motor: TopsisIncremental, nomes: Dict[str, str], versao_dados: int):
+        self.id = uuid.uuid4().hex
+        self.motor = motor
+        self.nomes = nomes
+        self.versao_dados = versao_dados
+        self.ultimo_acesso = time.monotonic()
+        self.lock = threading.Lock()
+        self._posicoes, self._valores = self._estado_ranking()
+
+    def _estado_ranking(self) -> tuple:
+        """Posição (1 = melhor) e (pontuação, d+, d-) arredondados por cidade, como na rota de ranking."""
+        pontuacao, dist_positiva, dist_negativa = self.motor.pontuacoes()
+        valores = [
+            (round(score, 4), round(d_pos, 4), round(d_neg, 4))
+            for score, d_pos, d_neg in zip(pontuacao.tolist(), dist_positiva.tolist(), dist_negativa.tolist())
+        ]
+        # Mesmo critério de `_formatar_resultados`: pontuação arredondada, empates na ordem das cidades.
+        ordem = np.argsort(-np.array([valor[0] for valor in valores], dtype=np.float64), kind="stable")
+        posicoes = np.empty(len(valores), dtype=np.intp)
+        posicoes[ordem] = np.arange(1, len(valores) + 1)
+        return posicoes, valores
+
+    def _item(self, linha: int, validas: List[tuple]) -> dict:
+        ibge = self.motor.cidades[linha]
+        pontuacao, dist_positiva, dist_negativa = self._valores[linha]
+        return {
+            "posicao": int(self._posicoes[linha]),
+            "codigo_ibge": ibge,
+            "nome_cidade": self.nomes.get(ibge, f"IBGE {ibge}"),
+            "pontuacao_topsis": pontuacao,
+            "distancia_positiva": dist_positiva,
+            "distancia_negativa": dist_negativa,
+            "valores_calculados": {
+                nome: float(self.motor.preenchida[linha, coluna]) for coluna, nome in validas
+            },
+        }
+
+    def _colunas_validas(self) -> List[tuple]:
+        return [
+            (coluna, nome)
+            for coluna, nome in enumerate(self.motor.plano.indicadores)
+            if self.motor.presentes[coluna] > 0
+        ]
+
+    def ranking(self) -> List[dict]:
+        """Ranking completo, do melhor para o pior."""
+        validas = self._colunas_validas()
+        return [self._item(linha, validas) for linha in np.argsort(self._posicoes).tolist()]
+
+    def aplicar(self, simulacoes: List[dict]) -> List[dict]:
+        """Aplica os deltas e devolve apenas as cidades com posição, pontuação ou valores alterados."""
+        editadas = set()
+        for sim in simulacoes:
+            if self.motor.atualizar(sim.get("codigo_ibge"), sim.get("valores_brutos", {})):
+                editadas.add(self.motor.linha_por_cidade[sim["codigo_ibge"]])
+
+        posicoes_anteriores, valores_anteriores = self._posicoes, self._valores
+        self._posicoes, self._valores = self._estado_ranking()
+
+        alteradas = np.flatnonzero(posicoes_anteriores != self._posicoes).tolist()
+        alteradas.extend(
+            linha for linha, (antes, depois) in enumerate(zip(valores_anteriores, self._valores)) if antes != depois
+        )
+        alteradas.extend(editadas)
+
+        validas = self._colunas_validas()
+        linhas = sorted(set(alteradas), key=lambda linha: self._posicoes[linha])
+        return [self._item(linha, validas) for linha in linhas]
+
+
+_sessoes: "OrderedDict[str, SessaoSimulacao]" = OrderedDict()
+_lock_sessoes = threading.Lock()
+
+
+def _remover_expiradas(agora: float) -> None:
+    # A ordem LRU coincide com a ordem de último acesso: as expiradas estão no início.
+    while _sessoes:
+        sessao = next(iter(_sessoes.values()))
+        if agora - sessao.ultimo_acesso < TTL_SESSAO_S:
+            break
+        _sessoes.popitem(last=False)
+
+
+def registrar_sessao(sessao: SessaoSimulacao) -> SessaoSimulacao:
+    """Guarda a sessão, descartando expiradas e, acima do limite, as menos usadas."""
+    with _lock_sessoes:
+        agora = time.monotonic()
+        _remover_expiradas(agora)
+        sessao.ultimo_acesso = agora
+        _sessoes[sessao.id] = sessao
+        while len(_sessoes) > MAX_SESSOES:
+            _sessoes.popitem(last=False)
+    return sessao
+
+
+def obter_sessao(sessao_id: str) -> Optional[SessaoSimulacao]:
+    """Retorna a sessão ativa (renovando o TTL) ou None se não existe ou expirou."""
+    with _lock_sessoes:
+        agora = time.monotonic()
+        _remover_expiradas(agora)
+        sessao = _sessoes.get(sessao_id)
+        if sessao is None:
+            return None
+        sessao.ultimo_acesso = agora
+        _sessoes.move_to_end(sessao_id)
+        return sessao
+
+
+def encerrar_sessao(sessao_id: str) -> bool:
+    with _lock_sessoes:
+        return _sessoes.pop(sessao_id, None) is not None
@@ -0,0 +1,201 @@
+"""Manutenção incremental de `valores_indicadores_latest`.
+
+Triggers em `valores_indicadores` mantêm o snapshot a cada escrita, em vez de
+apagar e reconstruir a tabela inteira ao fim de cada ETL:
+
+- INSERT: upsert da chave (codigo_ibge, id_indicador) apenas se a linha nova for
+  mais recente (ano maior, ou mesmo ano com id maior);
+- DELETE: se a linha apagada era a origem do snapshot, a chave é recalculada a
+  partir do fato (uma busca pelo índice (cidade, indicador, ano DESC, id DESC));
+- UPDATE: as duas coisas (a linha pode ter mudado de chave, ano ou valor).
+
+O custo de atualização passa a ser proporcional ao delta carregado, não ao
+tamanho do histórico. `reconstruir_snapshot_latest` continua disponível para
+reparo e para a primeira instalação dos triggers em bases já populadas.
+
+Com o armazenamento codificado (`armazenamento_valores`) os triggers ficam no
+fato de chaves inteiras e resolvem os textos pelas dimensões.
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+from sqlalchemy import text
+
+from app.services.armazenamento_valores import TABELA_FATOS, armazenamento_codificado
+from app.services.consulta_mais_recentes import sql_mais_recentes
+
+COLUNAS = "codigo_ibge, id_indicador, ano_referencia, valor, fonte, id_origem"
+
+_UPSERT_MAIS_RECENTE = """
+    INSERT INTO valores_indicadores_latest ({colunas})
+    VALUES ({codigo}, {indicador}, {ref}.ano_referencia, {ref}.valor, {fonte}, {ref}.id)
+    ON CONFLICT (codigo_ibge, id_indicador) DO UPDATE SET
+        ano_referencia = excluded.ano_referencia,
+        valor = excluded.valor,
+        fonte = excluded.fonte,
+        id_origem = excluded.id_origem
+    WHERE excluded.ano_referencia > valores_indicadores_latest.ano_referencia
+       OR (excluded.ano_referencia = valores_indicadores_latest.ano_referencia
+           AND excluded.id_origem >= valores_indicadores_latest.id_origem)
+"""
+
+_RECALCULAR_CHAVE = """
+    DELETE FROM valores_indicadores_latest
+    WHERE codigo_ibge = {codigo} AND id_indicador = {indicador} AND id_origem = {ref}.id;
+    INSERT INTO valores_indicadores_latest ({colunas})
+    SELECT v.codigo_ibge, v.id_indicador, v.ano_referencia, v.valor, v.fonte, v.id
+    FROM valores_indicadores v
+    WHERE v.codigo_ibge = {codigo} AND v.id_indicador = {indicador}
+    ORDER BY v.ano_referencia DESC, v.id DESC
+    LIMIT 1
+    ON CONFLICT (codigo_ibge, id_indicador) DO NOTHING
+"""
+
+
+def _colunas_texto(ref: str) -> dict:
+    return {
+        "colunas": COLUNAS,
+        "ref": ref,
+        "codigo": f"{ref}.codigo_ibge",
+        "indicador": f"{ref}.id_indicador",
+        "fonte": f"{ref}.fonte",
+    }
+
+
+def _colunas_codificadas(ref: str) -> dict:
+    # No fato codificado (armazenamento_valores) os textos vêm das dimensões.
+    return {
+        "colunas": COLUNAS,
+        "ref": ref,
+        "codigo": f"(SELECT codigo_ibge FROM dim_municipios WHERE id = {ref}.id_municipio)",
+        "indicador": f"(SELECT id_indicador FROM dim_indicadores WHERE id = {ref}.id_indicador)",
+        "fonte": f"(SELECT fonte FROM dim_fontes WHERE id = {ref}.id_fonte)",
+    }
+
+
+TRIGGERS_SQLITE = {
+    "trg_vi_latest_insert": f"""
+        CREATE TRIGGER trg_vi_latest_insert AFTER INSERT ON valores_indicadores BEGIN
+            {_UPSERT_MAIS_RECENTE.format(**_colunas_texto("new"))};
+        END
+    """,
+    "trg_vi_latest_delete": f"""
+        CREATE TRIGGER trg_vi_latest_delete AFTER DELETE ON valores_indicadores BEGIN
+            {_RECALCULAR_CHAVE.format(**_colunas_texto("old"))};
+        END
+    """,
+    "trg_vi_latest_update": f"""
+        CREATE TRIGGER trg_vi_latest_update AFTER UPDATE ON valores_indicadores BEGIN
+            {_RECALCULAR_CHAVE.format(**_colunas_texto("old"))};
+            {_UPSERT_MAIS_RECENTE.format(**_colunas_texto("new"))};
+        END
+    """,
+}
+
+# Mesmos triggers sobre o fato codificado, quando valores_indicadores é a VIEW.
+TRIGGERS_SQLITE_CODIFICADO = {
+    "trg_fvi_latest_insert": f"""
+        CREATE TRIGGER trg_fvi_latest_insert AFTER INSERT ON {TABELA_FATOS} BEGIN
+            {_UPSERT_MAIS_RECENTE.format(**_colunas_codificadas("new"))};
+        END
+    """,
+    "trg_fvi_latest_delete": f"""
+        CREATE TRIGGER trg_fvi_latest_delete AFTER DELETE ON {TABELA_FATOS} BEGIN
+            {_RECALCULAR_CHAVE.format(**_colunas_codificadas("old"))};
+        END
+    """,
+    "trg_fvi_latest_update": f"""
+        CREATE TRIGGER trg_fvi_latest_update AFTER UPDATE ON {TABELA_FATOS} BEGIN
+            {_RECALCULAR_CHAVE.format(**_colunas_codificadas("old"))};
+            {_UPSERT_MAIS_RECENTE.format(**_colunas_codificadas("new"))};
+        END
+    """,
+}
+
+FUNCAO_POSTGRES = f"""
+    CREATE OR REPLACE FUNCTION fn_vi_latest() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {_RECALCULAR_CHAVE.format(**_colunas_texto("OLD"))};
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {_UPSERT_MAIS_RECENTE.format(**_colunas_texto("NEW"))};
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+TRIGGER_POSTGRES = """
+    CREATE TRIGGER trg_vi_latest
+    AFTER INSERT OR UPDATE OR DELETE ON valores_indicadores
+    FOR EACH ROW EXECUTE FUNCTION fn_vi_latest()
+"""
+
+
+def _triggers_existentes(conn, tabela: str = "valores_indicadores") -> List[str]:
+    if conn.dialect.name == "sqlite":
+        linhas = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :tabela"
+        ), {"tabela": tabela}).all()
+    elif conn.dialect.name == "postgresql":
+        linhas = conn.execute(text(
+            "SELECT tgname FROM pg_trigger WHERE tgrelid = 'valores_indicadores'::regclass AND NOT tgisinternal"
+        )).all()
+    else:
+        return []
+    return [linha[0] for linha in linhas]
+
+
+def manutencao_incremental_ativa(conn) -> bool:
+    """Indica se os triggers de manutenção do snapshot estão instalados."""
+    if armazenamento_codificado(conn):
+        return set(TRIGGERS_SQLITE_CODIFICADO) <= set(_triggers_existentes(conn, TABELA_FATOS))
+    existentes = set(_triggers_existentes(conn))
+    if conn.dialect.name == "sqlite":
+        return set(TRIGGERS_SQLITE) <= existentes
+    return "trg_vi_latest" in existentes
+
+
+def instalar_manutencao_snapshot(engine) -> bool:
+    """
+    Instala os triggers (SQLite ou PostgreSQL) se ainda não existirem.
+    Retorna True quando algo foi instalado agora: nesse caso o snapshot pode estar
+    defasado em relação ao fato e deve ser reconstruído uma vez.
+    """
+    with engine.begin() as conn:
+        dialeto = conn.dialect.name
+
+        if dialeto == "sqlite":
+            if armazenamento_codificado(conn):
+                triggers = TRIGGERS_SQLITE_CODIFICADO
+                existentes = set(_triggers_existentes(conn, TABELA_FATOS))
+            else:
+                triggers = TRIGGERS_SQLITE
+                existentes = set(_triggers_existentes(conn))
+            faltantes = [nome for nome in triggers if nome not in existentes]
+            for nome in faltantes:
+                conn.execute(text(triggers[nome]))
+            return bool(faltantes)
+
+        existentes = set(_triggers_existentes(conn))
+
+        if dialeto == "postgresql":
+            if "trg_vi_latest" in existentes:
+                return False
+            conn.execute(text(FUNCAO_POSTGRES))
+            conn.execute(text(TRIGGER_POSTGRES))
+            return True
+
+    return False
+
+
+def reconstruir_snapshot_latest(db_session) -> int:
+    """Reconstrução completa (reparo): apaga o snapshot e o recalcula a partir de todo o histórico."""
+    consulta = sql_mais_recentes(db_session.connection())
+    db_session.execute(text("DELETE FROM valores_indicadores_latest"))
+    db_session.execute(text(f"INSERT INTO valores_indicadores_latest ({COLUNAS}) {consulta}"))
+    db_session.commit()
+    return db_session.execute(text("SELECT COUNT(*) FROM valores_indicadores_latest")).scalar() or 0
@@ -1,46 +1,29 @@
 import numpy as np
 import pandas as pd
 from typing import List, Dict, Optional, Set
-from sqlalchemy import and_, func, text
+from sqlalchemy import text
+
+from app.services.selecao_cidades import filtro_cidades
+from app.services.vetores_municipios import brutos_das_cidades
 
 
 def _rebuild_snapshot_latest(db_session, cidades_ibge: List[str], ids_indicadores: Optional[Set[str]] = None) -> None:
     """Garante que o snapshot recente exista para o subconjunto de cidades/indicadores solicitado."""
-    from app.models import ValorIndicador, ValorIndicadorLatest
+    from app.models import ValorIndicadorLatest
+    from app.services.consulta_mais_recentes import buscar_mais_recentes
 
     if not cidades_ibge:
         return
 
-    query_latest = db_session.query(ValorIndicadorLatest).filter(ValorIndicadorLatest.codigo_ibge.in_(cidades_ibge))
+    query_latest = db_session.query(ValorIndicadorLatest).filter(filtro_cidades(db_session, ValorIndicadorLatest.codigo_ibge, cidades_ibge))
     if ids_indicadores:
         query_latest = query_latest.filter(ValorIndicadorLatest.id_indicador.in_(list(ids_indicadores)))
     if query_latest.first():
         return
 
-    query_base = db_session.query(ValorIndicador).filter(ValorIndicador.codigo_ibge.in_(cidades_ibge))
-    if ids_indicadores:
-        query_base = query_base.filter(ValorIndicador.id_indicador.in_(list(ids_indicadores)))
-
-    # Limita o custo para o subset estritamente necessário antes de materializar o snapshot.
-    registros = query_base.order_by(
-        ValorIndicador.codigo_ibge.asc(),
-        ValorIndicador.id_indicador.asc(),
-        ValorIndicador.ano_referencia.desc(),
-        ValorIndicador.id.desc(),
-    ).limit(5000).all()
-
-    if not registros:
-        return
-
-    # Remove apenas as entradas do subconjunto solicitado, evitando apagar snapshot inteiro da base.
-    db_session.query(ValorIndicadorLatest).filter(ValorIndicadorLatest.codigo_ibge.in_(cidades_ibge)).delete(synchronize_session=False)
-
-    melhor_por_chave: Dict[tuple[str, str], ValorIndicadorLatest] = {}
-    for reg in registros:
-        chave = (reg.codigo_ibge, reg.id_indicador)
-        if chave in melhor_por_chave:
-            continue
-        melhor_por_chave[chave] = ValorIndicadorLatest(
+    # Valor mais recente de cada chave direto no fato, em uma única passada pelo índice.
+    melhor_por_chave: Dict[tuple[str, str], ValorIndicadorLatest] = {
+        (reg.codigo_ibge, reg.id_indicador): ValorIndicadorLatest(
             codigo_ibge=reg.codigo_ibge,
             id_indicador=reg.id_indicador,
             ano_referencia=reg.ano_referencia,
@@ -48,10 +31,20 @@ def _rebuild_snapshot_latest(db_session, cidades_ibge: List[str], ids_indicadore
             fonte=reg.fonte,
             id_origem=reg.id,
         )
+        for reg in buscar_mais_recentes(db_session, cidades_ibge, ids_indicadores or None)
+    }
+
+    if not melhor_por_chave:
+        return
+
+    # Remove apenas as entradas do subconjunto solicitado (cidades e, se houver, indicadores).
+    query_remocao = db_session.query(ValorIndicadorLatest).filter(filtro_cidades(db_session, ValorIndicadorLatest.codigo_ibge, cidades_ibge))
+    if ids_indicadores:
+        query_remocao = query_remocao.filter(ValorIndicadorLatest.id_indicador.in_(list(ids_indicadores)))
+    query_remocao.delete(synchronize_session=False)
 
-    if melhor_por_chave:
-        db_session.bulk_save_objects(list(melhor_por_chave.values()))
-        db_session.commit()
+    db_session.bulk_save_objects(list(melhor_por_chave.values()))
+    db_session.commit()
 
 
 def _buscar_valores_mais_recentes(
@@ -60,13 +53,14 @@ def _buscar_valores_mais_recentes(
     ids_indicadores: Optional[Set[str]] = None,
 ):
     """Retorna apenas o registro mais recente por cidade + indicador com base em ano_referencia."""
-    from app.models import ValorIndicador, ValorIndicadorLatest
+    from app.models import ValorIndicadorLatest
+    from app.services.consulta_mais_recentes import buscar_mais_recentes
 
     if not cidades_ibge:
         return []
 
     # Caminho rápido: snapshot materializado (1 linha por cidade+indicador)
-    query_latest = db_session.query(ValorIndicadorLatest).filter(ValorIndicadorLatest.codigo_ibge.in_(cidades_ibge))
+    query_latest = db_session.query(ValorIndicadorLatest).filter(filtro_cidades(db_session, ValorIndicadorLatest.codigo_ibge, cidades_ibge))
     if ids_indicadores:
         query_latest = query_latest.filter(ValorIndicadorLatest.id_indicador.in_(list(ids_indicadores)))
 
@@ -75,91 +69,33 @@ def _buscar_valores_mais_recentes(
         return registros_latest
 
     latest_por_chave: Dict[tuple[str, str], object] = {}
+    # Indicadores presentes no snapshot por cidade, agrupados uma única vez
+    # (seleções nacionais têm milhares de cidades x centenas de milhares de chaves).
+    presentes_por_cidade: Dict[str, Set[str]] = {}
     if registros_latest:
-        latest_por_chave = {
-            (reg.codigo_ibge, reg.id_indicador): reg
-            for reg in registros_latest
-        }
+        for reg in registros_latest:
+            latest_por_chave[(reg.codigo_ibge, reg.id_indicador)] = reg
+            presentes_por_cidade.setdefault(reg.codigo_ibge, set()).add(reg.id_indicador)
 
         # Se o snapshot já cobre todos os pares pedidos, evita fallback na tabela fato.
         if ids_indicadores:
-            cobertura_completa = True
-            for cidade in cidades_ibge:
-                presentes = {
-                    ind
-                    for (codigo, ind) in latest_por_chave.keys()
-                    if codigo == cidade
-                }
-                if not ids_indicadores.issubset(presentes):
-                    cobertura_completa = False
-                    break
+            cobertura_completa = all(
+                ids_indicadores.issubset(presentes_por_cidade.get(cidade, ()))
+                for cidade in cidades_ibge
+            )
             if cobertura_completa:
                 return list(latest_por_chave.values())
 
-    # Fallback: reconstrução em tempo real a partir da tabela fato completa
-    query_base = db_session.query(ValorIndicador).filter(ValorIndicador.codigo_ibge.in_(cidades_ibge))
+    # Fallback: valor mais recente direto no fato, em uma única passada pelo índice
     ids_para_fallback = ids_indicadores
 
     if ids_indicadores and latest_por_chave:
         faltantes_por_cidade: Set[str] = set()
         for cidade in cidades_ibge:
-            presentes = {
-                ind
-                for (codigo, ind) in latest_por_chave.keys()
-                if codigo == cidade
-            }
-            faltantes_por_cidade.update(ids_indicadores - presentes)
+            faltantes_por_cidade.update(ids_indicadores - presentes_por_cidade.get(cidade, set()))
         ids_para_fallback = faltantes_por_cidade
 
-    if ids_para_fallback:
-        query_base = query_base.filter(ValorIndicador.id_indicador.in_(list(ids_para_fallback)))
-
-    sub_ano = (
-        query_base.with_entities(
-            ValorIndicador.codigo_ibge.label("codigo_ibge"),
-            ValorIndicador.id_indicador.label("id_indicador"),
-            func.max(ValorIndicador.ano_referencia).label("ano_max"),
-        )
-        .group_by(ValorIndicador.codigo_ibge, ValorIndicador.id_indicador)
-        .subquery()
-    )
-
-    sub_id = (
-        query_base.with_entities(
-            ValorIndicador.codigo_ibge.label("codigo_ibge"),
-            ValorIndicador.id_indicador.label("id_indicador"),
-            ValorIndicador.ano_referencia.label("ano_referencia"),
-            func.max(ValorIndicador.id).label("id_max"),
-        )
-        .join(
-            sub_ano,
-            and_(
-                ValorIndicador.codigo_ibge == sub_ano.c.codigo_ibge,
-                ValorIndicador.id_indicador == sub_ano.c.id_indicador,
-                ValorIndicador.ano_referencia == sub_ano.c.ano_max,
-            ),
-        )
-        .group_by(
-            ValorIndicador.codigo_ibge,
-            ValorIndicador.id_indicador,
-            ValorIndicador.ano_referencia,
-        )
-        .subquery()
-    )
-
-    registros_fallback = (
-        db_session.query(ValorIndicador)
-        .join(
-            sub_id,
-            and_(
-                ValorIndicador.codigo_ibge == sub_id.c.codigo_ibge,
-                ValorIndicador.id_indicador == sub_id.c.id_indicador,
-                ValorIndicador.ano_referencia == sub_id.c.ano_referencia,
-                ValorIndicador.id == sub_id.c.id_max,
-            ),
-        )
-        .all()
-    )
+    registros_fallback = buscar_mais_recentes(db_session, cidades_ibge, ids_para_fallback or None)
 
     if not latest_por_chave:
         return registros_fallback
@@ -184,6 +120,7 @@ def _buscar_historico_por_cidade(db_session, codigo_ibge: str) -> Dict[str, List
         .all()
     )
 
+    # A consulta já vem ordenada por (indicador, ano, id): cada série sai em ordem cronológica.
     for reg in registros:
         historico.setdefault(reg.id_indicador, []).append({
             "id": reg.id,
@@ -192,15 +129,18 @@ def _buscar_historico_por_cidade(db_session, codigo_ibge: str) -> Dict[str, List
             "fonte": reg.fonte,
         })
 
-    for indicador in historico:
-        historico[indicador].sort(key=lambda item: (item["ano_referencia"], item["id"]))
-
     return historico
 
 
-def _buscar_mais_recente_por_cidade(db_session, codigo_ibge: str) -> Dict[str, float]:
-    """Retorna o valor mais recente por indicador para a cidade, conforme o critério do TOPSIS."""
-    historico = _buscar_historico_por_cidade(db_session, codigo_ibge)
+def _buscar_mais_recente_por_cidade(
+    db_session, codigo_ibge: str, historico: Optional[Dict[str, List[dict]]] = None
+) -> Dict[str, float]:
+    """
+    Retorna o valor mais recente por indicador para a cidade, conforme o critério do TOPSIS.
+    Aceita o `historico` já carregado para não repetir a consulta.
+    """
+    if historico is None:
+        historico = _buscar_historico_por_cidade(db_session, codigo_ibge)
     mais_recente: Dict[str, float] = {}
 
     for id_indicador, series in historico.items():
@@ -210,6 +150,66 @@ def _buscar_mais_recente_por_cidade(db_session, codigo_ibge: str) -> Dict[str, f
     return mais_recente
 
 
+def _buscar_historico_colunar(
+    db_session,
+    cidades_ibge: List[str],
+    ids_indicadores: Optional[List[str]] = None,
+    ano_inicio: Optional[int] = None,
+    ano_fim: Optional[int] = None,
+) -> dict:
+    """
+    Séries históricas de várias cidades em uma única consulta ordenada, no formato colunar
+    indicador -> cidade -> {anos, valores, fontes}. Fontes são codificadas como índices em
+    `fontes` (dicionário compartilhado pela resposta). Filtros de ano são aplicados no SQL.
+    """
+    from app.models import ValorIndicador
+
+    consulta = db_session.query(
+        ValorIndicador.id_indicador,
+        ValorIndicador.codigo_ibge,
+        ValorIndicador.ano_referencia,
+        ValorIndicador.valor,
+        ValorIndicador.fonte,
+    ).filter(filtro_cidades(db_session, ValorIndicador.codigo_ibge, cidades_ibge))
+
+    if ids_indicadores:
+        consulta = consulta.filter(ValorIndicador.id_indicador.in_(ids_indicadores))
+    if ano_inicio is not None:
+        consulta = consulta.filter(ValorIndicador.ano_referencia >= ano_inicio)
+    if ano_fim is not None:
+        consulta = consulta.filter(ValorIndicador.ano_referencia <= ano_fim)
+
+    consulta = consulta.order_by(
+        ValorIndicador.id_indicador.asc(),
+        ValorIndicador.codigo_ibge.asc(),
+        ValorIndicador.ano_referencia.asc(),
+        ValorIndicador.id.asc(),
+    )
+
+    fontes: List[Optional[str]] = []
+    id_fonte: Dict[Optional[str], int] = {}
+    indicadores: Dict[str, Dict[str, dict]] = {}
+    serie = None
+    chave_atual = None
+
+    for id_indicador, codigo_ibge, ano, valor, fonte in consulta:
+        if (id_indicador, codigo_ibge) != chave_atual:
+            chave_atual = (id_indicador, codigo_ibge)
+            serie = {"anos": [], "valores": [], "fontes": []}
+            indicadores.setdefault(id_indicador, {})[codigo_ibge] = serie
+
+        idx_fonte = id_fonte.get(fonte)
+        if idx_fonte is None:
+            idx_fonte = id_fonte[fonte] = len(fontes)
+            fontes.append(fonte)
+
+        serie["anos"].append(ano)
+        serie["valores"].append(valor)
+        serie["fontes"].append(idx_fonte)
+
+    return {"fontes": fontes, "indicadores": indicadores}
+
+
 def _indicadores_validos_para_topsis() -> List[str]:
     """Retorna somente indicadores com fonte real e status validado para uso no cálculo TOPSIS."""
     from app.etl_config import INDICADORES
@@ -246,170 +246,269 @@ def _indicadores_validos_para_topsis() -> List[str]:
     return validos
 
 
-def preparar_matriz_decisao(cidades_ibge: List[str], simulacoes: List[dict], db_session) -> pd.DataFrame:
-    """
-    Constrói a matriz de dados mesclando o Banco de Dados histórico com as Simulações do Frontend.
-    Converte dados brutos em taxas proporcionais (numerador/denominador).
-    """
-    from app.models import ValorIndicador
-    from app.etl_config import INDICADORES
-
-    indicadores_validos = set(_indicadores_validos_para_topsis())
-
-    # Limita o fetch SQL aos IDs realmente usados na matriz atual
-    ids_necessarios: Set[str] = set()
-    for _, indicadores in INDICADORES.items():
-        for id_ind, regras in indicadores.items():
-            if id_ind not in indicadores_validos:
-                continue
-            tipo = regras.get("tipo_calculo")
-            if tipo == "direto":
-                ids_necessarios.add(id_ind)
+def completar_pesos_impactos(colunas, pesos: dict, impactos: dict) -> None:
+    """Fallback Dinâmico: se a tabela Indicador estiver vazia, define regras lógicas."""
+    for col in colunas:
+        if col not in pesos:
+            pesos[col] = 0.02 # Peso igualitário padrão (1/50)
+        if col not in impactos:
+            # Se a palavra do indicador remeter a "custo/dano", o impacto é negativo (-1)
+            termos_negativos = ["desemprego", "endividamento", "homicidios", "mortes", 
+                                "inadequadas", "sem_teto", "acidentes", "corrupcao", 
+                                "mortalidade", "afetadas", "perdas", "danos"]
+            if any(termo in col for termo in termos_negativos):
+                impactos[col] = -1
             else:
-                ids_necessarios.add(f"{id_ind}_numerador")
-                denominador_chave = regras.get("denominador")
-                if denominador_chave:
-                    ids_necessarios.add(denominador_chave)
+                impactos[col] = 1 # Maior é melhor
 
-    # 1. Busca apenas o registro mais recente por cidade + indicador
-    registros = _buscar_valores_mais_recentes(db_session, cidades_ibge, ids_necessarios)
 
-    # Organiza em um dicionário estruturado: dict[cidade][id_indicador] = valor
-    dados_brutos = {cidade: {} for cidade in cidades_ibge}
-    for reg in registros:
-        dados_brutos[reg.codigo_ibge][reg.id_indicador] = reg.valor
+def montar_matriz_bruta(
+    cidades_ibge: List[str],
+    simulacoes: List[dict],
+    db_session,
+    plano,
+    residente=None,
+) -> tuple:
+    """
+    Matriz bruta densa (cidades distintas x variáveis do plano) com as simulações aplicadas.
+    Retorna (linha_por_cidade, brutos); NaN marca variável sem dado.
+    """
+    # Matriz bruta densa: uma linha por cidade distinta, uma coluna por variável do plano
+    linha_por_cidade: Dict[str, int] = {}
+    for ibge in cidades_ibge:
+        linha_por_cidade.setdefault(ibge, len(linha_por_cidade))
+
+    # 1. Busca apenas o registro mais recente por cidade + variável usada no plano:
+    # memória (matriz residente) > um vetor empacotado por cidade > snapshot longo pivotado.
+    brutos = None
+    if residente is not None:
+        brutos = residente.fatiar_brutos(list(linha_por_cidade), plano)
+    else:
+        brutos = brutos_das_cidades(db_session, list(linha_por_cidade), plano)
+    if brutos is None:
+        brutos = plano.matriz_bruta_vazia(len(linha_por_cidade))
+        registros = _buscar_valores_mais_recentes(db_session, cidades_ibge, set(plano.variaveis))
+        for reg in registros:
+            linha = linha_por_cidade.get(reg.codigo_ibge)
+            coluna = plano.indice_variavel.get(reg.id_indicador)
+            if linha is not None and coluna is not None and reg.valor is not None:
+                brutos[linha, coluna] = reg.valor
 
     # 2. Aplica as Simulações do Frontend (Sobrescreve o banco temporariamente na RAM)
     if simulacoes:
         for sim in simulacoes:
-            ibge = sim.get("codigo_ibge")
-            if ibge in dados_brutos:
-                for chave, valor_simulado in sim.get("valores_brutos", {}).items():
-                    dados_brutos[ibge][chave] = float(valor_simulado)
-
-    # 3. Constrói a Matriz Final calculando as frações (Taxas e Porcentagens)
-    matriz_final = []
-
-    for ibge in cidades_ibge:
-        linha = {"codigo_ibge": ibge}
+            linha = linha_por_cidade.get(sim.get("codigo_ibge"))
+            if linha is None:
+                continue
+            for chave, valor_simulado in sim.get("valores_brutos", {}).items():
+                coluna = plano.indice_variavel.get(chave)
+                if coluna is not None:
+                    brutos[linha, coluna] = float(valor_simulado)
 
-        for dominio, indicadores in INDICADORES.items():
-            for id_ind, regras in indicadores.items():
-                if id_ind not in indicadores_validos:
-                    continue
+    return linha_por_cidade, brutos
 
-                tipo = regras.get("tipo_calculo")
 
-                if tipo == "direto":
-                    valor = dados_brutos[ibge].get(id_ind)
-                    linha[id_ind] = valor
+def preparar_matriz_decisao(
+    cidades_ibge: List[str],
+    simulacoes: List[dict],
+    db_session,
+    residente=None,
+    manter_colunas_vazias: bool = False,
+) -> pd.DataFrame:
+    """
+    Constrói a matriz de dados mesclando o Banco de Dados histórico com as Simulações do Frontend.
+    Converte dados brutos em taxas proporcionais (numerador/denominador).
+    Com `residente` (MatrizResidente carregada na API) os valores saem da memória, sem SQL.
+    Com `manter_colunas_vazias` devolve todas as colunas do plano, mesmo sem dados no subconjunto.
+    """
+    from app.services.plano_indicadores import obter_plano
 
-                else: # "porcentagem" ou "taxa_100k"
-                    numerador = dados_brutos[ibge].get(f"{id_ind}_numerador")
-                    denominador_chave = regras.get("denominador")
-                    denominador = dados_brutos[ibge].get(denominador_chave)
-                    multiplicador = regras.get("multiplicador", 1)
+    plano = obter_plano()
+    linha_por_cidade, brutos = montar_matriz_bruta(cidades_ibge, simulacoes, db_session, plano, residente)
 
-                    if numerador is not None and denominador is not None and denominador > 0:
-                        linha[id_ind] = (numerador / denominador) * multiplicador
-                    else:
-                        linha[id_ind] = None # Ausência de dados
+    # 3. Constrói a Matriz Final calculando as frações (Taxas e Porcentagens) em uma única operação
+    linhas = np.fromiter((linha_por_cidade[ibge] for ibge in cidades_ibge), dtype=np.intp, count=len(cidades_ibge))
+    matriz = plano.montar_matriz(brutos)[linhas]
 
-        matriz_final.append(linha)
+    df = pd.DataFrame(
+        matriz,
+        index=pd.Index(cidades_ibge, name="codigo_ibge"),
+        columns=plano.indicadores,
+    )
 
-    df = pd.DataFrame(matriz_final).set_index("codigo_ibge")
+    if manter_colunas_vazias:
+        return df
 
     # 4. LIMPEZA RELAXADA: Envia para o frontend tudo o que for válido
-    colunas_uteis = []
-    for col in df.columns:
-        serie = df[col]
-        valores_reais = serie.dropna()
-        if valores_reais.empty:
-            continue
-        
-        # ⚠️ REGRAS RÍGIDAS DESATIVADAS PARA EXIBIÇÃO NO REACT:
-        # if (valores_reais == 0).all(): continue
-        # if serie.isna().mean() > 0.5: continue
-        
-        colunas_uteis.append(col)
-
-    return df[colunas_uteis]
+    # ⚠️ REGRAS RÍGIDAS DESATIVADAS PARA EXIBIÇÃO NO REACT (colunas zeradas ou > 50% nulas).
+    colunas_uteis = ~np.isnan(matriz).all(axis=0)
+    return df.loc[:, colunas_uteis]
 
-def aplicar_topsis(df: pd.DataFrame, pesos: dict, impactos: dict) -> List[dict]:
+def _preencher_e_normalizar(matriz: np.ndarray, impactos: np.ndarray):
     """
-    Aplica o algoritmo TOPSIS matemático sobre a matriz preparada.
-    Resolve dados ausentes rigorosamente sem inflar resultados.
+    Etapas do TOPSIS que independem dos pesos: descarta colunas vazias, preenche ausências
+    e calcula o divisor da normalização vetorial.
+    Retorna (matriz_preenchida, colunas_validas, beneficio, norm_divisor).
     """
-    if df.empty:
-        return []
+    matriz = np.asarray(matriz, dtype=np.float64)
+    impactos = np.asarray(impactos)
 
-    df = df.dropna(axis=1, how="all").copy()
-    if df.empty:
-        return []
+    ausentes = np.isnan(matriz)
+    colunas_validas = ~ausentes.all(axis=0)
+    matriz = matriz[:, colunas_validas]
+    ausentes = ausentes[:, colunas_validas]
+    beneficio = impactos[colunas_validas] == 1
 
-    # 1. Tratamento de Ausência de Dados (Null Handling Matemático)
-    for col in list(df.columns):
-        if df[col].isnull().all():
-            df = df.drop(columns=[col])
-            continue
+    # 1. Tratamento de Ausência de Dados: benefício recebe 0, custo recebe o pior valor (máximo)
+    if matriz.size and ausentes.any():
+        pior_valor = np.where(beneficio, 0.0, np.nanmax(matriz, axis=0))
+        matriz = np.where(ausentes, pior_valor, matriz)
 
-        impacto = impactos.get(col, 1)
+    # 2. Normalização Vetorial (divisor = raiz da soma dos quadrados; colunas zeradas usam 1)
+    norm_divisor = np.sqrt(np.einsum("ij,ij->j", matriz, matriz))
+    norm_divisor[norm_divisor == 0] = 1.0
 
-        # ⚠️ REGRA DE VARIÂNCIA DESATIVADA:
-        # if df[col].notna().sum() <= 1:
-        #    df = df.drop(columns=[col])
-        #    continue
+    return matriz, colunas_validas, beneficio, norm_divisor
 
-        if impacto == 1:
-            pior_valor = 0.0
-        else:
-            pior_valor = df[col].max()
 
-        df[col] = df[col].fillna(pior_valor)
+def topsis_matricial(matriz: np.ndarray, pesos: np.ndarray, impactos: np.ndarray):
+    """
+    Núcleo vetorizado do TOPSIS (NumPy puro, sem pandas).
+    Recebe a matriz (cidades x indicadores) com NaN para ausências, o vetor de pesos
+    e o vetor de sinais de impacto (1 = benefício, qualquer outro = custo).
+    Retorna (matriz_preenchida, colunas_validas, pontuacao, dist_positiva, dist_negativa),
+    onde matriz_preenchida já contém apenas as colunas marcadas em colunas_validas.
+    """
+    matriz, colunas_validas, beneficio, norm_divisor = _preencher_e_normalizar(matriz, impactos)
+    pesos = np.asarray(pesos, dtype=np.float64)[colunas_validas]
 
-    # 2. Normalização Vetorial (Divisão pela raiz da soma dos quadrados)
-    norm_divisor = np.sqrt((df ** 2).sum(axis=0))
-    norm_divisor = norm_divisor.replace(0, 1) # Evita que variáveis zeradas quebrem a matemática
-    df_norm = df / norm_divisor
+    if matriz.size == 0:
+        vazio = np.zeros(matriz.shape[0], dtype=np.float64)
+        return matriz, colunas_validas, vazio, vazio.copy(), vazio.copy()
 
-    # 3. Ponderação (Multiplicação pelos pesos)
-    peso_series = pd.Series(pesos)
-    df_pond = df_norm * peso_series
+    # 3. Ponderação
+    pond = matriz * (pesos / norm_divisor)
 
     # 4. Soluções Ideais Positiva (SIP) e Negativa (SIN)
-    sip = pd.Series(index=df.columns, dtype=float)
-    sin = pd.Series(index=df.columns, dtype=float)
-
-    for col in df.columns:
-        impacto = impactos.get(col, 1)
-        if impacto == 1: # Benefício: maior é melhor
-            sip[col] = df_pond[col].max()
-            sin[col] = df_pond[col].min()
-        else:            # Custo: menor é melhor
-            sip[col] = df_pond[col].min()
-            sin[col] = df_pond[col].max()
-
-    # 5. Cálculo das Distâncias Euclidianas
-    dist_positiva = np.sqrt(((df_pond - sip) ** 2).sum(axis=1))
-    dist_negativa = np.sqrt(((df_pond - sin) ** 2).sum(axis=1))
-
-    # 6. Coeficiente de Proximidade (Pontuação Final 0 a 1)
+    maximo = pond.max(axis=0)
+    minimo = pond.min(axis=0)
+    sip = np.where(beneficio, maximo, minimo)
+    sin = np.where(beneficio, minimo, maximo)
+
+    # 5. Distâncias Euclidianas e 6. Coeficiente de Proximidade
+    dist_positiva = np.sqrt(np.square(pond - sip).sum(axis=1))
+    dist_negativa = np.sqrt(np.square(pond - sin).sum(axis=1))
     soma_distancias = dist_positiva + dist_negativa
-    soma_distancias = soma_distancias.replace(0, 1)
-    
+    soma_distancias[soma_distancias == 0] = 1.0
     pontuacao = dist_negativa / soma_distancias
 
+    return matriz, colunas_validas, pontuacao, dist_positiva, dist_negativa
+
+
+def diferencas_ideais(matriz: np.ndarray, impactos: np.ndarray):
+    """
+    Parte do TOPSIS independente dos pesos para pesos não negativos: como escalar uma coluna
+    por w >= 0 não muda qual cidade é a ideal, SIP/SIN saem da matriz normalizada e
+    d² = (V - ideal)² @ w² para qualquer vetor de pesos.
+    Retorna (colunas_validas, quadrados_positivos, quadrados_negativos), ambos cidades x colunas válidas.
+    """
+    matriz, colunas_validas, beneficio, norm_divisor = _preencher_e_normalizar(matriz, impactos)
+    if matriz.shape[0] == 0:
+        return colunas_validas, matriz, matriz.copy()
+
+    normalizada = matriz / norm_divisor
+    maximo = normalizada.max(axis=0)
+    minimo = normalizada.min(axis=0)
+    ideal = np.where(beneficio, maximo, minimo)
+    anti_ideal = np.where(beneficio, minimo, maximo)
+    return colunas_validas, np.square(normalizada - ideal), np.square(normalizada - anti_ideal)
+
+
+def topsis_multicenario(matriz: np.ndarray, pesos_cenarios: np.ndarray, impactos: np.ndarray):
+    """
+    Avalia N vetores de pesos (N x indicadores, pesos >= 0) sobre a mesma matriz em uma chamada.
+    Preenchimento e normalização são feitos uma única vez e as distâncias de todos os
+    cenários viram um único produto matricial (ver `diferencas_ideais`).
+    Retorna (colunas_validas, pontuacoes, dist_positivas, dist_negativas), cada array N x cidades.
+    """
+    colunas_validas, quad_positivos, quad_negativos = diferencas_ideais(matriz, impactos)
+    pesos_cenarios = np.atleast_2d(np.asarray(pesos_cenarios, dtype=np.float64))[:, colunas_validas]
+
+    if quad_positivos.shape[0] == 0:
+        vazio = np.zeros((pesos_cenarios.shape[0], 0), dtype=np.float64)
+        return colunas_validas, vazio, vazio.copy(), vazio.copy()
+
+    pesos_quadrado_t = np.square(pesos_cenarios).T
+    dist_positivas = np.sqrt(quad_positivos @ pesos_quadrado_t).T
+    dist_negativas = np.sqrt(quad_negativos @ pesos_quadrado_t).T
+
+    soma_distancias = dist_positivas + dist_negativas
+    soma_distancias[soma_distancias == 0] = 1.0
+    pontuacoes = dist_negativas / soma_distancias
+
+    return colunas_validas, pontuacoes, dist_positivas, dist_negativas
+
+
+def posicoes_por_pontuacao(pontuacoes: np.ndarray) -> np.ndarray:
+    """Converte pontuações (N x cidades) em posições 1..k por cenário (empates mantêm a ordem de entrada)."""
+    pontuacoes = np.atleast_2d(pontuacoes)
+    ordem = np.argsort(-pontuacoes, axis=1, kind="stable")
+    posicoes = np.empty_like(ordem)
+    np.put_along_axis(posicoes, ordem, np.arange(1, ordem.shape[1] + 1)[None, :], axis=1)
+    return posicoes
+
+
+def aplicar_topsis(df: pd.DataFrame, pesos: dict, impactos: dict) -> List[dict]:
+    """
+    Aplica o algoritmo TOPSIS matemático sobre a matriz preparada.
+    Resolve dados ausentes rigorosamente sem inflar resultados.
+    Wrapper do DataFrame sobre o núcleo vetorizado `topsis_matricial`.
+    """
+    if df.empty:
+        return []
+
+    colunas = list(df.columns)
+    matriz = df.to_numpy(dtype=np.float64, na_value=np.nan)
+    # Indicadores sem peso cadastrado não contribuem para as distâncias.
+    vetor_pesos = np.array([pesos.get(col, 0.0) for col in colunas], dtype=np.float64)
+    vetor_impactos = np.array([impactos.get(col, 1) for col in colunas])
+
+    matriz, colunas_validas, pontuacao, dist_positiva, dist_negativa = topsis_matricial(
+        matriz, vetor_pesos, vetor_impactos
+    )
+    if matriz.shape[1] == 0:
+        return []
+
+    nomes_colunas = [col for col, valida in zip(colunas, colunas_validas) if valida]
+    return _formatar_resultados(df.index, nomes_colunas, matriz, pontuacao, dist_positiva, dist_negativa)
+
+
+def _formatar_resultados(
+    codigos,
+    nomes_colunas: List[str],
+    matriz: np.ndarray,
+    pontuacao: np.ndarray,
+    dist_positiva: np.ndarray,
+    dist_negativa: np.ndarray,
+) -> List[dict]:
+    """Converte os arrays do núcleo no formato de resposta da rota, ordenado da maior para a menor pontuação."""
     # 7. Formatação da Resposta
     resultados = []
-    for ibge in df.index:
+    for ibge, score, d_pos, d_neg, linha in zip(
+        codigos,
+        pontuacao.tolist(),
+        dist_positiva.tolist(),
+        dist_negativa.tolist(),
+        matriz.tolist(),
+    ):
         resultados.append({
             "codigo_ibge": ibge,
-            "pontuacao_topsis": round(pontuacao[ibge], 4),
-            "distancia_positiva": round(dist_positiva[ibge], 4),
-            "distancia_negativa": round(dist_negativa[ibge], 4),
-            "valores_calculados": df.loc[ibge].to_dict()
+            "pontuacao_topsis": round(score, 4),
+            "distancia_positiva": round(d_pos, 4),
+            "distancia_negativa": round(d_neg, 4),
+            "valores_calculados": dict(zip(nomes_colunas, linha)),
         })
 
     # Ordena do melhor (1.0) para o pior (0.0)
     resultados = sorted(resultados, key=lambda x: x["pontuacao_topsis"], reverse=True)
-    return resultados
\ No newline at end of file
+    return resultados
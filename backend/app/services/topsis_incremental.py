@@ -0,0 +1,217 @@
+"""TOPSIS incremental para edições interativas de simulação.
+
+Mantém, para uma matriz de sessão (cidades x indicadores), o estado que o
+TOPSIS deriva de cada coluna: valor de preenchimento das ausências, soma dos
+quadrados (norma vetorial), pontos ideal e anti-ideal e os desvios quadráticos
+de cada cidade até eles. Com pesos w >= 0 a distância de uma cidade é
+
+    d² = Σ_j (w_j / norma_j)² · (x_ij - ideal_j)²
+
+então alterar uma célula só mexe na coluna dos indicadores afetados: a soma
+dos quadrados e os extremos são atualizados em O(1) e a escala da coluna em
+O(cidades). Os desvios da coluna inteira só são recalculados quando um extremo
+(ou o valor de preenchimento) muda.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.topsis_core import _formatar_resultados
+
+# Edições entre ressincronizações completas (limita o acúmulo de erro de ponto flutuante).
+RESSINCRONIZAR_A_CADA = 500
+
+
+class TopsisIncremental:
+    """Estado TOPSIS de um conjunto fixo de cidades, atualizável célula a célula."""
+
+    def __init__(self, cidades_ibge: List[str], brutos: np.ndarray, plano, pesos: np.ndarray, impactos: np.ndarray):
+        self.cidades = list(cidades_ibge)
+        self.linha_por_cidade: Dict[str, int] = {ibge: idx for idx, ibge in enumerate(self.cidades)}
+        self.plano = plano
+        self.brutos = np.array(brutos, dtype=np.float64)
+        self.pesos = np.asarray(pesos, dtype=np.float64)
+        self.beneficio = np.asarray(impactos) == 1
+        self.edicoes = 0
+        self.recalcular()
+
+    # ------------------------------------------------------------------
+    # Recalculo completo
+    # ------------------------------------------------------------------
+    def recalcular(self) -> None:
+        """Reconstrói todo o estado a partir da matriz bruta (O(cidades x indicadores))."""
+        self.matriz = self.plano.montar_matriz(self.brutos)
+        n_linhas, n_colunas = self.matriz.shape
+
+        self.preenchida = np.zeros((n_linhas, n_colunas), dtype=np.float64)
+        self.presentes = np.zeros(n_colunas, dtype=np.int64)
+        self.soma_quadrados = np.zeros(n_colunas, dtype=np.float64)
+        self.ideal = np.zeros(n_colunas, dtype=np.float64)
+        self.anti_ideal = np.zeros(n_colunas, dtype=np.float64)
+        self.escala = np.zeros(n_colunas, dtype=np.float64)
+        self.desvio_positivo = np.zeros((n_linhas, n_colunas), dtype=np.float64)
+        self.desvio_negativo = np.zeros((n_linhas, n_colunas), dtype=np.float64)
+        self.dist_positiva_quad = np.zeros(n_linhas, dtype=np.float64)
+        self.dist_negativa_quad = np.zeros(n_linhas, dtype=np.float64)
+
+        for coluna in range(n_colunas):
+            self._recalcular_coluna(coluna)
+        self.edicoes = 0
+
+    def _recalcular_coluna(self, coluna: int) -> None:
+        """Preenchimento, norma, extremos e desvios da coluna a partir de `matriz` (O(cidades))."""
+        valores = self.matriz[:, coluna]
+        ausentes = np.isnan(valores)
+        presentes = int(valores.size - ausentes.sum())
+
+        if presentes == 0:
+            # Coluna sem dados é descartada pelo TOPSIS: contribuição nula.
+            preenchida = np.zeros_like(valores)
+        elif self.beneficio[coluna]:
+            preenchida = np.where(ausentes, 0.0, valores)
+        else:
+            preenchida = np.where(ausentes, np.nanmax(valores), valores)
+
+        self.preenchida[:, coluna] = preenchida
+        self.presentes[coluna] = presentes
+        self.soma_quadrados[coluna] = float(preenchida @ preenchida)
+        if valores.size:
+            maximo, minimo = preenchida.max(), preenchida.min()
+        else:
+            maximo = minimo = 0.0
+        self.ideal[coluna] = maximo if self.beneficio[coluna] else minimo
+        self.anti_ideal[coluna] = minimo if self.beneficio[coluna] else maximo
+
+        self._substituir_contribuicao(
+            coluna,
+            np.square(preenchida - self.ideal[coluna]),
+            np.square(preenchida - self.anti_ideal[coluna]),
+            self._escala_da_coluna(coluna),
+        )
+
+    def _escala_da_coluna(self, coluna: int) -> float:
+        if self.presentes[coluna] == 0:
+            return 0.0
+        norma = np.sqrt(max(self.soma_quadrados[coluna], 0.0))
+        if norma == 0:
+            norma = 1.0
+        return float((self.pesos[coluna] / norma) ** 2)
+
+    def _substituir_contribuicao(self, coluna: int, desvio_pos: np.ndarray, desvio_neg: np.ndarray, escala: float) -> None:
+        """Troca a contribuição da coluna nas distâncias acumuladas (O(cidades))."""
+        escala_antiga = self.escala[coluna]
+        self.dist_positiva_quad += escala * desvio_pos - escala_antiga * self.desvio_positivo[:, coluna]
+        self.dist_negativa_quad += escala * desvio_neg - escala_antiga * self.desvio_negativo[:, coluna]
+        self.desvio_positivo[:, coluna] = desvio_pos
+        self.desvio_negativo[:, coluna] = desvio_neg
+        self.escala[coluna] = escala
+
+    # ------------------------------------------------------------------
+    # Atualização incremental
+    # ------------------------------------------------------------------
+    def atualizar(self, codigo_ibge: str, valores_brutos: Dict[str, float]) -> List[str]:
+        """
+        Aplica valores brutos simulados a uma cidade e atualiza só os indicadores afetados.
+        Variáveis fora do plano (ou cidades fora da sessão) são ignoradas.
+        Retorna os ids dos indicadores recalculados.
+        """
+        linha = self.linha_por_cidade.get(codigo_ibge)
+        if linha is None:
+            return []
+
+        afetados = set()
+        for chave, valor in valores_brutos.items():
+            idx_var = self.plano.indice_variavel.get(chave)
+            if idx_var is None:
+                continue
+            self.brutos[linha, idx_var] = np.nan if valor is None else float(valor)
+            afetados.update(self.plano.indicadores_por_variavel[idx_var].tolist())
+
+        if not afetados:
+            return []
+
+        colunas = np.array(sorted(afetados), dtype=np.intp)
+        novos = self.plano.montar_matriz(self.brutos[linha:linha + 1], colunas)[0]
+        for coluna, novo in zip(colunas.tolist(), novos.tolist()):
+            self._atualizar_celula(linha, coluna, novo)
+
+        self.edicoes += 1
+        if self.edicoes >= RESSINCRONIZAR_A_CADA:
+            self.recalcular()
+        return [self.plano.indicadores[coluna] for coluna in colunas.tolist()]
+
+    def _atualizar_celula(self, linha: int, coluna: int, novo: float) -> None:
+        antigo = self.matriz[linha, coluna]
+        if antigo == novo or (np.isnan(antigo) and np.isnan(novo)):
+            return
+        self.matriz[linha, coluna] = novo
+
+        # Ausência que surge ou some muda o preenchimento (e a contagem) da coluna.
+        if np.isnan(antigo) or np.isnan(novo):
+            self._recalcular_coluna(coluna)
+            return
+
+        beneficio = self.beneficio[coluna]
+        maximo = self.ideal[coluna] if beneficio else self.anti_ideal[coluna]
+        minimo = self.anti_ideal[coluna] if beneficio else self.ideal[coluna]
+
+        # Em colunas de custo as ausências valem o máximo: mexer no máximo muda o preenchimento.
+        ha_ausentes = self.presentes[coluna] < self.matriz.shape[0]
+        if not beneficio and ha_ausentes and (novo > maximo or antigo == maximo):
+            self._recalcular_coluna(coluna)
+            return
+
+        # Extremo que deixa de sê-lo exige varrer a coluna; qualquer outro caso é O(1).
+        if (antigo == maximo and novo < antigo) or (antigo == minimo and novo > antigo):
+            self._recalcular_coluna(coluna)
+            return
+
+        self.preenchida[linha, coluna] = novo
+        self.soma_quadrados[coluna] += novo * novo - antigo * antigo
+        escala = self._escala_da_coluna(coluna)
+
+        if novo > maximo or novo < minimo:
+            # Novo extremo: todos os desvios da coluna mudam.
+            maximo, minimo = max(maximo, novo), min(minimo, novo)
+            self.ideal[coluna] = maximo if beneficio else minimo
+            self.anti_ideal[coluna] = minimo if beneficio else maximo
+            coluna_preenchida = self.preenchida[:, coluna]
+            self._substituir_contribuicao(
+                coluna,
+                np.square(coluna_preenchida - self.ideal[coluna]),
+                np.square(coluna_preenchida - self.anti_ideal[coluna]),
+                escala,
+            )
+            return
+
+        # Extremos intactos: só os desvios da própria cidade mudam; a escala atinge a coluna.
+        desvio_pos = self.desvio_positivo[:, coluna].copy()
+        desvio_neg = self.desvio_negativo[:, coluna].copy()
+        desvio_pos[linha] = (novo - self.ideal[coluna]) ** 2
+        desvio_neg[linha] = (novo - self.anti_ideal[coluna]) ** 2
+        self._substituir_contribuicao(coluna, desvio_pos, desvio_neg, escala)
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def pontuacoes(self) -> tuple:
+        """Retorna (pontuacao, dist_positiva, dist_negativa) na ordem de `cidades`."""
+        dist_positiva = np.sqrt(np.maximum(self.dist_positiva_quad, 0.0))
+        dist_negativa = np.sqrt(np.maximum(self.dist_negativa_quad, 0.0))
+        soma_distancias = dist_positiva + dist_negativa
+        soma_distancias[soma_distancias == 0] = 1.0
+        return dist_negativa / soma_distancias, dist_positiva, dist_negativa
+
+    def ranking(self) -> List[dict]:
+        """Resultado no mesmo formato de `aplicar_topsis` (ordenado pela pontuação)."""
+        validas = self.presentes > 0
+        if not validas.any():
+            return []
+        pontuacao, dist_positiva, dist_negativa = self.pontuacoes()
+        nomes_colunas = [ind for ind, valida in zip(self.plano.indicadores, validas) if valida]
+        return _formatar_resultados(
+            self.cidades, nomes_colunas, self.preenchida[:, validas], pontuacao, dist_positiva, dist_negativa
+        )
@@ -0,0 +1,29 @@
+"""Contador de versão dos dados compartilhado entre o ETL e a API.
+
+O ETL roda em outro processo; a API não tem como saber que a base mudou
+a não ser consultando esta linha única. Todo cache derivado dos dados
+(matriz residente, normas globais, rankings) usa a versão como chave.
+"""
+
+from datetime import datetime
+
+from app.models import VersaoDados
+
+
+def obter_versao_dados(db_session) -> int:
+    """Retorna a versão atual dos dados (0 se o ETL nunca registrou uma carga)."""
+    registro = db_session.get(VersaoDados, 1)
+    return int(registro.versao) if registro is not None else 0
+
+
+def incrementar_versao_dados(db_session) -> int:
+    """Incrementa a versão após uma carga/atualização de snapshot e retorna o novo valor."""
+    registro = db_session.get(VersaoDados, 1)
+    if registro is None:
+        registro = VersaoDados(id=1, versao=1)
+        db_session.add(registro)
+    else:
+        registro.versao = int(registro.versao or 0) + 1
+    registro.atualizado_em = datetime.utcnow()
+    db_session.commit()
+    return int(registro.versao)
@@ -0,0 +1,136 @@
+"""Vetor denso do valor mais recente de cada município (uma linha por cidade).
+
+`valores_indicadores_latest` é longo: montar a matriz de um ranking exige de 50 a
+100 linhas por cidade e um pivô em Python. Ao final de cada carga o ETL grava em
+`vetores_municipios` um BLOB por município com todos os valores (float64
+little-endian) numa ordem fixa de variáveis, descrita por `vetores_layout`.
+Um ranking passa a ler uma linha por cidade, pela chave primária.
+
+O layout carrega a versão dos dados que originou os vetores; se ela difere da
+versão atual (carga em andamento ou vetores nunca materializados), os leitores
+voltam ao snapshot longo.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import insert, text
+
+from app.models import LayoutVetores, VetorMunicipio
+from app.services.selecao_cidades import filtro_cidades
+from app.services.versao_dados import obter_versao_dados
+
+logger = logging.getLogger(__name__)
+
+TIPO_VALOR = np.dtype("<f8")
+
+
+def pivotar_snapshot(db_session) -> Tuple[List[str], List[str], np.ndarray]:
+    """(códigos, variáveis, matriz) a partir do snapshot longo, ambos em ordem crescente."""
+    linhas = db_session.execute(
+        text("SELECT codigo_ibge, id_indicador, valor FROM valores_indicadores_latest")
+    ).all()
+    codigos = sorted({linha[0] for linha in linhas})
+    variaveis = sorted({linha[1] for linha in linhas})
+    linha_por_codigo = {codigo: idx for idx, codigo in enumerate(codigos)}
+    indice_variavel = {var: idx for idx, var in enumerate(variaveis)}
+
+    valores = np.full((len(codigos), len(variaveis)), np.nan, dtype=TIPO_VALOR)
+    if linhas:
+        idx_linhas = np.fromiter((linha_por_codigo[linha[0]] for linha in linhas), dtype=np.intp, count=len(linhas))
+        idx_colunas = np.fromiter((indice_variavel[linha[1]] for linha in linhas), dtype=np.intp, count=len(linhas))
+        valores[idx_linhas, idx_colunas] = np.array(
+            [np.nan if linha[2] is None else linha[2] for linha in linhas], dtype=np.float64
+        )
+    return codigos, variaveis, valores
+
+
+def materializar_vetores(db_session, versao: Optional[int] = None) -> int:
+    """
+    Substitui `vetores_municipios` e `vetores_layout` pelo conteúdo atual do snapshot,
+    numa única transação. Retorna o número de municípios gravados.
+    """
+    inicio = time.perf_counter()
+    versao = obter_versao_dados(db_session) if versao is None else versao
+    codigos, variaveis, valores = pivotar_snapshot(db_session)
+
+    db_session.query(VetorMunicipio).delete(synchronize_session=False)
+    db_session.query(LayoutVetores).delete(synchronize_session=False)
+    if codigos:
+        db_session.execute(
+            insert(LayoutVetores),
+            [{"posicao": pos, "id_indicador": var, "versao": versao} for pos, var in enumerate(variaveis)],
+        )
+        db_session.execute(
+            insert(VetorMunicipio),
+            [{"codigo_ibge": codigo, "valores": valores[idx].tobytes()} for idx, codigo in enumerate(codigos)],
+        )
+    db_session.commit()
+
+    logger.info(
+        f"✅ Vetores por município (versão {versao}): {len(codigos)} municípios x "
+        f"{len(variaveis)} variáveis em {time.perf_counter() - inicio:.2f}s"
+    )
+    return len(codigos)
+
+
+def layout_vigente(db_session) -> Optional[Tuple[int, List[str]]]:
+    """(versão, variáveis na ordem do BLOB) se os vetores estiverem na versão atual dos dados."""
+    layout = (
+        db_session.query(LayoutVetores.versao, LayoutVetores.id_indicador)
+        .order_by(LayoutVetores.posicao)
+        .all()
+    )
+    if not layout:
+        return None
+    versao = layout[0][0]
+    if versao != obter_versao_dados(db_session):
+        return None
+    return versao, [linha[1] for linha in layout]
+
+
+def _desempacotar(blobs: List[bytes], largura: int) -> np.ndarray:
+    if not blobs:
+        return np.empty((0, largura), dtype=TIPO_VALOR)
+    return np.frombuffer(b"".join(blobs), dtype=TIPO_VALOR).reshape(len(blobs), largura)
+
+
+def ler_todos_vetores(db_session) -> Optional[Tuple[int, List[str], List[str], np.ndarray]]:
+    """(versão, códigos, variáveis, matriz) de todos os municípios; None se os vetores estiverem defasados."""
+    layout = layout_vigente(db_session)
+    if layout is None:
+        return None
+    versao, variaveis = layout
+    linhas = db_session.query(VetorMunicipio.codigo_ibge, VetorMunicipio.valores).order_by(VetorMunicipio.codigo_ibge).all()
+    matriz = _desempacotar([linha[1] for linha in linhas], len(variaveis))
+    return versao, [linha[0] for linha in linhas], variaveis, matriz
+
+
+def brutos_das_cidades(db_session, cidades_ibge: List[str], plano) -> Optional[np.ndarray]:
+    """
+    Matriz bruta (cidades x variáveis do plano), na ordem de `cidades_ibge`, lida de uma linha
+    por cidade. Cidades sem vetor ficam com NaN. None se os vetores estiverem defasados.
+    """
+    layout = layout_vigente(db_session)
+    if layout is None:
+        return None
+    _, variaveis = layout
+
+    linhas = (
+        db_session.query(VetorMunicipio.codigo_ibge, VetorMunicipio.valores)
+        .filter(filtro_cidades(db_session, VetorMunicipio.codigo_ibge, cidades_ibge))
+        .all()
+    )
+    # Linha e coluna extras totalmente NaN: índice -1 aponta para "sem dado".
+    vetores = np.full((len(linhas) + 1, len(variaveis) + 1), np.nan, dtype=TIPO_VALOR)
+    vetores[:-1, :-1] = _desempacotar([linha[1] for linha in linhas], len(variaveis))
+
+    linha_por_codigo = {linha[0]: idx for idx, linha in enumerate(linhas)}
+    posicao = {var: idx for idx, var in enumerate(variaveis)}
+    idx_linhas = np.fromiter((linha_por_codigo.get(ibge, -1) for ibge in cidades_ibge), dtype=np.intp, count=len(cidades_ibge))
+    idx_colunas = np.array([posicao.get(var, -1) for var in plano.variaveis], dtype=np.intp)
+    return vetores[np.ix_(idx_linhas, idx_colunas)]
@@ -0,0 +1,33 @@
+import os
+import tempfile
+from pathlib import Path
+
+# Os módulos da aplicação criam as engines na importação: aponta para um banco descartável
+# antes de qualquer `import app...`, para nunca tocar no urbix.db de desenvolvimento.
+_PASTA_BANCO = tempfile.mkdtemp(prefix="urbix_testes_")
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(_PASTA_BANCO) / 'urbix_testes.db'}"
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401  (registra as tabelas em Base.metadata)
+
+
+@pytest.fixture
+def engine_teste(tmp_path):
+    """Banco SQLite vazio, com o esquema dos modelos, exclusivo do teste."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'fixture.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sessao(engine_teste):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine_teste)()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,114 @@
+import pytest
+from sqlalchemy import text
+
+from app.services import busca_municipios
+from app.services.busca_municipios import buscar_municipios, garantir_busca_municipios
+from app.services.ibge_catalog import load_ibge_catalog
+from app.services.indice_cidades import recarregar_indice_cidades
+from tools.seed_metadata import seed_municipios
+
+POPULACOES = {"4113700": 555_965, "4106902": 1_773_718, "4101408": 120_919}
+TERMOS = ["", "londrina", "ondri", "lond", "LONDRINA", "são paulo", "sao", "santa ma", "d'oeste", "a", "pr", "41", "4113700", "xyz"]
+
+
+@pytest.fixture
+def banco_busca(sessao):
+    """Municípios do catálogo IBGE, índice FTS5 sincronizado e algumas populações."""
+    sessao.execute(text("INSERT INTO municipios (codigo_ibge, nome, estado) VALUES (:codigo_ibge, :nome, :uf_abbr)"),
+                   load_ibge_catalog()["municipalities"])
+    sessao.execute(text(
+        "INSERT INTO valores_indicadores_latest (codigo_ibge, id_indicador, ano_referencia, valor, fonte, id_origem) "
+        "VALUES (:codigo, 'populacao_total', 2025, :valor, 'teste', 0)"
+    ), [{"codigo": codigo, "valor": valor} for codigo, valor in POPULACOES.items()])
+    assert garantir_busca_municipios(sessao.connection())
+    sessao.commit()
+    recarregar_indice_cidades(sessao)
+    return sessao
+
+
+@pytest.fixture(params=["fts", "memoria"])
+def caminho(request, banco_busca, monkeypatch):
+    """FTS5 ou o caminho sem SQLite/FTS5 (índice em memória + população dos candidatos)."""
+    if request.param == "memoria":
+        monkeypatch.setattr(busca_municipios, "busca_fts_disponivel", lambda db_session: False)
+    return banco_busca
+
+
+def _codigos(cidades):
+    return [cidade["codigo_ibge"] for cidade in cidades]
+
+
+@pytest.mark.parametrize("termo", TERMOS)
+@pytest.mark.parametrize("uf", [None, "PR"])
+def test_fts_igual_ao_indice_em_memoria(banco_busca, monkeypatch, termo, uf):
+    em_memoria = _codigos(buscar_municipios(banco_busca, termo, 50, uf))
+    monkeypatch.setattr(busca_municipios, "MODO_BUSCA", "fts")
+    assert _codigos(buscar_municipios(banco_busca, termo, 50, uf)) == em_memoria
+
+
+@pytest.mark.parametrize("termo", ["ondri", "londrina", "4113700", "lond", "", "pr"])
+def test_faixa_de_populacao_nao_muda_a_busca_por_texto(caminho, termo):
+    com_faixa = _codigos(buscar_municipios(caminho, termo, 50, faixa_populacao="acima_500k"))
+    sem_faixa = _codigos(buscar_municipios(caminho, termo, 6000))
+    assert com_faixa == [codigo for codigo in sem_faixa if POPULACOES.get(codigo, 0) >= 500_000]
+
+
+def test_faixa_filtra_pela_populacao(caminho):
+    resultado = buscar_municipios(caminho, "", 50, uf="PR", faixa_populacao="100k_500k")
+    assert _codigos(resultado) == ["4101408"]
+
+
+def test_faixa_sem_populacao_cadastrada(caminho):
+    assert buscar_municipios(caminho, "sao", 10, faixa_populacao="ate_5k") == []
+
+
+def test_caminho_sem_fts_le_populacao_so_dos_candidatos(banco_busca, monkeypatch):
+    monkeypatch.setattr(busca_municipios, "busca_fts_disponivel", lambda db_session: False)
+    consultados = []
+    original = busca_municipios._codigos_na_faixa
+
+    def _espiar(db_session, faixa, codigos):
+        consultados.append(len(codigos))
+        return original(db_session, faixa, codigos)
+
+    monkeypatch.setattr(busca_municipios, "_codigos_na_faixa", _espiar)
+    assert _codigos(buscar_municipios(banco_busca, "londrina", 5, faixa_populacao="acima_500k")) == ["4113700"]
+    assert consultados and max(consultados) <= busca_municipios.LOTE_CANDIDATOS
+
+
+def test_seed_municipios_reconstroi_o_fts(banco_busca, monkeypatch):
+    monkeypatch.setattr(busca_municipios, "MODO_BUSCA", "fts")
+    banco_busca.execute(text("UPDATE municipios SET nome = 'Nome Provisório' WHERE codigo_ibge = '4113700'"))
+    banco_busca.execute(text("DELETE FROM municipios_fts"))
+    banco_busca.commit()
+    assert buscar_municipios(banco_busca, "londrina", 5) == []
+
+    seed_municipios(banco_busca)
+    assert _codigos(buscar_municipios(banco_busca, "londrina", 5))[0] == "4113700"
+    assert buscar_municipios(banco_busca, "provisorio", 5) == []
+
+
+def test_fts_sincronizado_quando_municipios_divergem(banco_busca, monkeypatch):
+    monkeypatch.setattr(busca_municipios, "MODO_BUSCA", "fts")
+    banco_busca.execute(text("INSERT INTO municipios (codigo_ibge, nome, estado) VALUES ('9900001', 'Vila Teste', 'PR')"))
+    banco_busca.commit()
+    garantir_busca_municipios(banco_busca.connection())
+    banco_busca.commit()
+    assert _codigos(buscar_municipios(banco_busca, "vila tes", 5)) == ["9900001"]
+
+
+def test_indice_remontado_quando_municipios_mudam(banco_busca, monkeypatch):
+    import app.services.indice_cidades as indice_cidades
+
+    monkeypatch.setattr(indice_cidades, "INTERVALO_VERIFICACAO_S", 0.0)
+    assert buscar_municipios(banco_busca, "vila teste", 5) == []
+
+    banco_busca.execute(text("INSERT INTO municipios (codigo_ibge, nome, estado) VALUES ('9900001', 'Vila Teste', 'PR')"))
+    banco_busca.commit()
+    assert [cidade["codigo_ibge"] for cidade in buscar_municipios(banco_busca, "vila teste", 5)] == ["9900001"]
+
+    banco_busca.execute(text("INSERT INTO versao_dados (id, versao) VALUES (1, 1)"))
+    banco_busca.commit()
+    antes = indice_cidades.obter_indice_cidades(banco_busca)
+    assert antes.estado[0] == 1
+    assert indice_cidades.obter_indice_cidades(banco_busca) is antes
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import tools.cache_planilhas as cache
+
+
+@pytest.fixture
+def planilha(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_ROOT", tmp_path / "cache")
+    monkeypatch.setattr(cache, "CACHE_ATIVO", True)
+    caminho = tmp_path / "munic.xlsx"
+    pd.DataFrame({
+        "CodMun": [4101408, 4106902, 4113700, 4101408],
+        "Texto": ["Sim", None, "Não", "Sim"],
+        "Misto": [1, "-", "1.234,5", None],
+        "Valor": [1.5, np.nan, 3.0, 4.0],
+    }).to_excel(caminho, index=False)
+    return caminho
+
+
+def test_leitura_pelo_cache_igual_a_direta(planilha):
+    direto = pd.read_excel(planilha)
+    primeira, do_cache = cache.ler_planilha(planilha, {})
+    assert not do_cache
+    segunda, do_cache = cache.ler_planilha(planilha, {})
+    assert do_cache
+
+    for df in (primeira, segunda):
+        assert list(df.columns) == list(direto.columns)
+        for coluna in direto.columns:
+            pd.testing.assert_series_equal(
+                df[coluna].astype(str), direto[coluna].astype(str), check_dtype=False, check_categorical=False
+            )
+            assert (df[coluna].isna() == direto[coluna].isna()).all()
+
+
+def test_texto_volta_categorico_e_usecols(planilha):
+    cache.ler_planilha(planilha, {})
+    df, do_cache = cache.ler_planilha(planilha, {}, usecols=lambda coluna: coluna in ("Texto", "Valor"))
+    assert do_cache
+    assert list(df.columns) == ["Texto", "Valor"]
+    assert isinstance(df["Texto"].dtype, pd.CategoricalDtype)
+    assert sorted(df["Texto"].cat.categories) == ["Não", "Sim"]
+    assert df["Valor"].dtype == np.float64
@@ -0,0 +1,102 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from app.services.armazenamento_valores import converter_para_armazenamento_codificado
+from app.services.carga_valores import NOME_INDICE_UNICO, garantir_indice_unico, gravar_valores
+
+
+@pytest.fixture(params=["texto", "codificado"])
+def banco(request, engine_teste, sessao):
+    if request.param == "codificado":
+        converter_para_armazenamento_codificado(engine_teste)
+    return sessao
+
+
+def _valores(sessao) -> dict:
+    return {
+        (codigo, indicador, ano): (valor, fonte)
+        for codigo, indicador, ano, valor, fonte in sessao.execute(text(
+            "SELECT codigo_ibge, id_indicador, ano_referencia, valor, fonte FROM valores_indicadores"
+        )).all()
+    }
+
+
+def test_repeticoes_na_entrada_a_ultima_vence(banco):
+    enviados = gravar_valores(banco, [
+        ("4101408", "ind_a", 2021, 1.0, "f1"),
+        ("4101408", "ind_a", 2021, 2.0, "f2"),
+        (4101408, "ind_a", "2021", 3, "f3"),
+        ("4101408", "ind_a", 2022, 4.0, "f1"),
+    ])
+    banco.commit()
+    assert enviados == 2
+    assert _valores(banco) == {
+        ("4101408", "ind_a", 2021): (3.0, "f3"),
+        ("4101408", "ind_a", 2022): (4.0, "f1"),
+    }
+
+
+def test_recarga_sobrescreve_sem_duplicar(banco):
+    gravar_valores(banco, [("4101408", "ind_a", 2021, 1.0, "f1"), ("4101408", "ind_b", 2021, None, "f1")])
+    banco.commit()
+    ids = dict(banco.execute(text("SELECT id_indicador, id FROM valores_indicadores")).all())
+
+    gravar_valores(banco, [("4101408", "ind_a", 2021, 5.0, "f2"), ("4101408", "ind_b", 2021, 6.0, "f2")])
+    banco.commit()
+    assert _valores(banco) == {
+        ("4101408", "ind_a", 2021): (5.0, "f2"),
+        ("4101408", "ind_b", 2021): (6.0, "f2"),
+    }
+    # Upsert atualiza a linha existente em vez de apagar e reinserir.
+    assert dict(banco.execute(text("SELECT id_indicador, id FROM valores_indicadores")).all()) == ids
+
+
+def test_sem_sobrescrever_mantem_existentes(banco):
+    gravar_valores(banco, [("4101408", "ind_a", 2021, 1.0, "f1")])
+    gravar_valores(banco, [("4101408", "ind_a", 2021, 9.0, "f9"), ("4101408", "ind_a", 2022, 2.0, "f9")],
+                   sobrescrever=False)
+    banco.commit()
+    assert _valores(banco) == {
+        ("4101408", "ind_a", 2021): (1.0, "f1"),
+        ("4101408", "ind_a", 2022): (2.0, "f9"),
+    }
+
+
+def test_entrada_vazia(banco):
+    assert gravar_valores(banco, []) == 0
+
+
+def test_indice_unico_remove_duplicatas_mantendo_maior_id(sessao, caplog):
+    # Base antiga: sem a chave única e com duplicatas acumuladas por recargas.
+    sessao.execute(text(f"DROP INDEX {NOME_INDICE_UNICO}"))
+    sessao.execute(text(
+        "INSERT INTO valores_indicadores (codigo_ibge, id_indicador, ano_referencia, valor, fonte) VALUES "
+        "('4101408', 'ind_a', 2021, 1.0, 'velha'), ('4101408', 'ind_a', 2021, 2.0, 'nova'), "
+        "('4101408', 'ind_a', 2022, 3.0, 'unica'), ('4101408', 'ind_b', 2021, 4.0, 'velha'), "
+        "('4101408', 'ind_b', 2021, 5.0, 'meio'), ('4101408', 'ind_b', 2021, 6.0, 'nova')"
+    ))
+    sessao.commit()
+
+    with caplog.at_level(logging.INFO, logger="app.services.carga_valores"):
+        assert garantir_indice_unico(sessao) is True
+    assert "3 duplicata(s)" in caplog.text
+    assert _valores(sessao) == {
+        ("4101408", "ind_a", 2021): (2.0, "nova"),
+        ("4101408", "ind_a", 2022): (3.0, "unica"),
+        ("4101408", "ind_b", 2021): (6.0, "nova"),
+    }
+    assert sessao.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :nome"
+    ), {"nome": NOME_INDICE_UNICO}).first()
+
+    # Com a chave já garantida a chamada é idempotente (e silenciosa) e o upsert passa a valer.
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="app.services.carga_valores"):
+        assert garantir_indice_unico(sessao) is False
+    assert caplog.records == []
+    gravar_valores(sessao, [("4101408", "ind_a", 2021, 7.0, "recarga")])
+    sessao.commit()
+    assert _valores(sessao)[("4101408", "ind_a", 2021)] == (7.0, "recarga")
+    assert sessao.execute(text("SELECT COUNT(*) FROM valores_indicadores")).scalar() == 3
@@ -0,0 +1,144 @@
+import random
+
+import pytest
+from sqlalchemy import bindparam, text
+
+from app.services.armazenamento_valores import (
+    NOME_INDICE_UNICO_FATOS,
+    TABELA_FATOS,
+    converter_para_armazenamento_codificado,
+)
+from app.services.carga_valores import garantir_indice_unico
+from app.services.consulta_mais_recentes import consulta_mais_recentes
+
+# Índices cujas colunas iniciais são (cidade, indicador, ano): qualquer um serve à consulta.
+INDICES_ACEITOS = ("ix_vi_cidade_indicador_ano_id", "ux_valores_indicadores_chave", NOME_INDICE_UNICO_FATOS)
+
+# Consulta original do fallback de _buscar_valores_mais_recentes, mantida só como referência.
+CONSULTA_ANTIGA = """
+    SELECT v.codigo_ibge, v.id_indicador, v.ano_referencia, v.valor, v.fonte, v.id
+    FROM valores_indicadores v
+    JOIN (
+        SELECT codigo_ibge, id_indicador, ano_referencia, MAX(id) AS id_max
+        FROM valores_indicadores v2
+        JOIN (
+            SELECT codigo_ibge AS c, id_indicador AS i, MAX(ano_referencia) AS ano_max
+            FROM valores_indicadores
+            WHERE {filtro}
+            GROUP BY codigo_ibge, id_indicador
+        ) a ON v2.codigo_ibge = a.c AND v2.id_indicador = a.i AND v2.ano_referencia = a.ano_max
+        WHERE {filtro}
+        GROUP BY codigo_ibge, id_indicador, ano_referencia
+    ) b
+      ON v.codigo_ibge = b.codigo_ibge
+     AND v.id_indicador = b.id_indicador
+     AND v.ano_referencia = b.ano_referencia
+     AND v.id = b.id_max
+"""
+
+CIDADES = [f"41{i:05d}" for i in range(300)]
+INDICADORES = [f"ind_{j}" for j in range(8)]
+CENARIOS = {
+    "sem filtro": (None, None),
+    "cidades": (CIDADES[:100], None),
+    "cidades e indicadores": (CIDADES[:100], INDICADORES[:3]),
+}
+
+
+def _consulta_antiga(cidades, indicadores):
+    filtros = ["1 = 1"]
+    if cidades is not None:
+        filtros.append("codigo_ibge IN :cidades")
+    if indicadores is not None:
+        filtros.append("id_indicador IN :indicadores")
+    consulta = text(CONSULTA_ANTIGA.format(filtro=" AND ".join(filtros)))
+    if cidades is not None:
+        consulta = consulta.bindparams(bindparam("cidades", value=cidades, expanding=True))
+    if indicadores is not None:
+        consulta = consulta.bindparams(bindparam("indicadores", value=indicadores, expanding=True))
+    return consulta
+
+
+def _plano(conn, consulta) -> list[str]:
+    sql = str(consulta.compile(conn, compile_kwargs={"literal_binds": True}))
+    return [linha[3] for linha in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()]
+
+
+def _problemas_do_plano(plano: list[str], tabela: str) -> list[str]:
+    problemas = []
+    acessos = [passo for passo in plano if passo.startswith(("SCAN", "SEARCH")) and f" {tabela} " in f"{passo} "]
+    if not acessos:
+        problemas.append(f"{tabela} não aparece no plano")
+    for passo in acessos:
+        if not any(f"INDEX {indice}" in passo for indice in INDICES_ACEITOS):
+            problemas.append(f"acesso sem o índice da chave: {passo}")
+    for passo in plano:
+        if "USE TEMP B-TREE" in passo:
+            problemas.append(f"ordenação temporária: {passo}")
+    return problemas
+
+
+@pytest.fixture(params=["sem ANALYZE", "com ANALYZE", "codificado"])
+def banco_legado(request, engine_teste, sessao):
+    """
+    Fato com vários anos por chave e os índices que `ensure_sqlite_optimizations` criava em
+    bases antigas, depois de passar por `garantir_indice_unico` como na inicialização da API.
+    """
+    aleatorio = random.Random(7)
+    linhas = [
+        {"codigo": codigo, "indicador": indicador, "ano": ano, "valor": aleatorio.random(), "fonte": f"fonte_{ano}"}
+        for codigo in CIDADES
+        for indicador in INDICADORES
+        for ano in (2020, 2021, 2022)
+        if aleatorio.random() < 0.8
+    ]
+    conn = sessao.connection()
+    conn.execute(text(
+        "INSERT INTO valores_indicadores (codigo_ibge, id_indicador, ano_referencia, valor, fonte) "
+        "VALUES (:codigo, :indicador, :ano, :valor, :fonte)"
+    ), linhas)
+    conn.execute(text(
+        "CREATE INDEX ix_vi_cidade_indicador_ano_id "
+        "ON valores_indicadores (codigo_ibge, id_indicador, ano_referencia DESC, id DESC)"
+    ))
+    conn.execute(text("CREATE INDEX ix_vi_cidade_indicador ON valores_indicadores (codigo_ibge, id_indicador)"))
+    sessao.commit()
+    garantir_indice_unico(sessao)
+
+    tabela = "valores_indicadores"
+    if request.param == "codificado":
+        sessao.close()
+        converter_para_armazenamento_codificado(engine_teste)
+        tabela = TABELA_FATOS
+    if request.param != "sem ANALYZE":
+        sessao.execute(text("ANALYZE"))
+        sessao.commit()
+    return sessao.connection(), tabela
+
+
+def test_indice_redundante_removido(banco_legado):
+    conn, _ = banco_legado
+    assert conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_vi_cidade_indicador'"
+    )).first() is None
+
+
+@pytest.mark.parametrize("formulacao", ["max_nua", "row_number"])
+@pytest.mark.parametrize("cenario", list(CENARIOS))
+def test_plano_usa_indice_da_chave(banco_legado, formulacao, cenario):
+    conn, tabela = banco_legado
+    cidades, indicadores = CENARIOS[cenario]
+    consulta = consulta_mais_recentes(conn, cidades, indicadores, formulacao)
+    assert _problemas_do_plano(_plano(conn, consulta), tabela) == []
+
+
+@pytest.mark.parametrize("formulacao", ["max_nua", "row_number"])
+@pytest.mark.parametrize("cenario", list(CENARIOS))
+def test_resultado_igual_ao_da_consulta_antiga(banco_legado, formulacao, cenario):
+    conn, _ = banco_legado
+    cidades, indicadores = CENARIOS[cenario]
+    esperado = sorted(tuple(linha) for linha in conn.execute(_consulta_antiga(cidades, indicadores)).all())
+    obtido = sorted(tuple(linha) for linha in conn.execute(
+        consulta_mais_recentes(conn, cidades, indicadores, formulacao)
+    ).all())
+    assert esperado and obtido == esperado
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from app.services.ibge_catalog import ibge_prefix_lookup, resolve_ibge_codes
+
+
+def test_resolve_caminhos_de_6_e_7_digitos():
+    resolvidos = resolve_ibge_codes(["4101408", "410140", "Apucarana 4101408", "004101408", 4101408])
+    assert list(resolvidos) == ["4101408"] * 5
+
+
+def test_resolve_descarta_sentinelas_e_lixo():
+    resolvidos = resolve_ibge_codes(["0999999", "9999999", "999999", "", None, np.nan, "abc", "12345"])
+    assert all(codigo is None for codigo in resolvidos)
+
+
+def test_resolve_colunas_float():
+    assert list(resolve_ibge_codes(pd.Series([4101408.0, np.nan, 410140.0]))) == ["4101408", None, "4101408"]
+    assert list(resolve_ibge_codes(pd.Series(["4101408.0", "410140.00"], dtype=object))) == ["4101408", "4101408"]
+
+
+def test_resolve_celula_longa_nao_afeta_as_demais():
+    valores = pd.Series(["4101408"] * 1000, dtype=object)
+    valores[3] = "x" * 5000
+    resolvidos = resolve_ibge_codes(valores)
+    assert resolvidos[3] is None
+    assert (resolvidos[np.arange(1000) != 3] == "4101408").all()
+
+
+def test_lookup_sem_sentinelas():
+    lookup = ibge_prefix_lookup()
+    assert lookup[99999] == 0 and lookup[999999] == 0
+    assert lookup[410140] == 4101408
@@ -0,0 +1,119 @@
+import bz2
+import gzip
+import lzma
+import zipfile
+
+import pandas as pd
+import pytest
+
+import tools.local_etl_service as etl
+
+CONTEUDO = "município;saldomovimentação;outra\n410140;1;x\n410140;-1;y\n411370;1;z\n"
+
+
+def _gravar(caminho, formato):
+    dados = CONTEUDO.encode("utf-8")
+    if formato == "gz":
+        caminho.write_bytes(gzip.compress(dados))
+    elif formato == "bz2":
+        caminho.write_bytes(bz2.compress(dados))
+    elif formato == "xz":
+        caminho.write_bytes(lzma.compress(dados))
+    elif formato == "zip":
+        with zipfile.ZipFile(caminho, "w") as arquivo:
+            arquivo.writestr("CAGEDMOV.txt", dados)
+    else:
+        caminho.write_bytes(dados)
+
+
+@pytest.mark.parametrize("formato", ["txt", "gz", "bz2", "xz", "zip"])
+@pytest.mark.parametrize("rapido", [True, False])
+def test_ler_csv_compactado(tmp_path, monkeypatch, formato, rapido):
+    monkeypatch.setattr(etl, "CSV_RAPIDO", rapido)
+    caminho = tmp_path / f"CAGEDMOV.{formato}"
+    _gravar(caminho, formato)
+
+    chunks = etl._ler_csv_flexivel(caminho, {}, etl._filtro_colunas(["município", "saldomovimentação"]))
+    df = pd.concat(list(chunks))
+
+    assert list(df.columns) == ["município", "saldomovimentação"]
+    assert df["município"].astype(str).tolist() == ["410140", "410140", "411370"]
+
+
+ARQUIVO_MOVIMENTACOES = pd.DataFrame({
+    "município": ["410140", "4101408", "411370", "410140", "999999", "abc", "411370", "410140"],
+    "saldo": ["1", "2,5", "-1", "Sim", "7", "3", "", "4"],
+})
+
+
+def _agregar(chunks, agregacao):
+    acumulador = etl.AcumuladorMunicipal(etl._codigos_municipios())
+    for chunk in chunks:
+        extraido = etl._valores_da_coluna(chunk, "município", "saldo")
+        if extraido is not None:
+            acumulador.adicionar(*extraido)
+    return acumulador.registros("saldo", 2024, "teste.csv", agregacao), acumulador.ignorados
+
+
+@pytest.mark.parametrize("agregacao", etl.AGREGACOES)
+@pytest.mark.parametrize("tamanho_chunk", [1, 2, 3])
+def test_municipio_dividido_entre_chunks_agrega_igual(agregacao, tamanho_chunk):
+    inteiro = _agregar([ARQUIVO_MOVIMENTACOES], agregacao)
+    chunks = [
+        ARQUIVO_MOVIMENTACOES.iloc[inicio:inicio + tamanho_chunk]
+        for inicio in range(0, len(ARQUIVO_MOVIMENTACOES), tamanho_chunk)
+    ]
+    assert _agregar(chunks, agregacao) == inteiro
+
+
+def test_agregados_e_ignorados():
+    registros, ignorados = _agregar([ARQUIVO_MOVIMENTACOES], "soma")
+    assert {codigo: valor for codigo, _, _, valor, _ in registros} == {"4101408": 8.5, "4113700": -1.0}
+    assert ignorados == 2
+
+    media, _ = _agregar([ARQUIVO_MOVIMENTACOES], "media")
+    assert {codigo: valor for codigo, _, _, valor, _ in media} == {"4101408": 8.5 / 4, "4113700": -1.0}
+
+
+PLANILHA_PIB = {"arquivo": "PIB/pib.xlsx", "coluna_codigo": "Código", "pandas_kwargs": {"sheet_name": "PIB", "header": 0}}
+
+
+def test_dados_base_entram_no_agrupamento(monkeypatch):
+    monkeypatch.setattr(etl, "DADOS_BASE", {
+        "pib_absoluto": {**PLANILHA_PIB, "coluna_valor": "PIB"},
+        "populacao_total": {"arquivo": "POP/pop.xls", "coluna_codigo": "COD", "coluna_valor": "POP"},
+    })
+    monkeypatch.setattr(etl, "INDICADORES", {"economia": {
+        "pib_per_capita": {"tipo_calculo": "direto", "variavel_direta": {**PLANILHA_PIB, "coluna_valor": "PIB per capita"}},
+        "taxa": {"tipo_calculo": "porcentagem", "numerador": {**PLANILHA_PIB, "coluna_valor": "Impostos"}},
+    }})
+
+    regras = etl.regras_fontes_locais(carregadas_por_api={"populacao_total"})
+    assert set(regras) == {"pib_absoluto", "pib_per_capita", "taxa_numerador"}
+
+    grupos = etl.agrupar_fontes_locais(regras)
+    assert list(grupos.values()) == [regras]
+
+
+def test_relatorio_com_leitura_medida_e_economia_estimada(monkeypatch):
+    lidos = []
+
+    def _extrair(regras_fonte, db_session, ano_padrao=2024):
+        lidos.append(sorted(regras_fonte))
+        return 2.0
+
+    monkeypatch.setattr(etl, "extrair_fonte_local", _extrair)
+    regras = {
+        "pib_absoluto": {**PLANILHA_PIB, "coluna_valor": "PIB"},
+        "pib_per_capita": {**PLANILHA_PIB, "coluna_valor": "PIB per capita"},
+        "caged": {"arquivo": "CAGED/mov.txt", "coluna_codigo": "município", "coluna_valor": "saldo"},
+        "pendente": {"arquivo": "NÃO_BAIXADO"},
+    }
+    relatorio = etl.extrair_planilhas_agrupadas(regras, db_session=None)
+
+    assert lidos == [["pib_absoluto", "pib_per_capita"], ["caged"]]
+    assert [(item["arquivo"], item["leituras_evitadas"], item["economia_estimada_s"]) for item in relatorio] == [
+        ("pib.xlsx", 1, 2.0),
+        ("mov.txt", 0, 0.0),
+    ]
+    assert all(item["tempo_leitura_s"] == 2.0 for item in relatorio)
@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.normalizacao_global import calcular_normas_globais
+
+INDICADORES = ["renda", "homicidios"]
+PESOS = {"renda": 0.6, "homicidios": 0.4}
+IMPACTOS = {"renda": 1, "homicidios": -1}
+
+
+def _normas(brutos: np.ndarray):
+    residente = SimpleNamespace(versao=1, brutos_do_plano=lambda plano: brutos)
+    plano = SimpleNamespace(indicadores=INDICADORES, montar_matriz=lambda matriz: matriz)
+    return calcular_normas_globais(residente, plano, PESOS, IMPACTOS)
+
+
+def test_municipios_sem_dado_nao_alteram_normas_nem_ideais():
+    observados = np.array([[100.0, 5.0], [300.0, np.nan], [200.0, 20.0]])
+    vazios = np.full((1000, 2), np.nan)
+
+    base = _normas(observados)
+    com_vazios = _normas(np.vstack([observados, vazios]))
+
+    np.testing.assert_allclose(com_vazios.norma, base.norma)
+    np.testing.assert_allclose(com_vazios.pior_valor, base.pior_valor)
+    np.testing.assert_allclose(com_vazios.sip, base.sip)
+    np.testing.assert_allclose(com_vazios.sin, base.sin)
+    assert len(com_vazios.ponderada) == len(observados)
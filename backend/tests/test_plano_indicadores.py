@@ -0,0 +1,63 @@
+import copy
+
+import pytest
+
+from app import etl_config
+from app.services import plano_indicadores
+from app.services.plano_indicadores import invalidar_plano, obter_plano
+from app.services.versao_dados import incrementar_versao_dados
+
+
+def _primeiro_indicador_direto():
+    for dominio, indicadores in etl_config.INDICADORES.items():
+        for id_ind, regras in indicadores.items():
+            if id_ind in obter_plano().indicadores and regras.get("tipo_calculo") == "direto":
+                return dominio, id_ind
+    raise AssertionError("etl_config sem indicador direto válido")
+
+
+def test_plano_em_cache_ate_ser_invalidado(monkeypatch):
+    invalidar_plano()
+    plano = obter_plano()
+
+    # Leitura do cache: nem recompila nem recalcula o hash das regras.
+    monkeypatch.setattr(plano_indicadores, "compilar_plano", lambda: pytest.fail("plano recompilado"))
+    monkeypatch.setattr(plano_indicadores, "_hash_config", lambda: pytest.fail("hash recalculado"))
+    assert obter_plano() is plano
+
+
+def test_versao_dos_dados_nao_recompila_o_plano(sessao):
+    invalidar_plano()
+    plano = obter_plano()
+    incrementar_versao_dados(sessao)
+    assert obter_plano() is plano
+
+
+def test_config_recriada_com_mesmo_conteudo_mantem_o_hash(monkeypatch):
+    invalidar_plano()
+    plano = obter_plano()
+    monkeypatch.setattr(etl_config, "INDICADORES", copy.deepcopy(etl_config.INDICADORES))
+    monkeypatch.setattr(etl_config, "DADOS_BASE", copy.deepcopy(etl_config.DADOS_BASE))
+    invalidar_plano()
+    novo = obter_plano()
+    assert novo is not plano
+    # Caches derivados (matriz residente, normas globais) são chaveados pelo hash e seguem válidos.
+    assert novo.hash_config == plano.hash_config
+    assert novo.indicadores == plano.indicadores
+
+
+def test_edicao_das_regras_recompila_apos_invalidar(monkeypatch):
+    invalidar_plano()
+    plano = obter_plano()
+    dominio, id_ind = _primeiro_indicador_direto()
+
+    indicadores = copy.deepcopy(etl_config.INDICADORES)
+    indicadores[dominio][id_ind]["status"] = "pendente"
+    monkeypatch.setattr(etl_config, "INDICADORES", indicadores)
+    assert obter_plano() is plano
+
+    invalidar_plano()
+    novo = obter_plano()
+    assert id_ind not in novo.indicadores
+    assert novo.hash_config != plano.hash_config
+    invalidar_plano()
@@ -0,0 +1,133 @@
+import random
+
+import pytest
+from sqlalchemy import text
+
+from app.services.armazenamento_valores import converter_para_armazenamento_codificado
+from app.services.consulta_mais_recentes import sql_mais_recentes
+from app.services.snapshot_latest import (
+    instalar_manutencao_snapshot,
+    manutencao_incremental_ativa,
+    reconstruir_snapshot_latest,
+)
+
+CIDADES = [f"41{i:05d}" for i in range(20)]
+INDICADORES = [f"ind_{j}" for j in range(4)]
+ANOS = [2019, 2020, 2021, 2022]
+
+
+@pytest.fixture(params=["texto", "codificado"])
+def banco(request, engine_teste, sessao):
+    """Fato com histórico, snapshot reconstruído e os triggers de manutenção instalados."""
+    aleatorio = random.Random(3)
+    linhas = [
+        {"codigo": codigo, "indicador": indicador, "ano": ano, "valor": aleatorio.random(), "fonte": f"fonte_{ano}"}
+        for codigo in CIDADES
+        for indicador in INDICADORES
+        for ano in ANOS[:3]
+        if aleatorio.random() < 0.7
+    ]
+    sessao.execute(text(
+        "INSERT INTO valores_indicadores (codigo_ibge, id_indicador, ano_referencia, valor, fonte) "
+        "VALUES (:codigo, :indicador, :ano, :valor, :fonte)"
+    ), linhas)
+    sessao.commit()
+    sessao.close()
+
+    if request.param == "codificado":
+        converter_para_armazenamento_codificado(engine_teste)
+    else:
+        instalar_manutencao_snapshot(engine_teste)
+    reconstruir_snapshot_latest(sessao)
+    assert manutencao_incremental_ativa(sessao.connection())
+    return sessao
+
+
+def _snapshot(sessao) -> list:
+    return sorted(tuple(linha) for linha in sessao.execute(text(
+        "SELECT codigo_ibge, id_indicador, ano_referencia, valor, fonte, id_origem FROM valores_indicadores_latest"
+    )).all())
+
+
+def _esperado(sessao) -> list:
+    return sorted(tuple(linha) for linha in sessao.execute(text(sql_mais_recentes(sessao.connection()))).all())
+
+
+def _chaves(sessao) -> dict:
+    return {
+        (codigo, indicador, ano): identificador
+        for identificador, codigo, indicador, ano in sessao.execute(text(
+            "SELECT id, codigo_ibge, id_indicador, ano_referencia FROM valores_indicadores"
+        )).all()
+    }
+
+
+def test_insert_mais_recente_e_mais_antigo(banco):
+    banco.execute(text(
+        "INSERT INTO valores_indicadores (codigo_ibge, id_indicador, ano_referencia, valor, fonte) VALUES "
+        "(:c, :i, 2022 + 1, 1.5, 'nova'), (:c, :i, 1990, 9.5, 'antiga'), ('4199999', :i, 2000, 2.5, 'nova')"
+    ), {"c": CIDADES[0], "i": INDICADORES[0]})
+    banco.commit()
+    snapshot = _snapshot(banco)
+    assert snapshot == _esperado(banco)
+    assert (CIDADES[0], INDICADORES[0], 2023, 1.5, "nova") in [linha[:5] for linha in snapshot]
+
+
+def test_update_de_valor_ano_e_chave(banco):
+    origem = banco.execute(text(
+        "SELECT id_origem FROM valores_indicadores_latest ORDER BY codigo_ibge, id_indicador LIMIT 3"
+    )).scalars().all()
+
+    # Valor do registro vigente, ano que o torna o mais antigo e troca de cidade (chave nova).
+    banco.execute(text("UPDATE valores_indicadores SET valor = -1.0 WHERE id = :id"), {"id": origem[0]})
+    banco.execute(text("UPDATE valores_indicadores SET ano_referencia = 1980 WHERE id = :id"), {"id": origem[1]})
+    banco.execute(text("UPDATE valores_indicadores SET codigo_ibge = '4199998' WHERE id = :id"), {"id": origem[2]})
+    banco.commit()
+    snapshot = _snapshot(banco)
+    assert snapshot == _esperado(banco)
+    assert ("4199998", origem[2]) in [(linha[0], linha[5]) for linha in snapshot]
+
+
+def test_delete_do_registro_vigente_recupera_o_anterior(banco):
+    vigentes = banco.execute(text("SELECT id_origem FROM valores_indicadores_latest")).scalars().all()
+    banco.execute(text("DELETE FROM valores_indicadores WHERE id = :id"), [{"id": i} for i in vigentes[::2]])
+    banco.commit()
+    assert _snapshot(banco) == _esperado(banco)
+
+    # Chave sem nenhum ano restante sai do snapshot.
+    banco.execute(text("DELETE FROM valores_indicadores WHERE codigo_ibge = :c"), {"c": CIDADES[1]})
+    banco.commit()
+    snapshot = _snapshot(banco)
+    assert snapshot == _esperado(banco)
+    assert all(linha[0] != CIDADES[1] for linha in snapshot)
+
+
+def test_sequencia_aleatoria_de_escritas(banco):
+    aleatorio = random.Random(11)
+    for _ in range(150):
+        chaves = _chaves(banco)
+        operacao = aleatorio.choice(["insert", "update", "delete"])
+        if operacao == "insert" or not chaves:
+            livres = [
+                (c, i, a) for c in CIDADES[:5] for i in INDICADORES for a in ANOS if (c, i, a) not in chaves
+            ]
+            if not livres:
+                continue
+            codigo, indicador, ano = aleatorio.choice(livres)
+            banco.execute(text(
+                "INSERT INTO valores_indicadores (codigo_ibge, id_indicador, ano_referencia, valor, fonte) "
+                "VALUES (:c, :i, :a, :v, :f)"
+            ), {"c": codigo, "i": indicador, "a": ano, "v": aleatorio.random(), "f": f"fonte_{ano}"})
+        elif operacao == "update":
+            (codigo, indicador, _), identificador = aleatorio.choice(sorted(chaves.items()))
+            anos_livres = [a for a in ANOS if (codigo, indicador, a) not in chaves]
+            novo_ano = aleatorio.choice(anos_livres) if anos_livres and aleatorio.random() < 0.5 else None
+            banco.execute(text(
+                "UPDATE valores_indicadores SET valor = :v, "
+                "ano_referencia = COALESCE(:a, ano_referencia) WHERE id = :id"
+            ), {"v": aleatorio.random(), "a": novo_ano, "id": identificador})
+        else:
+            identificador = aleatorio.choice(sorted(chaves.values()))
+            banco.execute(text("DELETE FROM valores_indicadores WHERE id = :id"), {"id": identificador})
+        banco.commit()
+        assert _snapshot(banco) == _esperado(banco), operacao
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from app.services.topsis_core import aplicar_topsis, topsis_matricial
+from tools.benchmark_topsis import _aplicar_topsis_pandas, _gerar_matriz
+
+
+def _comparar(resultado, referencia):
+    assert [r["codigo_ibge"] for r in resultado] == [r["codigo_ibge"] for r in referencia]
+    for obtido, esperado in zip(resultado, referencia):
+        for chave in ("pontuacao_topsis", "distancia_positiva", "distancia_negativa"):
+            assert obtido[chave] == pytest.approx(esperado[chave], abs=1e-4)
+        assert obtido["valores_calculados"].keys() == esperado["valores_calculados"].keys()
+        assert np.allclose(
+            list(obtido["valores_calculados"].values()),
+            list(esperado["valores_calculados"].values()),
+        )
+
+
+@pytest.mark.parametrize("n_cidades", [1, 2, 10, 300])
+def test_nucleo_numpy_igual_a_referencia_pandas(n_cidades):
+    df, pesos, impactos = _gerar_matriz(n_cidades, 19, seed=n_cidades)
+    _comparar(aplicar_topsis(df, pesos, impactos), _aplicar_topsis_pandas(df, pesos, impactos))
+
+
+def test_colunas_vazias_e_constantes_igual_a_referencia_pandas():
+    df, pesos, impactos = _gerar_matriz(50, 6, seed=3)
+    df["indicador_1"] = np.nan
+    df["indicador_2"] = 0.0
+    df["indicador_3"] = 7.0
+    df.iloc[::4, 4] = np.nan
+    _comparar(aplicar_topsis(df, pesos, impactos), _aplicar_topsis_pandas(df, pesos, impactos))
+
+
+def test_matricial_descarta_colunas_sem_dados():
+    df, pesos, impactos = _gerar_matriz(20, 5, seed=9)
+    df["indicador_0"] = np.nan
+    matriz, validas, pontuacao, dist_pos, dist_neg = topsis_matricial(
+        df.to_numpy(),
+        np.array([pesos[c] for c in df.columns]),
+        np.array([impactos[c] for c in df.columns]),
+    )
+    assert validas.tolist() == [False, True, True, True, True]
+    assert matriz.shape == (20, 4) and not np.isnan(matriz).any()
+    assert ((pontuacao >= 0) & (pontuacao <= 1)).all()
+    assert np.allclose(pontuacao, dist_neg / (dist_pos + dist_neg))
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from app.services import topsis_incremental
+from app.services.plano_indicadores import obter_plano
+from app.services.topsis_core import topsis_matricial
+from app.services.topsis_incremental import TopsisIncremental
+
+
+@pytest.fixture
+def motor():
+    plano = obter_plano()
+    rng = np.random.default_rng(11)
+    n_cidades = 40
+    brutos = rng.uniform(1, 1e5, size=(n_cidades, len(plano.variaveis)))
+    brutos[rng.random(brutos.shape) < 0.1] = np.nan
+    pesos = rng.uniform(0.1, 1.0, size=len(plano.indicadores))
+    impactos = np.where(np.arange(len(plano.indicadores)) % 3 == 0, -1, 1)
+    codigos = [str(4100000 + i) for i in range(n_cidades)]
+    return TopsisIncremental(codigos, brutos, plano, pesos, impactos)
+
+
+def _conferir_com_recalculo(motor):
+    matriz = motor.plano.montar_matriz(motor.brutos)
+    preenchida, validas, pontuacao, dist_pos, dist_neg = topsis_matricial(
+        matriz, motor.pesos, np.where(motor.beneficio, 1, -1)
+    )
+    obtida, obtida_pos, obtida_neg = motor.pontuacoes()
+    assert np.allclose(obtida, pontuacao, atol=1e-9)
+    assert np.allclose(obtida_pos, dist_pos, atol=1e-9)
+    assert np.allclose(obtida_neg, dist_neg, atol=1e-9)
+    assert np.array_equal(motor.preenchida[:, validas], preenchida)
+
+
+def test_estado_inicial_igual_ao_recalculo(motor):
+    _conferir_com_recalculo(motor)
+
+
+def test_edicoes_aleatorias_iguais_ao_recalculo(motor):
+    rng = np.random.default_rng(5)
+    variaveis = motor.plano.variaveis
+    for _ in range(200):
+        codigo = motor.cidades[rng.integers(len(motor.cidades))]
+        variavel = variaveis[rng.integers(len(variaveis))]
+        sorteio = rng.random()
+        if sorteio < 0.1:
+            valor = None  # remove o valor (ausência)
+        elif sorteio < 0.2:
+            valor = float(rng.choice([1.0, 2e5]))  # novo extremo
+        else:
+            valor = float(rng.uniform(1, 1e5))
+        motor.atualizar(codigo, {variavel: valor})
+        _conferir_com_recalculo(motor)
+
+
+def test_remover_e_repor_valor(motor):
+    codigo = motor.cidades[0]
+    originais = {var: motor.brutos[0, idx] for var, idx in motor.plano.indice_variavel.items()}
+
+    motor.atualizar(codigo, {var: None for var in originais})
+    _conferir_com_recalculo(motor)
+
+    motor.atualizar(codigo, {var: (None if np.isnan(v) else v) for var, v in originais.items()})
+    _conferir_com_recalculo(motor)
+
+
+def test_extremo_removido_exige_varrer_a_coluna(motor):
+    for variavel, idx in motor.plano.indice_variavel.items():
+        linha = int(np.nanargmax(motor.brutos[:, idx]))
+        motor.atualizar(motor.cidades[linha], {variavel: 0.5})
+        _conferir_com_recalculo(motor)
+
+
+def test_cidade_ou_variavel_fora_da_sessao_e_ignorada(motor):
+    antes = motor.pontuacoes()[0].copy()
+    assert motor.atualizar("9999999", {motor.plano.variaveis[0]: 1.0}) == []
+    assert motor.atualizar(motor.cidades[0], {"variavel_inexistente": 1.0}) == []
+    assert np.array_equal(motor.pontuacoes()[0], antes)
+
+
+def test_ressincronizacao_periodica(motor, monkeypatch):
+    monkeypatch.setattr(topsis_incremental, "RESSINCRONIZAR_A_CADA", 3)
+    variavel = motor.plano.variaveis[0]
+    for valor in (10.0, 20.0, 30.0):
+        motor.atualizar(motor.cidades[1], {variavel: valor})
+    assert motor.edicoes == 0
+    _conferir_com_recalculo(motor)
@@ -13,7 +13,9 @@ sys.path.append(str(backend_dir))
 
 from app.database import Base, SessionLocal, engine
 from app.models import Municipio, ValorIndicador, ValorIndicadorLatest
+from app.services.carga_valores import garantir_indice_unico, gravar_valores
 from app.services.topsis_core import _rebuild_snapshot_latest, preparar_matriz_decisao
+from app.services.versao_dados import incrementar_versao_dados
 from tools.local_etl_service import atualizar_snapshot_latest
 
 
@@ -115,26 +117,9 @@ def _upsert_base_rows(db, id_indicador: str, ano: int, fonte: str, rows: Iterabl
     if not rows:
         return 0
 
-    ibges = sorted({ibge for ibge, _ in rows})
-    db.query(ValorIndicador).filter(
-        ValorIndicador.codigo_ibge.in_(ibges),
-        ValorIndicador.id_indicador == id_indicador,
-        ValorIndicador.ano_referencia == ano,
-    ).delete(synchronize_session=False)
-
-    novos = [
-        ValorIndicador(
-            codigo_ibge=ibge,
-            id_indicador=id_indicador,
-            ano_referencia=ano,
-            valor=valor,
-            fonte=fonte,
-        )
-        for ibge, valor in rows
-    ]
-    db.bulk_save_objects(novos)
+    total = gravar_valores(db, ((ibge, id_indicador, ano, valor, fonte) for ibge, valor in rows))
     db.commit()
-    return len(novos)
+    return total
 
 
 def backfill_sidra(db, cidades: list[str] | None = None) -> dict[str, int]:
@@ -246,6 +231,7 @@ def refresh_snapshot_subset(db, cidades: list[str]) -> None:
     db.query(ValorIndicadorLatest).filter(ValorIndicadorLatest.codigo_ibge.in_(cidades)).delete(synchronize_session=False)
     db.commit()
     _rebuild_snapshot_latest(db, cidades, None)
+    incrementar_versao_dados(db)
     print("✅ Snapshot do subconjunto atualizado")
 
 
@@ -281,6 +267,7 @@ def main() -> None:
     Base.metadata.create_all(bind=engine)
     db = SessionLocal()
     try:
+        garantir_indice_unico(db)
         if args.all:
             cidades = [c[0] for c in db.query(Municipio.codigo_ibge).order_by(Municipio.codigo_ibge.asc()).all()]
             if not cidades:
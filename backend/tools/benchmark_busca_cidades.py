@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca de cidades (/topsis/cidades): varredura original x índice em memória.
+
+Simula a digitação letra a letra de alguns termos (cada prefixo é uma "tecla")
+e compara a latência por tecla da varredura da tabela `municipios` com a do
+IndiceCidades.
+
+Uso: python tools/benchmark_busca_cidades.py --termos curitiba "sao paulo" xique --repeticoes 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.database import SessionLocal
+from app.models import Municipio
+from app.services.indice_cidades import carregar_indice_cidades, normalizar_busca
+
+
+def _buscar_varredura(db, q: str, limit: int) -> list:
+    """Implementação original da rota, mantida aqui apenas como referência."""
+    termo = normalizar_busca(q)
+    query = db.query(Municipio).order_by(Municipio.nome.asc()).yield_per(1000)
+    cidades = []
+    for cidade in query:
+        if termo:
+            if not (
+                termo in normalizar_busca(cidade.nome)
+                or termo in normalizar_busca(cidade.codigo_ibge)
+                or termo in normalizar_busca(cidade.estado)
+            ):
+                continue
+        cidades.append(cidade)
+        if len(cidades) >= limit:
+            break
+    return cidades
+
+
+def _medir(func, repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark da busca de cidades.")
+    parser.add_argument("--termos", nargs="+", default=["curitiba", "sao paulo", "xique-xique", "4106902", "zzz"])
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        inicio = time.perf_counter()
+        indice = carregar_indice_cidades(db)
+        t_montagem = (time.perf_counter() - inicio) * 1000
+
+        print("=" * 72)
+        print(f"🔎 BUSCA DE CIDADES ({len(indice)} municípios, índice montado em {t_montagem:.0f} ms)")
+        print("=" * 72)
+        print(f"{'termo':>14} | {'varredura (ms)':>14} | {'índice (µs)':>11} | {'ganho':>8}")
+
+        for termo in args.termos:
+            teclas = [termo[:n] for n in range(1, len(termo) + 1)]
+            t_varredura = sum(_medir(lambda t=t: _buscar_varredura(db, t, args.limit), args.repeticoes) for t in teclas)
+            t_indice = sum(_medir(lambda t=t: indice.buscar(t, args.limit), args.repeticoes * 10) for t in teclas)
+            t_varredura /= len(teclas)
+            t_indice /= len(teclas)
+            print(
+                f"{termo:>14} | {t_varredura * 1000:>14.3f} | {t_indice * 1e6:>11.1f} | "
+                f"{t_varredura / max(t_indice, 1e-12):>7.0f}x"
+            )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
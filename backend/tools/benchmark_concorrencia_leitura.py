@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark de requisições de ranking paralelas: perfil padrão x perfil de leitura.
+
+- padrão: `create_engine` sem ajustes (pool 5 + 10 de overflow, PRAGMAs só os
+  persistentes no arquivo), como a API abria conexões antes da separação;
+- leitura: `engine_leitura` de app/database.py (pool do tamanho das threads da API,
+  mmap_size, cache_size, busy_timeout e query_only aplicados por conexão).
+
+Cada "requisição" abre uma sessão, monta a matriz de decisão de um subconjunto
+aleatório de cidades sem a matriz residente (o caminho que de fato consulta o
+banco) e fecha a sessão. As threads disparam em paralelo; o relatório traz
+p50/p95/p99, vazão e falhas (ex.: tempo esgotado esperando conexão do pool) por perfil.
+
+Uso: python tools/benchmark_concorrencia_leitura.py --threads 40 --requisicoes 400 --cidades 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.database import SQLALCHEMY_DATABASE_URL, THREADS_API, SessionLocal, connect_args, engine_leitura
+from app.models import Municipio
+from app.services.topsis_core import preparar_matriz_decisao
+
+
+def _rodar(fabrica, selecoes: list[list[str]], threads: int) -> tuple[np.ndarray, float]:
+    def requisicao(cidades: list[str]) -> float:
+        inicio = time.perf_counter()
+        db = fabrica()
+        try:
+            preparar_matriz_decisao(cidades, [], db)
+        except SQLAlchemyError:
+            # Pool esgotado (TimeoutError) ou banco ocupado: conta como falha.
+            return np.nan
+        finally:
+            db.close()
+        return time.perf_counter() - inicio
+
+    # Aquecimento: abre as conexões e traz as páginas para o cache antes de medir.
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(requisicao, selecoes[:threads]))
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencias = np.array(list(executor.map(requisicao, selecoes)))
+    return latencias, time.perf_counter() - inicio
+
+
+def _imprimir(nome: str, latencias: np.ndarray, total_s: float) -> None:
+    falhas = int(np.isnan(latencias).sum())
+    ok = latencias[~np.isnan(latencias)]
+    p50, p95, p99 = np.percentile(ok * 1000, [50, 95, 99]) if len(ok) else (np.nan,) * 3
+    print(
+        f"{nome:<10}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}"
+        f"{len(ok) / total_s:>12.1f}{falhas:>8}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latência de rankings paralelos por perfil de conexão.")
+    parser.add_argument("--threads", type=int, default=THREADS_API, help="Requisições simultâneas.")
+    parser.add_argument("--requisicoes", type=int, default=400)
+    parser.add_argument("--cidades", type=int, default=300, help="Cidades por requisição.")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        codigos = [c[0] for c in db.query(Municipio.codigo_ibge).all()]
+    finally:
+        db.close()
+    if not codigos:
+        raise SystemExit("Nenhum município cadastrado.")
+
+    aleatorio = random.Random(args.semente)
+    tamanho = min(args.cidades, len(codigos))
+    selecoes = [aleatorio.sample(codigos, tamanho) for _ in range(args.requisicoes)]
+
+    engine_padrao = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
+    perfis = {
+        "padrão": sessionmaker(autocommit=False, autoflush=False, bind=engine_padrao),
+        "leitura": sessionmaker(autocommit=False, autoflush=False, bind=engine_leitura),
+    }
+
+    print(f"⏱️ {args.requisicoes} requisições de {tamanho} cidades, {args.threads} em paralelo")
+    print(f"\n{'perfil':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>12}{'falhas':>8}")
+    resultados = {}
+    for nome, fabrica in perfis.items():
+        latencias, total_s = _rodar(fabrica, selecoes, args.threads)
+        # Falhas entram no p99 como o pior caso observado (a requisição não foi atendida).
+        resultados[nome] = np.percentile(np.nan_to_num(latencias, nan=np.nanmax(latencias)), 99)
+        _imprimir(nome, latencias, total_s)
+    engine_padrao.dispose()
+
+    print(f"\n📈 p99: {resultados['padrão'] / resultados['leitura']:.2f}x menor no perfil de leitura")
+
+
+if __name__ == "__main__":
+    main()
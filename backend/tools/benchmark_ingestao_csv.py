@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark de ingestão de CSV/TXT do ETL: modo compatível (engine python) x modo rápido (engine C).
+
+Cada modo roda em um processo próprio, para que o pico de memória (RSS) de um não
+contamine o outro, e percorre o arquivo inteiro como o ETL faz: leitura em chunks
+só das colunas de código e valor, limpeza de `_valores_da_coluna` e agregação
+por município em `AcumuladorMunicipal` (sem gravar no banco). O relatório separa o tempo de leitura/parse do total e
+confere que os dois modos extraem os mesmos registros.
+
+Sem --arquivo, gera um TXT sintético no layout do CAGEDMOV (separador ";", 28
+colunas, município com 6 dígitos); --gzip grava a versão .gz.
+
+Uso:
+    python tools/benchmark_ingestao_csv.py --linhas 2000000
+    python tools/benchmark_ingestao_csv.py --arquivo data/planilhas/CAGED_RAIS/.../CAGEDMOV202605.txt \\
+        --coluna-codigo município --coluna-valor saldomovimentação
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+COLUNAS_CAGED = [
+    "competênciamov", "região", "uf", "município", "seção", "subclasse", "saldomovimentação",
+    "cbo2002ocupação", "categoria", "graudeinstrução", "idade", "horascontratuais", "raçacor",
+    "sexo", "tipoempregador", "tipoestabelecimento", "tipomovimentação", "tipodedeficiência",
+    "indtrabintermitente", "indtrabparcial", "salário", "tamestabjan", "indicadoraprendiz",
+    "origemdainformação", "competênciadec", "indicadordeforadoprazo", "unidadesaláriocódigo",
+    "valorsaláriofixo",
+]
+
+
+def _gerar_caged(destino: Path, linhas: int, semente: int) -> None:
+    from app.services.ibge_catalog import ibge_prefix_lookup
+
+    # Códigos de 6 dígitos, como no CAGED, a partir do catálogo IBGE.
+    codigos = np.flatnonzero(ibge_prefix_lookup()).astype(str)
+
+    gerador = np.random.default_rng(semente)
+    lote = 500_000
+    with destino.open("w", encoding="utf-8") as handle:
+        handle.write(";".join(COLUNAS_CAGED) + "\n")
+        for inicio in range(0, linhas, lote):
+            n = min(lote, linhas - inicio)
+            df = pd.DataFrame({coluna: gerador.integers(0, 99, n) for coluna in COLUNAS_CAGED})
+            df["competênciamov"] = 202605
+            df["município"] = codigos[gerador.integers(0, len(codigos), n)]
+            df["saldomovimentação"] = gerador.choice([-1, 1], n)
+            df["salário"] = [f"{v:.2f}".replace(".", ",") for v in gerador.uniform(1000, 9000, n)]
+            df.to_csv(handle, sep=";", index=False, header=False)
+
+
+def _pico_rss_kb() -> int:
+    """
+    Pico de RSS do processo. No Linux lê VmHWM: `ru_maxrss` sobrevive ao exec e herdaria
+    o pico do processo pai (que acabou de gerar o arquivo sintético).
+    """
+    try:
+        for linha in Path("/proc/self/status").read_text().splitlines():
+            if linha.startswith("VmHWM:"):
+                return int(linha.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _executar_modo(rapido: bool, caminho: str, coluna_codigo: str, coluna_valor: str, fila) -> None:
+    import tools.local_etl_service as etl
+
+    etl.CSV_RAPIDO = rapido
+    inicio = time.perf_counter()
+    tempo_leitura = 0.0
+    linhas = 0
+    acumulador = etl.AcumuladorMunicipal(etl._codigos_municipios())
+    chunks = etl._ler_csv_flexivel(Path(caminho), {}, etl._filtro_colunas([coluna_codigo, coluna_valor]))
+    while True:
+        inicio_chunk = time.perf_counter()
+        chunk = next(chunks, None)
+        tempo_leitura += time.perf_counter() - inicio_chunk
+        if chunk is None:
+            break
+        linhas += len(chunk)
+        extraido = etl._valores_da_coluna(chunk, coluna_codigo, coluna_valor)
+        if extraido is not None:
+            acumulador.adicionar(*extraido)
+    registros = acumulador.registros("bench", 2024, Path(caminho).name)
+    tempo = time.perf_counter() - inicio
+    fila.put((linhas, tempo_leitura, tempo, _pico_rss_kb(), registros))
+
+
+def _medir(rapido: bool, caminho: Path, coluna_codigo: str, coluna_valor: str):
+    contexto = multiprocessing.get_context("spawn")
+    fila = contexto.Queue()
+    processo = contexto.Process(target=_executar_modo, args=(rapido, str(caminho), coluna_codigo, coluna_valor, fila))
+    processo.start()
+    resultado = fila.get()
+    processo.join()
+    return resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vazão e pico de memória da ingestão de CSV do ETL.")
+    parser.add_argument("--arquivo", type=Path, help="CSV/TXT(.gz) real; sem ele gera um CAGEDMOV sintético.")
+    parser.add_argument("--coluna-codigo", default="município")
+    parser.add_argument("--coluna-valor", default="saldomovimentação")
+    parser.add_argument("--linhas", type=int, default=2_000_000, help="Linhas do arquivo sintético.")
+    parser.add_argument("--gzip", action="store_true", help="Compacta o arquivo sintético.")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = args.arquivo
+        if caminho is None:
+            caminho = Path(pasta) / "CAGEDMOV_sintetico.txt"
+            print(f"🧪 Gerando {args.linhas:,} linhas sintéticas no layout CAGEDMOV...")
+            _gerar_caged(caminho, args.linhas, args.semente)
+            if args.gzip:
+                import gzip
+                import shutil
+
+                compactado = caminho.with_suffix(".txt.gz")
+                with caminho.open("rb") as origem, gzip.open(compactado, "wb") as destino:
+                    shutil.copyfileobj(origem, destino)
+                caminho.unlink()
+                caminho = compactado
+        print(f"📄 {caminho.name}: {caminho.stat().st_size / 1e6:.1f} MB")
+
+        print(
+            f"\n{'modo':<12}{'linhas':>12}{'leitura s':>11}{'linhas/s':>14}"
+            f"{'total s':>10}{'linhas/s':>14}{'pico RSS MB':>14}"
+        )
+        resultados = {}
+        for nome, rapido in (("compatível", False), ("rápido", True)):
+            linhas, tempo_leitura, tempo, pico_kb, registros = _medir(rapido, caminho, args.coluna_codigo, args.coluna_valor)
+            resultados[nome] = (tempo_leitura, tempo, registros)
+            print(
+                f"{nome:<12}{linhas:>12,}{tempo_leitura:>11.2f}{linhas / tempo_leitura:>14,.0f}"
+                f"{tempo:>10.2f}{linhas / tempo:>14,.0f}{pico_kb / 1024:>14.1f}"
+            )
+
+    leitura_compat, tempo_compat, registros_compat = resultados["compatível"]
+    leitura_rapido, tempo_rapido, registros_rapido = resultados["rápido"]
+    print(
+        f"\n📈 Modo rápido: leitura {leitura_compat / leitura_rapido:.1f}x, "
+        f"leitura + limpeza {tempo_compat / tempo_rapido:.1f}x mais rápido"
+    )
+    if registros_compat == registros_rapido:
+        print(f"✅ Mesmos {len(registros_rapido):,} registros extraídos nos dois modos.")
+    else:
+        print(f"⚠️ Registros diferentes: compatível {len(registros_compat):,} x rápido {len(registros_rapido):,}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark do núcleo TOPSIS: implementação pandas original x núcleo NumPy vetorizado.
+
+Gera matrizes sintéticas com o mesmo formato da rota /topsis/ranking-hibrido
+(cidades x indicadores, com ~10% de ausências) e compara tempo e resultado.
+
+Com --incremental mede também a edição de uma célula via TopsisIncremental
+contra a remontagem completa da matriz + TOPSIS.
+
+Uso: python tools/benchmark_topsis.py --cidades 2 10 30 --indicadores 19 --repeticoes 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services.plano_indicadores import obter_plano
+from app.services.topsis_core import aplicar_topsis, topsis_matricial
+from app.services.topsis_incremental import TopsisIncremental
+
+
+def _aplicar_topsis_pandas(df: pd.DataFrame, pesos: dict, impactos: dict) -> list[dict]:
+    """Implementação original (coluna a coluna em pandas), mantida aqui apenas como referência."""
+    if df.empty:
+        return []
+
+    df = df.dropna(axis=1, how="all").copy()
+    if df.empty:
+        return []
+
+    for col in list(df.columns):
+        if df[col].isnull().all():
+            df = df.drop(columns=[col])
+            continue
+        pior_valor = 0.0 if impactos.get(col, 1) == 1 else df[col].max()
+        df[col] = df[col].fillna(pior_valor)
+
+    norm_divisor = np.sqrt((df ** 2).sum(axis=0)).replace(0, 1)
+    df_pond = (df / norm_divisor) * pd.Series(pesos)
+
+    sip = pd.Series(index=df.columns, dtype=float)
+    sin = pd.Series(index=df.columns, dtype=float)
+    for col in df.columns:
+        if impactos.get(col, 1) == 1:
+            sip[col] = df_pond[col].max()
+            sin[col] = df_pond[col].min()
+        else:
+            sip[col] = df_pond[col].min()
+            sin[col] = df_pond[col].max()
+
+    dist_positiva = np.sqrt(((df_pond - sip) ** 2).sum(axis=1))
+    dist_negativa = np.sqrt(((df_pond - sin) ** 2).sum(axis=1))
+    pontuacao = dist_negativa / (dist_positiva + dist_negativa).replace(0, 1)
+
+    resultados = []
+    for ibge in df.index:
+        resultados.append({
+            "codigo_ibge": ibge,
+            "pontuacao_topsis": round(pontuacao[ibge], 4),
+            "distancia_positiva": round(dist_positiva[ibge], 4),
+            "distancia_negativa": round(dist_negativa[ibge], 4),
+            "valores_calculados": df.loc[ibge].to_dict(),
+        })
+    return sorted(resultados, key=lambda x: x["pontuacao_topsis"], reverse=True)
+
+
+def _gerar_matriz(n_cidades: int, n_indicadores: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    valores = rng.uniform(0, 1000, size=(n_cidades, n_indicadores))
+    valores[rng.random(valores.shape) < 0.1] = np.nan
+    colunas = [f"indicador_{j}" for j in range(n_indicadores)]
+    index = [str(4100000 + i) for i in range(n_cidades)]
+    df = pd.DataFrame(valores, index=index, columns=colunas)
+    pesos = {col: 1.0 / n_indicadores for col in colunas}
+    impactos = {col: (-1 if j % 3 == 0 else 1) for j, col in enumerate(colunas)}
+    return df, pesos, impactos
+
+
+def _cronometrar(func, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        func()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def _benchmark_incremental(cidades: list[int], edicoes: int = 300) -> None:
+    plano = obter_plano()
+    rng = np.random.default_rng(7)
+    pesos = np.full(len(plano.indicadores), 1.0 / max(len(plano.indicadores), 1))
+    impactos = np.where(np.arange(len(plano.indicadores)) % 3 == 0, -1, 1)
+
+    print("-" * 72)
+    print("✏️ EDIÇÃO DE UMA CÉLULA (ms por edição)")
+    print(f"{'cidades':>8} | {'completo':>10} | {'incremental':>11} | {'ganho':>7} | diff_max")
+    for n_cidades in cidades:
+        brutos = rng.uniform(1, 1e5, size=(n_cidades, len(plano.variaveis)))
+        brutos[rng.random(brutos.shape) < 0.1] = np.nan
+        codigos = [str(4100000 + i) for i in range(n_cidades)]
+        incremental = TopsisIncremental(codigos, brutos, plano, pesos, impactos)
+
+        sorteios = [
+            (codigos[rng.integers(n_cidades)], plano.variaveis[rng.integers(len(plano.variaveis))], float(rng.uniform(1, 1e5)))
+            for _ in range(edicoes)
+        ]
+
+        def _completo():
+            for codigo, variavel, valor in sorteios:
+                brutos[int(codigo) - 4100000, plano.indice_variavel[variavel]] = valor
+                topsis_matricial(plano.montar_matriz(brutos), pesos, impactos)
+
+        def _incremental():
+            for codigo, variavel, valor in sorteios:
+                incremental.atualizar(codigo, {variavel: valor})
+                incremental.pontuacoes()
+
+        t_completo = _cronometrar(_completo, 1) / edicoes
+        t_incremental = _cronometrar(_incremental, 1) / edicoes
+        _, _, referencia, _, _ = topsis_matricial(plano.montar_matriz(brutos), pesos, impactos)
+        diff_max = np.abs(referencia - incremental.pontuacoes()[0]).max()
+        print(
+            f"{n_cidades:>8} | {t_completo:>10.3f} | {t_incremental:>11.3f} | "
+            f"{t_completo / max(t_incremental, 1e-9):>6.1f}x | {diff_max:.1e}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do TOPSIS pandas x NumPy.")
+    parser.add_argument("--cidades", nargs="+", type=int, default=[2, 10, 30, 500, 5570])
+    parser.add_argument("--indicadores", type=int, default=19)
+    parser.add_argument("--repeticoes", type=int, default=100)
+    parser.add_argument("--incremental", action="store_true", help="Inclui o benchmark de edição incremental")
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("⏱️ BENCHMARK TOPSIS (ms por chamada)")
+    print("=" * 72)
+    print(f"{'cidades':>8} | {'pandas':>10} | {'wrapper df':>10} | {'núcleo np':>10} | {'ganho':>7} | diff_max")
+
+    for n_cidades in args.cidades:
+        df, pesos, impactos = _gerar_matriz(n_cidades, args.indicadores)
+        repeticoes = max(3, args.repeticoes if n_cidades <= 100 else args.repeticoes // 20)
+
+        matriz = df.to_numpy()
+        vetor_pesos = np.array([pesos[c] for c in df.columns])
+        vetor_impactos = np.array([impactos[c] for c in df.columns])
+
+        t_pandas = _cronometrar(lambda: _aplicar_topsis_pandas(df, pesos, impactos), repeticoes)
+        t_wrapper = _cronometrar(lambda: aplicar_topsis(df, pesos, impactos), repeticoes)
+        t_nucleo = _cronometrar(lambda: topsis_matricial(matriz, vetor_pesos, vetor_impactos), repeticoes)
+
+        referencia = {r["codigo_ibge"]: r["pontuacao_topsis"] for r in _aplicar_topsis_pandas(df, pesos, impactos)}
+        novo = {r["codigo_ibge"]: r["pontuacao_topsis"] for r in aplicar_topsis(df, pesos, impactos)}
+        diff_max = max(abs(referencia[k] - novo[k]) for k in referencia)
+
+        print(
+            f"{n_cidades:>8} | {t_pandas:>10.3f} | {t_wrapper:>10.3f} | {t_nucleo:>10.3f} | "
+            f"{t_pandas / max(t_wrapper, 1e-9):>6.1f}x | {diff_max:.1e}"
+        )
+
+    if args.incremental:
+        _benchmark_incremental(args.cidades)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Cache colunar persistente das planilhas (.xls/.xlsx/.ods) parseadas pelo ETL.
+
+O parse das planilhas governamentais domina o tempo do ETL, e os arquivos quase
+nunca mudam entre execuções. Cada aba parseada é gravada em
+`data/cache_planilhas/<chave>/`: um `.npy` por coluna e um `schema.json` com a
+identidade do arquivo (caminho, tamanho, mtime e SHA-256 do conteúdo).
+
+- Tamanho e mtime iguais: acerto direto, sem reler o arquivo;
+- tamanho/mtime diferentes mas mesmo SHA-256 (ex.: arquivo copiado de novo):
+  acerto, e o schema é atualizado com o novo mtime;
+- conteúdo diferente: a aba é parseada de novo e o cache substituído.
+
+A aba é guardada inteira; cada leitura carrega só as colunas pedidas em
+`usecols`, mapeando os `.npy` em memória (`np.load(mmap_mode="r")`). Colunas
+numéricas/datas mantêm o dtype; colunas de texto ou mistas viram categóricas:
+códigos inteiros por linha (-1 = nulo, mapeados em memória) + o dicionário dos
+textos distintos. A leitura não cria um objeto Python por linha, e o ETL, que
+converte tudo com `astype(str)` antes de usar, obtém o mesmo resultado da
+leitura direta.
+
+Desative com URBIX_CACHE_PLANILHAS=0.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+backend_dir = Path(__file__).resolve().parent.parent
+
+CACHE_ROOT = Path(os.getenv("URBIX_CACHE_PLANILHAS_DIR", str(backend_dir / "data" / "cache_planilhas")))
+CACHE_ATIVO = os.getenv("URBIX_CACHE_PLANILHAS", "1") != "0"
+VERSAO_FORMATO = 2
+
+
+def _sha256(caminho: Path) -> str:
+    digest = hashlib.sha256()
+    with caminho.open("rb") as handle:
+        for bloco in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+
+def _diretorio_entrada(caminho: Path, kwargs: dict) -> Path:
+    """Uma entrada por arquivo + parâmetros de leitura (aba, cabeçalho, engine...)."""
+    identidade = json.dumps(
+        {"arquivo": str(caminho.resolve()), "kwargs": {k: str(v) for k, v in sorted(kwargs.items())}},
+        sort_keys=True,
+    )
+    return CACHE_ROOT / hashlib.sha1(identidade.encode("utf-8")).hexdigest()
+
+
+def _schema_valido(diretorio: Path, caminho: Path) -> dict | None:
+    arquivo_schema = diretorio / "schema.json"
+    if not arquivo_schema.exists():
+        return None
+    try:
+        schema = json.loads(arquivo_schema.read_text(encoding="utf-8"))
+    except ValueError:
+        return None
+    if schema.get("versao_formato") != VERSAO_FORMATO:
+        return None
+
+    estado = caminho.stat()
+    if schema["tamanho"] == estado.st_size and schema["mtime_ns"] == estado.st_mtime_ns:
+        return schema
+
+    # Metadados mudaram: o conteúdo decide.
+    if schema["tamanho"] != estado.st_size or schema["sha256"] != _sha256(caminho):
+        return None
+    schema["mtime_ns"] = estado.st_mtime_ns
+    arquivo_schema.write_text(json.dumps(schema, ensure_ascii=False), encoding="utf-8")
+    return schema
+
+
+def _gravar(diretorio: Path, caminho: Path, df: pd.DataFrame) -> bool:
+    nomes = [str(coluna) for coluna in df.columns]
+    if len(set(nomes)) != len(nomes):
+        # Rótulos distintos que viram o mesmo texto: não dá para reconstruir fielmente.
+        return False
+
+    temporario = diretorio.with_name(diretorio.name + ".tmp")
+    shutil.rmtree(temporario, ignore_errors=True)
+    temporario.mkdir(parents=True)
+
+    colunas = []
+    for posicao, nome in enumerate(nomes):
+        serie = df.iloc[:, posicao]
+        base = f"c{posicao:04d}"
+        if isinstance(serie.dtype, np.dtype) and serie.dtype.kind in "biufmM":
+            np.save(temporario / f"{base}.npy", serie.to_numpy())
+            colunas.append({"nome": nome, "arquivo": f"{base}.npy", "texto": False})
+            continue
+
+        nulos = serie.isna().to_numpy()
+        textos = np.where(nulos, None, serie.astype(str).to_numpy(dtype=object))
+        codigos, categorias = pd.factorize(textos, use_na_sentinel=True)
+        np.save(temporario / f"{base}.npy", codigos.astype(np.int32))
+        np.save(temporario / f"{base}_categorias.npy", np.asarray(categorias, dtype=str))
+        colunas.append({
+            "nome": nome, "arquivo": f"{base}.npy", "categorias": f"{base}_categorias.npy", "texto": True,
+        })
+
+    estado = caminho.stat()
+    schema = {
+        "versao_formato": VERSAO_FORMATO,
+        "arquivo": str(caminho.resolve()),
+        "tamanho": estado.st_size,
+        "mtime_ns": estado.st_mtime_ns,
+        "sha256": _sha256(caminho),
+        "linhas": len(df),
+        "colunas": colunas,
+    }
+    (temporario / "schema.json").write_text(json.dumps(schema, ensure_ascii=False), encoding="utf-8")
+
+    shutil.rmtree(diretorio, ignore_errors=True)
+    temporario.rename(diretorio)
+    return True
+
+
+def _carregar(diretorio: Path, schema: dict, usecols=None) -> pd.DataFrame:
+    dados = {}
+    for coluna in schema["colunas"]:
+        if usecols is not None and not usecols(coluna["nome"]):
+            continue
+        valores = np.load(diretorio / coluna["arquivo"], mmap_mode="r")
+        if coluna["texto"]:
+            categorias = np.load(diretorio / coluna["categorias"])
+            dados[coluna["nome"]] = pd.Categorical.from_codes(valores, categories=categorias.astype(object))
+        else:
+            dados[coluna["nome"]] = valores
+    return pd.DataFrame(dados, index=pd.RangeIndex(schema["linhas"]))
+
+
+def ler_planilha(caminho: Path, pandas_kwargs: dict, usecols=None) -> tuple[pd.DataFrame, bool]:
+    """
+    Equivalente a `pd.read_excel(caminho, usecols=usecols, **pandas_kwargs)` passando pelo cache.
+    `usecols` deve ser um callable sobre o nome da coluna (ver `_filtro_colunas` do ETL).
+    Retorna (DataFrame, veio_do_cache).
+    """
+    kwargs = dict(pandas_kwargs)
+    aba = kwargs.get("sheet_name", 0)
+    if not CACHE_ATIVO or isinstance(aba, list) or aba is None:
+        # Várias abas de uma vez devolvem dict: fora do escopo do cache.
+        return pd.read_excel(caminho, usecols=usecols, **kwargs), False
+
+    diretorio = _diretorio_entrada(caminho, kwargs)
+    schema = _schema_valido(diretorio, caminho)
+    if schema is not None:
+        return _carregar(diretorio, schema, usecols), True
+
+    # Falta no cache: parseia a aba inteira uma vez e grava; a próxima leitura só mapeia colunas.
+    df = pd.read_excel(caminho, **kwargs)
+    if _gravar(diretorio, caminho, df):
+        schema = json.loads((diretorio / "schema.json").read_text(encoding="utf-8"))
+        return _carregar(diretorio, schema, usecols), False
+    colunas = [coluna for coluna in df.columns if usecols is None or usecols(coluna)]
+    return df[colunas], False
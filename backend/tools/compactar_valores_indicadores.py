@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Migra `valores_indicadores` para o armazenamento codificado (chaves inteiras + dimensões).
+
+Mede o tamanho em disco do fato (tabela + índices, via dbstat) e a latência de
+consultas típicas antes e depois da conversão:
+
+- valor mais recente por cidade + indicador (a consulta de reconstrução do snapshot);
+- histórico de 50 cidades (`_buscar_historico_colunar`, lido pela VIEW);
+- contagem de linhas por indicador (GROUP BY pela VIEW).
+
+A conversão é só de ida: faça uma cópia do arquivo .db antes.
+
+Uso: python tools/compactar_valores_indicadores.py --repeticoes 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.database import SessionLocal, engine
+from app.models import Municipio
+from app.services.armazenamento_valores import (
+    armazenamento_codificado,
+    converter_para_armazenamento_codificado,
+    objetos_armazenamento,
+)
+from app.services.carga_valores import garantir_indice_unico
+from app.services.consulta_mais_recentes import sql_mais_recentes
+from app.services.topsis_core import _buscar_historico_colunar
+
+
+def _tamanho_bytes(db) -> int | None:
+    conn = db.connection()
+    objetos = objetos_armazenamento(conn)
+    marcadores = ", ".join(f":o{i}" for i in range(len(objetos)))
+    try:
+        return conn.execute(
+            text(f"SELECT SUM(pgsize) FROM dbstat WHERE name IN ({marcadores})"),
+            {f"o{i}": nome for i, nome in enumerate(objetos)},
+        ).scalar()
+    except OperationalError:
+        # SQLite compilado sem a tabela virtual dbstat.
+        return None
+
+
+def _medir(func, repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def _medicoes(db, cidades: list[str], repeticoes: int) -> dict:
+    consulta = text(f"SELECT COUNT(*) FROM ({sql_mais_recentes(db.connection())})")
+    return {
+        "tamanho": _tamanho_bytes(db),
+        "mais recente (GROUP BY)": _medir(lambda: db.execute(consulta).scalar(), repeticoes),
+        "histórico 50 cidades": _medir(
+            lambda: _buscar_historico_colunar(db, cidades, None, None, None), repeticoes
+        ),
+        "contagem por indicador": _medir(
+            lambda: db.execute(text(
+                "SELECT id_indicador, COUNT(*) FROM valores_indicadores GROUP BY id_indicador"
+            )).all(),
+            repeticoes,
+        ),
+    }
+
+
+def _vacuum() -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+
+def _imprimir(antes: dict, depois: dict) -> None:
+    print(f"\n{'métrica':<28}{'antes':>14}{'depois':>14}{'ganho':>10}")
+    for chave in antes:
+        a, d = antes[chave], depois[chave]
+        if chave == "tamanho":
+            if a is None or d is None:
+                print(f"{'tamanho em disco':<28}{'n/d':>14}{'n/d':>14}")
+                continue
+            print(f"{'tamanho em disco (MB)':<28}{a / 1e6:>14.2f}{d / 1e6:>14.2f}{a / d:>9.2f}x")
+        else:
+            print(f"{chave + ' (ms)':<28}{a * 1000:>14.2f}{d * 1000:>14.2f}{a / d:>9.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Converte valores_indicadores para chaves inteiras.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--sem-vacuum", action="store_true", help="Não compacta o arquivo antes/depois.")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "sqlite":
+        raise SystemExit("Armazenamento codificado disponível apenas para SQLite.")
+
+    db = SessionLocal()
+    try:
+        cidades = [c[0] for c in db.query(Municipio.codigo_ibge).order_by(Municipio.codigo_ibge).limit(50).all()]
+        if armazenamento_codificado(db.connection()):
+            print("ℹ️ valores_indicadores já está no formato codificado. Medições atuais:")
+            atual = _medicoes(db, cidades, args.repeticoes)
+            _imprimir(atual, atual)
+            return
+
+        garantir_indice_unico(db)
+        db.commit()
+        if not args.sem_vacuum:
+            db.close()
+            _vacuum()
+            db = SessionLocal()
+
+        print("📏 Medindo armazenamento original...")
+        antes = _medicoes(db, cidades, args.repeticoes)
+        db.close()
+
+        print("🔄 Convertendo para chaves inteiras + dimensões...")
+        inicio = time.perf_counter()
+        contagens = converter_para_armazenamento_codificado(engine)
+        print(f"✅ Conversão em {time.perf_counter() - inicio:.1f}s: {contagens}")
+        if not args.sem_vacuum:
+            _vacuum()
+
+        db = SessionLocal()
+        print("📏 Medindo armazenamento codificado...")
+        depois = _medicoes(db, cidades, args.repeticoes)
+        _imprimir(antes, depois)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,7 @@ backend_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(backend_dir))
 
 from app.database import SessionLocal
-from app.models import ValorIndicador
+from app.services.carga_valores import gravar_valores
 
 
 DENOMINATORS_CONFIG = {
@@ -105,31 +105,18 @@ def get_cnes_denominators():
 
 
 def insert_denominators(db: SessionLocal, dados: dict):
-    """Insere denominadores no banco."""
+    """Insere denominadores no banco; linhas já existentes (mesma cidade, indicador e ano) são mantidas."""
+    ano = datetime.now().year
     for id_indicador, valores_por_municipio in dados.items():
         print(f"[INSERT] {id_indicador}...")
-        for codigo_ibge, valor in valores_por_municipio.items():
-            existing = (
-                db.query(ValorIndicador)
-                .filter_by(
-                    codigo_ibge=codigo_ibge,
-                    id_indicador=id_indicador,
-                    ano_referencia=datetime.now().year,
-                )
-                .first()
-            )
-            if existing:
-                continue
-            
-            registro = ValorIndicador(
-                codigo_ibge=codigo_ibge,
-                id_indicador=id_indicador,
-                ano_referencia=datetime.now().year,
-                valor=float(valor),
-                fonte="MUNIC_2024|CNES",
-            )
-            db.add(registro)
-        
+        gravar_valores(
+            db,
+            (
+                (codigo_ibge, id_indicador, ano, float(valor), "MUNIC_2024|CNES")
+                for codigo_ibge, valor in valores_por_municipio.items()
+            ),
+            sobrescrever=False,
+        )
         db.commit()
         print(f"  {id_indicador}: {len(valores_por_municipio)} registros")
 
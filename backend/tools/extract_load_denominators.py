@@ -19,6 +19,7 @@ sys.path.append(str(backend_dir))
 
 from app.database import SessionLocal
 from app.models import ValorIndicador
+from app.services.carga_valores import gravar_valores
 
 
 def extract_munic_denominators() -> dict:
@@ -115,7 +116,7 @@ def extract_cnes_denominators() -> dict:
 
 
 def insert_denominators(db: SessionLocal, denominadores: dict) -> None:
-    """Insere denominadores no banco usando bulk_save_objects."""
+    """Insere denominadores no banco com upsert em lote (`gravar_valores`)."""
     ano = datetime.now().year
     BATCH_SIZE = 5000
     
@@ -126,28 +127,16 @@ def insert_denominators(db: SessionLocal, denominadores: dict) -> None:
         db.query(ValorIndicador).filter(ValorIndicador.id_indicador == id_indicador).delete(synchronize_session=False)
         db.commit()
         
-        # Insere em batches
-        registros = []
-        for codigo_ibge, valor in valores_por_municipio.items():
-            registros.append(
-                ValorIndicador(
-                    codigo_ibge=codigo_ibge,
-                    id_indicador=id_indicador,
-                    ano_referencia=ano,
-                    valor=float(valor),
-                    fonte="MUNIC_2024|CNES",
-                )
-            )
-            
-            if len(registros) >= BATCH_SIZE:
-                db.bulk_save_objects(registros, return_defaults=False)
-                db.commit()
-                registros = []
-        
-        # Insere últimos registros
-        if registros:
-            db.bulk_save_objects(registros, return_defaults=False)
-            db.commit()
+        # Upsert em lotes pela chave (cidade, indicador, ano)
+        gravar_valores(
+            db,
+            (
+                (codigo_ibge, id_indicador, ano, float(valor), "MUNIC_2024|CNES")
+                for codigo_ibge, valor in valores_por_municipio.items()
+            ),
+            tamanho_lote=BATCH_SIZE,
+        )
+        db.commit()
         
         print(f"  OK")
 
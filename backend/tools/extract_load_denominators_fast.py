@@ -6,12 +6,15 @@ Extrai e carrega denominadores usando SQL direto (muito mais rápido que SQLAlch
 import sys
 from pathlib import Path
 from datetime import datetime
-import sqlite3
 
 import pandas as pd
+from sqlalchemy import create_engine, text
 
 
 backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services.carga_valores import gravar_valores
 
 
 def extract_munic_denominators() -> dict:
@@ -105,30 +108,25 @@ def insert_denominators_sql(denominadores: dict) -> None:
     """Insere denominadores usando SQL direto (muito mais rápido)."""
     db_path = backend_dir / "urbix.db"
     
-    conn = sqlite3.connect(str(db_path))
-    cur = conn.cursor()
+    engine = create_engine(f"sqlite:///{db_path}")
     
     try:
-        # Flatten todos os dados
-        all_rows = []
-        for id_ind, registros in denominadores.items():
-            print(f"[DELETE] {id_ind}...")
-            cur.execute("DELETE FROM valores_indicadores WHERE id_indicador = ?", (id_ind,))
-            conn.commit()
+        with engine.begin() as conn:
+            # Flatten todos os dados
+            all_rows = []
+            for id_ind, registros in denominadores.items():
+                print(f"[DELETE] {id_ind}...")
+                conn.execute(text("DELETE FROM valores_indicadores WHERE id_indicador = :id"), {"id": id_ind})
+                
+                all_rows.extend(registros)
+                print(f"[INSERT] {id_ind}: {len(registros)} registros")
             
-            all_rows.extend(registros)
-            print(f"[INSERT] {id_ind}: {len(registros)} registros")
-        
-        # Insert em batch usando execute many
-        cur.executemany(
-            "INSERT INTO valores_indicadores (codigo_ibge, id_indicador, ano_referencia, valor, fonte) VALUES (?, ?, ?, ?, ?)",
-            all_rows
-        )
-        conn.commit()
-        print(f"  OK (total: {len(all_rows)} registros)")
+            # Upsert em lote pela chave (cidade, indicador, ano)
+            total = gravar_valores(conn, all_rows)
+        print(f"  OK (total: {total} registros)")
         
     finally:
-        conn.close()
+        engine.dispose()
 
 
 def main():
@@ -10,6 +10,7 @@ sys.path.insert(0, str(backend_dir))
 
 from app.database import SessionLocal
 from app.models import ValorIndicador, Municipio
+from app.services.carga_valores import gravar_valores
 
 db_session = SessionLocal()
 
@@ -43,7 +44,7 @@ for chunk_start in range(0, len(cidades_ibge), chunk_size):
         response.raise_for_status()
         data = response.json()
         
-        loaded_chunk = 0
+        linhas_chunk = []
         for item in data:
             try:
                 if "D2C" not in item and "D1C" not in item:
@@ -71,20 +72,13 @@ for chunk_start in range(0, len(cidades_ibge), chunk_size):
                 
                 valor = float(valor_str.replace(".", "").replace(",", "."))
                 
-                vi = ValorIndicador(
-                    codigo_ibge=codigo_ibge,
-                    id_indicador="total_domicilios",
-                    valor=valor,
-                    ano_referencia=2022,
-                    fonte="SIDRA Censo (9922)"
-                )
-                db_session.add(vi)
-                loaded_chunk += 1
-                total_loaded += 1
+                linhas_chunk.append((codigo_ibge, "total_domicilios", 2022, valor, "SIDRA Censo (9922)"))
                 
             except Exception:
                 pass  # Silenciar erros individuais
         
+        loaded_chunk = gravar_valores(db_session, linhas_chunk)
+        total_loaded += loaded_chunk
         db_session.commit()
         print(f"OK ({loaded_chunk} registros)")
         
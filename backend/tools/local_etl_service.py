@@ -1,12 +1,18 @@
+import bz2
+import codecs
 import csv
 import gzip
-import json
+import itertools
+import lzma
+import os
 import re
 import sys
 import time
 import unicodedata
+import zipfile
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import requests
 from sqlalchemy import text
@@ -16,13 +22,25 @@ backend_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(backend_dir))
 
 from app.database import SessionLocal, engine, Base
-from app.models import ValorIndicador, Municipio
+from app.models import Municipio
+from app.services.carga_valores import garantir_indice_unico, gravar_valores
 from app.etl_config import DADOS_BASE, INDICADORES
+from app.services.ibge_catalog import ibge_prefix_lookup, resolve_ibge_codes
+from app.services.plano_indicadores import invalidar_plano
+from app.services.rankings_materializados import materializar_rankings
+from app.services.vetores_municipios import materializar_vetores
+from app.services.snapshot_latest import (
+    instalar_manutencao_snapshot,
+    manutencao_incremental_ativa,
+    reconstruir_snapshot_latest,
+)
+from app.services.versao_dados import incrementar_versao_dados
+from tools.cache_planilhas import ler_planilha
 from tools.seed_metadata import seed_metadata
 
 PLANILHAS_ROOT = backend_dir / "data" / "planilhas"
-CATALOGO_IBGE = backend_dir / "app" / "data" / "ibge_catalog.json"
 CHUNK_SIZE = 100_000
+CSV_RAPIDO = os.getenv("URBIX_CSV_RAPIDO", "1") != "0"
 
 
 def _normalizar_texto(valor: str) -> str:
@@ -33,29 +51,6 @@ def _normalizar_texto(valor: str) -> str:
     return texto
 
 
-def _carregar_catalogo_ibge() -> dict[str, str]:
-    if not CATALOGO_IBGE.exists():
-        return {}
-    try:
-        payload = json.loads(CATALOGO_IBGE.read_text(encoding="utf-8"))
-        municipios = payload.get("municipalities", []) if isinstance(payload, dict) else payload
-        lookup: dict[str, str] = {}
-        for item in municipios:
-            if not isinstance(item, dict):
-                continue
-            codigo = str(item.get("codigo_ibge") or item.get("codigo") or item.get("id") or "").strip()
-            if codigo:
-                lookup[codigo] = codigo.zfill(7)
-                if len(codigo) >= 6:
-                    lookup[codigo[:6]] = codigo
-        return lookup
-    except Exception:
-        return {}
-
-
-IBGE_LOOKUP = _carregar_catalogo_ibge()
-
-
 def _escolher_melhor_coluna(colunas, alvo: str) -> str | None:
     alvo_norm = _normalizar_texto(alvo)
     for coluna in colunas:
@@ -67,44 +62,24 @@ def _escolher_melhor_coluna(colunas, alvo: str) -> str | None:
     return None
 
 
-def _normalizar_codigo_ibge(valor) -> str | None:
-    if valor is None:
-        return None
-    codigo = re.sub(r"\D", "", str(valor)).strip()
-    if not codigo:
-        return None
-        
-    # Se o código tem 7 dígitos (ou mais), tenta achar no dicionário oficial
-    if len(codigo) >= 7:
-        codigo = codigo[-7:]
-        # Só retorna se existir de verdade no IBGE_LOOKUP
-        return IBGE_LOOKUP.get(codigo) or IBGE_LOOKUP.get(codigo[:6])
-        
-    # Se tem 6 dígitos, tenta achar também
-    if len(codigo) == 6:
-        return IBGE_LOOKUP.get(codigo)
-        
-    # Se não for nada disso, é lixo (como 0999999). Devolve None para o script ignorar.
-    return None
+def _inferir_separador(sample_text: str) -> str:
+    candidatos = [";", "\t", ",", "|"]
+    try:
+        return csv.Sniffer().sniff(sample_text, delimiters="".join(candidatos)).delimiter
+    except Exception:
+        for sep in candidatos:
+            if sample_text.count(sep) > 0:
+                return sep
+        return ";"
 
 
-def _ler_csv_flexivel(caminho: Path, kwargs: dict):
-    """Retorna um reader em chunks para não carregar o arquivo inteiro na memória."""
+def _ler_csv_legado(caminho: Path, kwargs: dict, usecols=None):
+    """Modo compatível: engine python, tentando cada encoding na abertura do arquivo."""
     encodings = [kwargs.get("encoding"), "utf-8", "latin1", "cp1252"]
     encodings = [enc for enc in encodings if enc]
     sample_size = int(kwargs.get("sample_size", 8192))
     last_error: Exception | None = None
 
-    def _infer_separator(sample_text: str) -> str:
-        candidatos = [";", "\t", ",", "|"]
-        try:
-            return csv.Sniffer().sniff(sample_text, delimiters="".join(candidatos)).delimiter
-        except Exception:
-            for sep in candidatos:
-                if sample_text.count(sep) > 0:
-                    return sep
-            return ";"
-
     for encoding in encodings:
         try:
             if caminho.name.lower().endswith(".gz"):
@@ -114,7 +89,7 @@ def _ler_csv_flexivel(caminho: Path, kwargs: dict):
                 with caminho.open("r", encoding=encoding, errors="replace") as handle:
                     sample = handle.read(sample_size)
 
-            sep = _infer_separator(sample)
+            sep = _inferir_separador(sample)
 
             leitura_kwargs = dict(kwargs)
             for key in ["encoding", "sep", "usecols", "header", "sheet_name", "sample_size"]:
@@ -127,6 +102,8 @@ def _ler_csv_flexivel(caminho: Path, kwargs: dict):
                 "engine": "python",
                 "chunksize": CHUNK_SIZE,
             })
+            if usecols is not None:
+                leitura_kwargs["usecols"] = usecols
             if caminho.name.lower().endswith(".gz"):
                 leitura_kwargs["compression"] = "gzip"
 
@@ -138,54 +115,149 @@ def _ler_csv_flexivel(caminho: Path, kwargs: dict):
     raise last_error or RuntimeError(f"Falha ao ler CSV/TXT: {caminho}")
 
 
-def _agrupar_valores_por_cidade(df_chunk: pd.DataFrame) -> pd.DataFrame:
-    """Agrupa linhas repetidas por município para manter uma única observação por cidade/indicador/ano."""
-    cols = ["codigo_ibge", "valor_numerico"]
-    if df_chunk.empty:
-        return df_chunk[cols].copy()
-
-    return (
-        df_chunk.loc[:, cols]
-        .dropna(subset=["codigo_ibge", "valor_numerico"])
-        .groupby("codigo_ibge", as_index=False)["valor_numerico"]
-        .sum()
-        .copy()
-    )
+def _amostra_bytes(caminho: Path, tamanho: int) -> bytes:
+    """Primeiros bytes descompactados do arquivo (mesmos formatos que `compression="infer"` do pandas)."""
+    sufixo = caminho.suffix.lower()
+    if sufixo == ".zip":
+        with zipfile.ZipFile(caminho) as arquivo:
+            membros = [nome for nome in arquivo.namelist() if not nome.endswith("/")]
+            with arquivo.open(membros[0]) as handle:
+                return handle.read(tamanho)
+    abrir = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}.get(sufixo, open)
+    with abrir(caminho, "rb") as handle:
+        return handle.read(tamanho)
 
 
-def _deduplicar_mais_recente(registros: list[ValorIndicador]) -> list[ValorIndicador]:
-    """Mantém somente o valor mais recente por cidade + indicador."""
-    melhor_por_chave: dict[tuple[str, str], ValorIndicador] = {}
+def _sniff_csv(caminho: Path, kwargs: dict) -> tuple[str, str]:
+    """
+    Detecta (encoding, separador) uma única vez a partir de uma amostra em bytes: o primeiro
+    encoding candidato que decodifica a amostra sem erro vence. Um `sep` configurado é respeitado.
+    """
+    encodings = [kwargs.get("encoding"), "utf-8", "cp1252", "latin1"]
+    encodings = [enc for enc in dict.fromkeys(encodings) if enc]
+    sample_size = int(kwargs.get("sample_size", 8192))
 
-    for registro in registros:
-        chave = (str(registro.codigo_ibge), str(registro.id_indicador))
-        atual = melhor_por_chave.get(chave)
-        if atual is None:
-            melhor_por_chave[chave] = registro
-            continue
+    amostra = _amostra_bytes(caminho, sample_size)
 
-        if registro.ano_referencia > atual.ano_referencia:
-            melhor_por_chave[chave] = registro
+    encoding = "latin1"
+    for candidato in encodings:
+        try:
+            # final=False: um caractere multibyte cortado no fim da amostra não conta como erro.
+            codecs.getincrementaldecoder(candidato)().decode(amostra, final=False)
+        except UnicodeDecodeError:
             continue
+        encoding = candidato
+        break
 
-        if registro.ano_referencia == atual.ano_referencia and getattr(registro, "id", 0) > getattr(atual, "id", 0):
-            melhor_por_chave[chave] = registro
+    sep = kwargs.get("sep") or _inferir_separador(amostra.decode(encoding, errors="replace"))
+    return encoding, sep
 
-    return list(melhor_por_chave.values())
 
+def _ler_csv_rapido(caminho: Path, kwargs: dict, usecols=None):
+    """
+    Modo rápido: engine C, só as colunas de `usecols`, tudo como texto (a limpeza do ETL
+    trabalha sobre strings e dispensa a inferência de tipos) e arquivos compactados
+    (.gz/.bz2/.xz/.zip, detectados pela extensão) descompactados em streaming.
+    """
+    encoding, sep = _sniff_csv(caminho, kwargs)
+
+    leitura_kwargs = dict(kwargs)
+    for key in ["encoding", "sep", "usecols", "header", "sheet_name", "sample_size", "dtype", "engine"]:
+        leitura_kwargs.pop(key, None)
+
+    leitura_kwargs.update({
+        "encoding": encoding,
+        "encoding_errors": "replace",
+        "sep": sep,
+        "dtype": str,
+        "on_bad_lines": "skip",
+        "engine": "c",
+        "chunksize": CHUNK_SIZE,
+        "compression": "infer",
+    })
+    if usecols is not None:
+        leitura_kwargs["usecols"] = usecols
+
+    return pd.read_csv(caminho, **leitura_kwargs)
+
+
+def _ler_csv_flexivel(caminho: Path, kwargs: dict, usecols=None):
+    """
+    Retorna um iterador de chunks para não carregar o arquivo inteiro na memória.
+    Usa o modo rápido e, se ele falhar ao abrir ou no primeiro chunk (separador exótico,
+    arquivo malformado), volta ao modo compatível. URBIX_CSV_RAPIDO=0 força o compatível.
+    """
+    if not CSV_RAPIDO:
+        return _ler_csv_legado(caminho, kwargs, usecols)
+
+    try:
+        reader = _ler_csv_rapido(caminho, kwargs, usecols)
+        primeiro = next(reader, None)
+    except Exception as exc:
+        print(f"⚠️ {caminho.name}: leitura rápida falhou ({exc}); usando o modo compatível.")
+        return _ler_csv_legado(caminho, kwargs, usecols)
+
+    return itertools.chain([] if primeiro is None else [primeiro], reader)
+
+
+AGREGACOES = ("soma", "media", "contagem")
 
-def _salvar_lote_streaming(db_session, registros: list[ValorIndicador], id_variavel: str, origem: str):
-    if not registros:
-        return 0
 
-    registros = _deduplicar_mais_recente(registros)
+class AcumuladorMunicipal:
+    """
+    Agrega os valores de uma variável ao longo de todos os chunks de um arquivo em arrays
+    NumPy indexados pela linha do município (soma e contagem; a média sai das duas).
+    A memória é proporcional ao número de municípios, não ao tamanho do arquivo.
+    """
+
+    def __init__(self, codigos: list[str]):
+        self.codigos = pd.Index(codigos)
+        self.soma = np.zeros(len(codigos), dtype=np.float64)
+        self.contagem = np.zeros(len(codigos), dtype=np.int64)
+        # Linhas com código sem município (None ou fora do catálogo), relatadas por extrair_fonte_local.
+        self.ignorados = 0
+
+    def adicionar(self, codigos: np.ndarray, valores: np.ndarray) -> None:
+        linhas = self.codigos.get_indexer(codigos)
+        conhecidos = linhas >= 0
+        self.ignorados += int((~conhecidos).sum())
+        validos = conhecidos & ~np.isnan(valores)
+        linhas, valores = linhas[validos], valores[validos]
+        self.soma += np.bincount(linhas, weights=valores, minlength=len(self.codigos))
+        self.contagem += np.bincount(linhas, minlength=len(self.codigos))
+
+    def resultado(self, agregacao: str = "soma") -> tuple[np.ndarray, np.ndarray]:
+        """(linhas dos municípios com dado, valor agregado de cada um)."""
+        presentes = np.flatnonzero(self.contagem)
+        if agregacao == "media":
+            return presentes, self.soma[presentes] / self.contagem[presentes]
+        if agregacao == "contagem":
+            return presentes, self.contagem[presentes].astype(np.float64)
+        return presentes, self.soma[presentes]
+
+    def registros(self, id_variavel: str, ano: int, fonte: str, agregacao: str = "soma") -> list[tuple]:
+        presentes, valores = self.resultado(agregacao)
+        codigos = self.codigos[presentes]
+        return [
+            (codigo, id_variavel, ano, float(valor), fonte)
+            for codigo, valor in zip(codigos, valores.tolist())
+        ]
+
+
+def _codigos_municipios() -> list[str]:
+    """Códigos IBGE válidos (7 dígitos, sem sentinelas) do catálogo: as linhas dos acumuladores."""
+    lookup = ibge_prefix_lookup()
+    return sorted(lookup[lookup > 0].astype(str))
+
+
+def _salvar_lote_streaming(db_session, registros: list[tuple], id_variavel: str, origem: str):
+    """Upsert do lote pela chave (cidade, indicador, ano): recargas sobrescrevem em vez de duplicar."""
     if not registros:
         return 0
 
     try:
-        db_session.bulk_save_objects(registros)
+        total = gravar_valores(db_session, registros)
         db_session.commit()
-        total = len(registros)
         print(f"✅ {id_variavel}: {total} registros salvos em lote ({origem})")
         return total
     except Exception as e:
@@ -221,20 +293,7 @@ def _resolver_caminho_arquivo(arquivo: str) -> Path | None:
     return None
 
 
-def extrair_dados_locais(id_variavel: str, config: dict, db_session, ano_padrao=2024):
-    arquivo = config.get("arquivo")
-    caminho_completo = _resolver_caminho_arquivo(arquivo)
-    if not caminho_completo:
-        print(f"❌ {id_variavel}: Arquivo não encontrado -> {arquivo}")
-        return
-
-    col_codigo = config.get("coluna_codigo")
-    col_valor = config.get("coluna_valor")
-    kwargs = dict(config.get("pandas_kwargs", {}))
-
-    if not col_codigo or not col_valor or col_valor == "VERIFICAR_NO_EXCEL":
-        return
-
+def _registrar_indicador_base(id_variavel: str, db_session) -> None:
     # -------------------------------------------------------------
     # 🚀 O SEGREDO 1: Cadastra o 'numerador' como um indicador base!
     # -------------------------------------------------------------
@@ -245,93 +304,235 @@ def extrair_dados_locais(id_variavel: str, config: dict, db_session, ano_padrao=
             ON CONFLICT (id) DO NOTHING;
         """))
         db_session.commit()
+        invalidar_plano()
     except Exception:
         db_session.rollback()
 
-    print(f"🔄 Lendo {id_variavel} ({caminho_completo.name}) em streaming...")
 
-    try:
-        if caminho_completo.name.lower().endswith((".txt", ".csv", ".gz")):
-            reader = _ler_csv_flexivel(caminho_completo, kwargs)
-            chunks = reader
-            has_iterator = True
-        else:
-            df = pd.read_excel(caminho_completo, **kwargs)
-            chunks = [df]
-            has_iterator = False
+def _valores_da_coluna(chunk: pd.DataFrame, col_codigo: str, col_valor: str) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    Limpa um par de colunas do chunk já lido: (códigos IBGE normalizados, valores numéricos),
+    uma posição por linha do arquivo. Códigos sem município no catálogo vêm como None, para que
+    o acumulador os contabilize como ignorados. None se as colunas não existirem no chunk.
+    """
+    col_codigo_real = _escolher_melhor_coluna(chunk.columns, col_codigo)
+    col_valor_real = _escolher_melhor_coluna(chunk.columns, col_valor)
+    if not col_codigo_real or not col_valor_real:
+        return None
 
-        total_processado = 0
-        for chunk_num, chunk in enumerate(chunks, start=1):
-            if chunk is None or chunk.empty:
-                continue
+    df_chunk = chunk[[col_codigo_real, col_valor_real]].copy()
+    df_chunk = df_chunk.dropna(subset=[col_codigo_real, col_valor_real]).copy()
 
-            col_codigo_real = _escolher_melhor_coluna(chunk.columns, col_codigo)
-            col_valor_real = _escolher_melhor_coluna(chunk.columns, col_valor)
-            if not col_codigo_real or not col_valor_real:
-                continue
+    if df_chunk.empty:
+        return None
 
-            df_chunk = chunk[[col_codigo_real, col_valor_real]].copy()
-            df_chunk = df_chunk.dropna(subset=[col_codigo_real, col_valor_real]).copy()
+    # Dígitos, caminhos de 6/7 dígitos, catálogo e sentinelas resolvidos de uma vez para o chunk.
+    df_chunk["codigo_ibge"] = resolve_ibge_codes(df_chunk[col_codigo_real])
 
-            if df_chunk.empty:
-                continue
+    df_chunk[col_valor_real] = df_chunk[col_valor_real].astype(str).str.strip()
+    
+    # -------------------------------------------------------------
+    # 🚀 O SEGREDO 3: Tradutor Universal Qualitativo para o TOPSIS!
+    # -------------------------------------------------------------
+    mapa_quali = {
+        "Sim": "1", "Não": "0", "SIM": "1", "NÃO": "0", "NAO": "0", 
+        "sim": "1", "não": "0", "nao": "0", "S": "1", "N": "0"
+    }
+    df_chunk[col_valor_real] = df_chunk[col_valor_real].replace(mapa_quali)
 
-            df_chunk[col_codigo_real] = df_chunk[col_codigo_real].astype(str).str.replace(r"\D", "", regex=True)
-            df_chunk = df_chunk[df_chunk[col_codigo_real].str.len() >= 6].copy()
+    df_chunk["valor_numerico"] = (
+        df_chunk[col_valor_real]
+        .str.replace(r"[^0-9,.-]", "", regex=True)
+        .str.replace(".", "", regex=False)
+        .str.replace(",", ".", regex=False)
+    )
+    df_chunk["valor_numerico"] = pd.to_numeric(df_chunk["valor_numerico"], errors="coerce")
+    return df_chunk["codigo_ibge"].to_numpy(dtype=object), df_chunk["valor_numerico"].to_numpy(dtype=np.float64)
 
-            df_chunk["codigo_ibge"] = df_chunk[col_codigo_real].map(_normalizar_codigo_ibge)
-            df_chunk = df_chunk[df_chunk["codigo_ibge"].notna()].copy()
 
-            df_chunk[col_valor_real] = df_chunk[col_valor_real].astype(str).str.strip()
-            
-            # -------------------------------------------------------------
-            # 🚀 O SEGREDO 3: Tradutor Universal Qualitativo para o TOPSIS!
-            # -------------------------------------------------------------
-            mapa_quali = {
-                "Sim": "1", "Não": "0", "SIM": "1", "NÃO": "0", "NAO": "0", 
-                "sim": "1", "não": "0", "nao": "0", "S": "1", "N": "0"
-            }
-            df_chunk[col_valor_real] = df_chunk[col_valor_real].replace(mapa_quali)
-
-            df_chunk["valor_numerico"] = (
-                df_chunk[col_valor_real]
-                .str.replace(r"[^0-9,.-]", "", regex=True)
-                .str.replace(".", "", regex=False)
-                .str.replace(",", ".", regex=False)
-            )
-            df_chunk["valor_numerico"] = pd.to_numeric(df_chunk["valor_numerico"], errors="coerce")
-            df_chunk = _agrupar_valores_por_cidade(df_chunk[["codigo_ibge", "valor_numerico"]]).copy()
-            df_chunk = df_chunk.dropna(subset=["valor_numerico"]).copy()
-
-            registros_lote = []
-            for row in df_chunk.itertuples(index=False):
-                codigo_ibge = getattr(row, "codigo_ibge")
-                valor = getattr(row, "valor_numerico")
-                
-                # -------------------------------------------------------------
-                # 🚀 O SEGREDO 2: Filtra os lixos oficiais antes de salvar!
-                # -------------------------------------------------------------
-                str_codigo = str(codigo_ibge)
-                if not str_codigo or pd.isna(valor) or str_codigo in ["0999999", "9999999"] or len(str_codigo) != 7:
+def _filtro_colunas(alvos: list[str]):
+    """
+    `usecols` para o pandas: mantém toda coluna que `_escolher_melhor_coluna` poderia escolher
+    para algum alvo (nome igual ou contendo o alvo, após normalização). A escolha final sobre
+    as colunas lidas é a mesma que seria feita sobre a planilha inteira.
+    """
+    alvos_norm = {_normalizar_texto(alvo) for alvo in alvos}
+    return lambda coluna: any(alvo in _normalizar_texto(coluna) for alvo in alvos_norm)
+
+
+def _chave_fonte(config: dict) -> tuple:
+    """(arquivo, aba, cabeçalho, demais pandas_kwargs): regras com a mesma chave compartilham a leitura."""
+    kwargs = dict(config.get("pandas_kwargs", {}))
+    aba = kwargs.pop("sheet_name", 0)
+    cabecalho = kwargs.pop("header", 0)
+    return (config.get("arquivo"), aba, cabecalho, tuple(sorted((k, str(v)) for k, v in kwargs.items())))
+
+
+def regras_fontes_locais(carregadas_por_api: set[str] | frozenset[str] = frozenset()) -> dict[str, dict]:
+    """
+    {id_variavel: config} de todas as fontes locais: variáveis diretas e numeradores de
+    INDICADORES e os dados base de DADOS_BASE. Dados base em `carregadas_por_api` ficam de
+    fora: o valor da API (com o ano de referência dela) prevalece sobre a planilha.
+    """
+    regras: dict[str, dict] = {}
+    for id_variavel, config in DADOS_BASE.items():
+        if id_variavel not in carregadas_por_api:
+            regras[id_variavel] = config
+    for indicadores in INDICADORES.values():
+        for id_ind, config in indicadores.items():
+            if config["tipo_calculo"] == "direto":
+                regras[id_ind] = config["variavel_direta"]
+            else:
+                regras[f"{id_ind}_numerador"] = config["numerador"]
+    return regras
+
+
+def agrupar_fontes_locais(regras: dict[str, dict]) -> dict[tuple, dict[str, dict]]:
+    """Agrupa {id_variavel: config} por fonte, preservando a ordem de primeira aparição."""
+    grupos: dict[tuple, dict[str, dict]] = {}
+    for id_variavel, config in regras.items():
+        grupos.setdefault(_chave_fonte(config), {})[id_variavel] = config
+    return grupos
+
+
+def extrair_fonte_local(regras: dict[str, dict], db_session, ano_padrao=2024) -> float | None:
+    """
+    Lê uma única vez o arquivo/aba comum a `regras` ({id_variavel: config}) — só as colunas
+    necessárias — e distribui cada chunk para todas as variáveis que dependem dele.
+    Os valores de cada variável são agregados por município ao longo do arquivo inteiro
+    (`agregacao` da regra: "soma" — padrão —, "media" ou "contagem") e gravados de uma vez no fim.
+    Retorna o tempo gasto lendo/parseando o arquivo (None se nada foi lido).
+    """
+    config_base = next(iter(regras.values()))
+    arquivo = config_base.get("arquivo")
+    caminho_completo = _resolver_caminho_arquivo(arquivo)
+    if not caminho_completo:
+        for id_variavel in regras:
+            print(f"❌ {id_variavel}: Arquivo não encontrado -> {arquivo}")
+        return None
+
+    variaveis = {
+        id_variavel: (config.get("coluna_codigo"), config.get("coluna_valor"))
+        for id_variavel, config in regras.items()
+        if config.get("coluna_codigo") and config.get("coluna_valor") and config.get("coluna_valor") != "VERIFICAR_NO_EXCEL"
+    }
+    for id_variavel in list(variaveis):
+        agregacao = regras[id_variavel].get("agregacao", "soma")
+        if agregacao not in AGREGACOES:
+            print(f"❌ {id_variavel}: agregação desconhecida '{agregacao}' (use {', '.join(AGREGACOES)})")
+            del variaveis[id_variavel]
+    if not variaveis:
+        return None
+
+    for id_variavel in variaveis:
+        _registrar_indicador_base(id_variavel, db_session)
+
+    kwargs = dict(config_base.get("pandas_kwargs", {}))
+    colunas = _filtro_colunas([coluna for par in variaveis.values() for coluna in par])
+    print(f"🔄 Lendo {caminho_completo.name} uma vez para {len(variaveis)} variável(is): {', '.join(variaveis)}")
+
+    tempo_leitura = 0.0
+    codigos_municipios = _codigos_municipios()
+    acumuladores = {id_variavel: AcumuladorMunicipal(codigos_municipios) for id_variavel in variaveis}
+    try:
+        inicio = time.perf_counter()
+        if caminho_completo.name.lower().endswith((".txt", ".csv", ".gz")):
+            chunks = _ler_csv_flexivel(caminho_completo, kwargs, colunas)
+        else:
+            df, do_cache = ler_planilha(caminho_completo, kwargs, colunas)
+            if do_cache:
+                print(f"⚡ {caminho_completo.name}: colunas mapeadas do cache colunar (sem parse)")
+            chunks = iter([df])
+        tempo_leitura += time.perf_counter() - inicio
+
+        while True:
+            # Em CSV o parse acontece a cada chunk pedido ao reader.
+            inicio = time.perf_counter()
+            chunk = next(chunks, None)
+            tempo_leitura += time.perf_counter() - inicio
+            if chunk is None:
+                break
+            if chunk.empty:
+                continue
+
+            for id_variavel, (col_codigo, col_valor) in variaveis.items():
+                if id_variavel not in acumuladores:
                     continue
-                    
-                registros_lote.append(
-                    ValorIndicador(
-                        codigo_ibge=str_codigo,
-                        id_indicador=id_variavel,
-                        ano_referencia=ano_padrao,
-                        valor=float(valor),
-                        fonte=caminho_completo.name,
-                    )
+                try:
+                    extraido = _valores_da_coluna(chunk, col_codigo, col_valor)
+                except Exception as exc:
+                    # Uma variável com erro sai da carga inteira: soma parcial seria dado errado.
+                    print(f"❌ ERRO em {id_variavel}: {exc}")
+                    del acumuladores[id_variavel]
+                    continue
+                if extraido is not None:
+                    acumuladores[id_variavel].adicionar(*extraido)
+
+    except Exception as exc:
+        print(f"❌ ERRO lendo {caminho_completo.name} ({', '.join(variaveis)}): {exc}")
+        # Leitura interrompida: nada é gravado para não publicar agregados parciais.
+        acumuladores = {}
+
+    # Um único upsert (e um commit) por variável, com o agregado do arquivo inteiro.
+    for id_variavel in variaveis:
+        acumulador = acumuladores.get(id_variavel)
+        total = 0
+        if acumulador is not None:
+            agregacao = regras[id_variavel].get("agregacao", "soma")
+            registros = acumulador.registros(id_variavel, ano_padrao, caminho_completo.name, agregacao)
+            total = _salvar_lote_streaming(db_session, registros, id_variavel, f"{agregacao} de {caminho_completo.name}")
+            if acumulador.ignorados:
+                print(
+                    f"ℹ️ {id_variavel}: {acumulador.ignorados:,} linha(s) ignorada(s) por código sem "
+                    f"município IBGE válido (inclui sentinelas 0999999/9999999)."
                 )
+        if total == 0:
+            print(f"⚠️ {id_variavel}: nenhum registro foi processado.")
+    return tempo_leitura
 
-            total_processado += _salvar_lote_streaming(db_session, registros_lote, id_variavel, f"chunk {chunk_num}")
 
-        if total_processado == 0:
-            print(f"⚠️ {id_variavel}: nenhum registro foi processado.")
+def extrair_dados_locais(id_variavel: str, config: dict, db_session, ano_padrao=2024):
+    """Extração de uma única variável (a leitura agrupada fica em `extrair_planilhas_agrupadas`)."""
+    extrair_fonte_local({id_variavel: config}, db_session, ano_padrao)
 
-    except Exception as exc:
-        print(f"❌ ERRO em {id_variavel}: {exc}")
+
+def extrair_planilhas_agrupadas(regras: dict[str, dict], db_session, ano_padrao=2024) -> list[dict]:
+    """
+    Extrai todas as variáveis locais lendo cada fonte (arquivo, aba, cabeçalho) uma única vez.
+    Imprime e retorna o relatório por arquivo: variáveis atendidas, tempo de leitura medido e
+    leituras evitadas. A economia é uma estimativa (leituras evitadas x tempo medido da leitura
+    única): as leituras repetidas não são executadas para medir.
+    """
+    relatorio = []
+    for chave, regras_fonte in agrupar_fontes_locais(regras).items():
+        arquivo = chave[0]
+        if not arquivo or arquivo == "NÃO_BAIXADO":
+            continue
+        tempo = extrair_fonte_local(regras_fonte, db_session, ano_padrao)
+        if tempo is None:
+            continue
+        leituras_evitadas = len(regras_fonte) - 1
+        relatorio.append({
+            "arquivo": Path(arquivo).name,
+            "aba": chave[1],
+            "variaveis": len(regras_fonte),
+            "tempo_leitura_s": tempo,
+            "leituras_evitadas": leituras_evitadas,
+            "economia_estimada_s": tempo * leituras_evitadas,
+        })
+
+    if relatorio:
+        print("\n📋 Leitura de fontes locais (uma leitura por arquivo/aba/cabeçalho):")
+        for item in relatorio:
+            print(
+                f"   {item['arquivo']} [{item['aba']}]: {item['variaveis']} variável(is), "
+                f"leitura medida {item['tempo_leitura_s']:.1f}s, {item['leituras_evitadas']} leitura(s) evitada(s) "
+                f"(~{item['economia_estimada_s']:.1f}s estimados)"
+            )
+        total = sum(item["economia_estimada_s"] for item in relatorio)
+        evitadas = sum(item["leituras_evitadas"] for item in relatorio)
+        print(f"✅ {evitadas} leitura(s) de arquivo evitada(s); economia estimada de parse: ~{total:.1f}s")
+    return relatorio
 
 # ==============================================================================
 # NOVOS MOTORES HÍBRIDOS (API PÚBLICA SIDRA E SICONFI)
@@ -387,20 +588,12 @@ def extrair_dado_base_sidra(id_variavel: str, config: dict, db_session):
             except (TypeError, ValueError):
                 continue
 
-            registros_lote.append(
-                ValorIndicador(
-                    codigo_ibge=ibge_7,
-                    id_indicador=id_variavel,
-                    ano_referencia=config["ano"],
-                    valor=valor_float,
-                    fonte=config["fonte"],
-                )
-            )
+            registros_lote.append((ibge_7, id_variavel, config["ano"], valor_float, config["fonte"]))
 
         if registros_lote:
-            db_session.bulk_save_objects(registros_lote)
+            total = gravar_valores(db_session, registros_lote)
             db_session.commit()
-            print(f"✅ API {id_variavel}: {len(registros_lote)} municípios populados do IBGE!")
+            print(f"✅ API {id_variavel}: {total} municípios populados do IBGE!")
         else:
             print(f"⚠️ API {id_variavel}: nenhuma linha válida foi extraída do payload.")
 
@@ -445,13 +638,7 @@ def extrair_receita_siconfi(id_variavel: str, db_session):
                         valor = item.get("valor")
                         if valor is not None:
                             registros_lote.append(
-                                ValorIndicador(
-                                    codigo_ibge=ibge,
-                                    id_indicador=id_variavel,
-                                    ano_referencia=2023,
-                                    valor=float(valor),
-                                    fonte="API SICONFI / RREO",
-                                )
+                                (ibge, id_variavel, 2023, float(valor), "API SICONFI / RREO")
                             )
                         break
         except Exception:
@@ -465,9 +652,8 @@ def extrair_receita_siconfi(id_variavel: str, db_session):
         if len(registros_lote) >= 200:
             temp_db = SessionLocal() # Abre conexão fresca!
             try:
-                temp_db.bulk_save_objects(registros_lote)
+                total_inseridos += gravar_valores(temp_db, registros_lote)
                 temp_db.commit()
-                total_inseridos += len(registros_lote)
                 print(f"💾 Lote salvo com conexão nova! ({total_inseridos} receitas garantidas)")
             except Exception as e:
                 temp_db.rollback()
@@ -480,9 +666,8 @@ def extrair_receita_siconfi(id_variavel: str, db_session):
     if registros_lote:
         temp_db = SessionLocal()
         try:
-            temp_db.bulk_save_objects(registros_lote)
+            total_inseridos += gravar_valores(temp_db, registros_lote)
             temp_db.commit()
-            total_inseridos += len(registros_lote)
         except Exception as e:
             temp_db.rollback()
         finally:
@@ -492,70 +677,26 @@ def extrair_receita_siconfi(id_variavel: str, db_session):
 
 
 
-def atualizar_snapshot_latest(db_session):
-    """Atualiza tabela materializada com o valor mais recente por cidade + indicador."""
-    print("\n--- ATUALIZANDO SNAPSHOT DE VALORES MAIS RECENTES ---")
-    db_session.execute(text("DELETE FROM valores_indicadores_latest"))
-
-    db_session.execute(text("""
-        INSERT INTO valores_indicadores_latest (codigo_ibge, id_indicador, ano_referencia, valor, fonte, id_origem)
-        SELECT v.codigo_ibge, v.id_indicador, v.ano_referencia, v.valor, v.fonte, v.id
-        FROM valores_indicadores v
-        JOIN (
-            SELECT codigo_ibge, id_indicador, MAX(ano_referencia) AS ano_max
-            FROM valores_indicadores
-            GROUP BY codigo_ibge, id_indicador
-        ) a
-          ON v.codigo_ibge = a.codigo_ibge
-         AND v.id_indicador = a.id_indicador
-         AND v.ano_referencia = a.ano_max
-        JOIN (
-            SELECT codigo_ibge, id_indicador, ano_referencia, MAX(id) AS id_max
-            FROM valores_indicadores
-            GROUP BY codigo_ibge, id_indicador, ano_referencia
-        ) b
-          ON v.codigo_ibge = b.codigo_ibge
-         AND v.id_indicador = b.id_indicador
-         AND v.ano_referencia = b.ano_referencia
-         AND v.id = b.id_max
-    """))
-
-    db_session.commit()
-    total = db_session.execute(text("SELECT COUNT(*) FROM valores_indicadores_latest")).scalar()
-    print(f"✅ Snapshot atualizado: {total} linhas em valores_indicadores_latest")
-
-
-def deduplicar_historico_mesmo_ano(db_session):
+def atualizar_snapshot_latest(db_session, reconstruir: bool = False):
     """
-    Remove duplicatas de carga mantendo apenas a linha mais recente por
-    cidade + indicador + ano_referencia.
-    Preserva histórico anual e reduz drasticamente o custo do TOPSIS.
+    Fecha a carga do snapshot com o valor mais recente por cidade + indicador.
+    Com os triggers de manutenção incremental instalados o snapshot já está em dia;
+    a reconstrução completa só roda em reparo (`reconstruir=True`) ou sem triggers.
     """
-    print("\n--- DEDUPLICANDO HISTÓRICO (cidade+indicador+ano) ---")
-
-    total_antes = db_session.execute(text("SELECT COUNT(*) FROM valores_indicadores")).scalar() or 0
-
-    db_session.execute(text("""
-        DELETE FROM valores_indicadores
-        WHERE id IN (
-            SELECT id FROM (
-                SELECT
-                    id,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY codigo_ibge, id_indicador, ano_referencia
-                        ORDER BY id DESC
-                    ) AS rn
-                FROM valores_indicadores
-            ) t
-            WHERE t.rn > 1
-        )
-    """))
+    print("\n--- ATUALIZANDO SNAPSHOT DE VALORES MAIS RECENTES ---")
+    if reconstruir or not manutencao_incremental_ativa(db_session.connection()):
+        total = reconstruir_snapshot_latest(db_session)
+        print(f"✅ Snapshot reconstruído: {total} linhas em valores_indicadores_latest")
+    else:
+        total = db_session.execute(text("SELECT COUNT(*) FROM valores_indicadores_latest")).scalar()
+        print(f"✅ Snapshot mantido incrementalmente: {total} linhas em valores_indicadores_latest")
 
-    db_session.commit()
+    # Sinaliza à API que a matriz residente precisa ser recarregada.
+    versao = incrementar_versao_dados(db_session)
+    print(f"✅ Versão dos dados: {versao}")
 
-    total_depois = db_session.execute(text("SELECT COUNT(*) FROM valores_indicadores")).scalar() or 0
-    removidos = max(0, total_antes - total_depois)
-    print(f"✅ Deduplicação concluída: removidos={removidos} | antes={total_antes} | depois={total_depois}")
+    # Um vetor denso por município, na versão recém-publicada (fonte primária dos rankings).
+    materializar_vetores(db_session, versao)
 
 
 def run():
@@ -573,6 +714,14 @@ def run():
 
     db = SessionLocal()
 
+    # Chave única (cidade, indicador, ano): as cargas fazem upsert e dispensam deduplicação posterior.
+    garantir_indice_unico(db)
+
+    # Snapshot de valores mais recentes mantido por triggers a cada lote inserido.
+    if instalar_manutencao_snapshot(engine):
+        total = reconstruir_snapshot_latest(db)
+        print(f"✅ Manutenção incremental do snapshot instalada ({total} linhas sincronizadas).")
+
     print("ℹ️ Cadastrando indicadores base no banco de dados...")
     try:
         db.execute(text("""
@@ -585,6 +734,7 @@ def run():
             ON CONFLICT (id) DO NOTHING;
         """))
         db.commit()
+        invalidar_plano()
         print("✅ Indicadores base cadastrados com sucesso!")
     except Exception as e:
         db.rollback()
@@ -614,16 +764,14 @@ def run():
     db = SessionLocal()     # Abre uma conexão novinha em folha!
 
     print("\n--- EXTRAINDO PLANILHAS LOCAIS COMPLEXAS (STREAMING POR CHUNKS) ---")
-    for dominio, indicadores in INDICADORES.items():
-        for id_ind, regras in indicadores.items():
-            if regras["tipo_calculo"] == "direto":
-                extrair_dados_locais(id_ind, regras["variavel_direta"], db)
-            else:
-                extrair_dados_locais(f"{id_ind}_numerador", regras["numerador"], db)
+    # Cada arquivo/aba é lido uma única vez para todas as variáveis (INDICADORES e DADOS_BASE) que dependem dele.
+    extrair_planilhas_agrupadas(regras_fontes_locais(set(apis_ibge)), db)
 
-    deduplicar_historico_mesmo_ano(db)
     atualizar_snapshot_latest(db)
 
+    print("\n--- MATERIALIZANDO RANKINGS NACIONAL E ESTADUAIS ---")
+    materializar_rankings(db)
+
     db.close()
     print("\n🎉 ETL FINALIZADO COM SUCESSO!")
 
@@ -0,0 +1,27 @@
+from pathlib import Path
+import sys
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.database import SessionLocal, Base, engine
+from app.services.rankings_materializados import materializar_rankings
+
+
+def run():
+    print("=" * 70)
+    print("🏆 MATERIALIZAÇÃO DOS RANKINGS TOPSIS (NACIONAL + UFs)")
+    print("=" * 70)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        totais = materializar_rankings(db)
+        for escopo, total in sorted(totais.items()):
+            print(f"   {escopo}: {total} municípios")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run()
@@ -7,7 +7,9 @@ backend_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(backend_dir))
 
 from app.database import SessionLocal, Base, engine
-from tools.local_etl_service import deduplicar_historico_mesmo_ano, atualizar_snapshot_latest
+from app.services.armazenamento_valores import armazenamento_codificado
+from app.services.carga_valores import garantir_indice_unico
+from tools.local_etl_service import atualizar_snapshot_latest
 
 
 def run():
@@ -19,14 +21,15 @@ def run():
     db = SessionLocal()
     try:
         print("\n--- CRIANDO ÍNDICES DE APOIO ---")
-        db.execute(text("CREATE INDEX IF NOT EXISTS ix_vi_cidade_indicador_ano_id ON valores_indicadores (codigo_ibge, id_indicador, ano_referencia DESC, id DESC)"))
-        db.execute(text("CREATE INDEX IF NOT EXISTS ix_vi_cidade_indicador ON valores_indicadores (codigo_ibge, id_indicador)"))
+        if not armazenamento_codificado(db.connection()):
+            db.execute(text("CREATE INDEX IF NOT EXISTS ix_vi_cidade_indicador_ano_id ON valores_indicadores (codigo_ibge, id_indicador, ano_referencia DESC, id DESC)"))
         db.execute(text("CREATE INDEX IF NOT EXISTS ix_municipios_nome ON municipios (nome)"))
         db.execute(text("CREATE INDEX IF NOT EXISTS ix_municipios_estado ON municipios (estado)"))
         db.commit()
         print("✅ Índices criados/confirmados")
 
-        deduplicar_historico_mesmo_ano(db)
+        # Deduplicação única de bases antigas + índice único (cidade, indicador, ano).
+        garantir_indice_unico(db)
         atualizar_snapshot_latest(db)
 
         total = db.execute(text("SELECT COUNT(*) FROM valores_indicadores")).scalar() or 0
@@ -13,6 +13,7 @@ sys.path.insert(0, str(backend_dir))
 
 from app.database import SessionLocal
 from app.models import ValorIndicador, Municipio
+from app.services.carga_valores import gravar_valores
 import requests
 
 db = SessionLocal()
@@ -36,7 +37,7 @@ try:
     data = r.json()
     print(f"Received {len(data)} items")
     
-    loaded = 0
+    linhas = []
     for item in data:
         try:
             cod = item.get("D2C") or item.get("D1C", "")
@@ -57,19 +58,12 @@ try:
             
             val = float(val_str.replace(".", "").replace(",", "."))
             
-            vi = ValorIndicador(
-                codigo_ibge=cod,
-                id_indicador="total_domicilios",
-                valor=val,
-                ano_referencia=2022,
-                fonte="SIDRA Censo (9922)"
-            )
-            db.add(vi)
-            loaded += 1
+            linhas.append((cod, "total_domicilios", 2022, val, "SIDRA Censo (9922)"))
             
         except:
             pass
     
+    loaded = gravar_valores(db, linhas)
     db.commit()
     print(f"Loaded: {loaded} records")
     
@@ -8,6 +8,8 @@ from sqlalchemy.orm import Session
 from app.database import SessionLocal, Base, engine
 from app.etl_config import INDICADORES
 from app.models import Indicador, Municipio
+from app.services.busca_municipios import reconstruir_busca_municipios
+from app.services.plano_indicadores import invalidar_plano
 
 BACKEND_DIR = Path(__file__).resolve().parent.parent
 CATALOG_PATH = BACKEND_DIR / "app" / "data" / "ibge_catalog.json"
@@ -77,6 +79,10 @@ def seed_municipios(db_session: Session) -> int:
                 db_session.add(municipio)
 
     db_session.commit()
+
+    # Índice FTS5 da busca (SQLite): garante a tabela e a repopula a partir de `municipios`.
+    reconstruir_busca_municipios(db_session.connection())
+    db_session.commit()
     return inserted
 
 
@@ -119,6 +125,7 @@ def seed_indicadores(db_session: Session) -> int:
                 db_session.add(existing)
 
     db_session.commit()
+    invalidar_plano()
     return inserted
 
 
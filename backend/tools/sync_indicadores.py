@@ -7,6 +7,7 @@ sys.path.append(str(backend_dir))
 
 from app.database import SessionLocal
 from app.etl_config import INDICADORES
+from app.services.plano_indicadores import invalidar_plano
 from sqlalchemy import text
 
 def run():
@@ -31,6 +32,7 @@ def run():
                 print(f"Erro ao inserir {id_ind}: {e}")
                 
     db.close()
+    invalidar_plano()
     print("✅ Catálogo sincronizado! O motor TOPSIS agora enxerga 100% dos indicadores.")
 
 if __name__ == "__main__":
@@ -39,7 +39,7 @@ from datetime import datetime, timedelta
 BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
 sys.path.insert(0, str(BACKEND_DIR))
 
-from app.services.ibge_catalog import build_municipality_options
+from app.services.ibge_catalog import build_municipality_options, resolve_ibge_codes
 
 # Diretórios
 DATA_PLANILHAS_DIR = BACKEND_DIR / "data" / "planilhas"
@@ -182,31 +182,6 @@ logger.info(f"   - APIs: Portal Transparência (CAGED), DATASUS (SIM), etc.")
 # FUNÇÕES UTILITÁRIAS
 # ============================================================================
 
-def normalize_municipio_code(code: Any) -> str:
-    """
-    Normaliza código de município para string de 7 dígitos.
-    
-    Args:
-        code: Código como string, int ou float
-        
-    Returns:
-        String de 7 dígitos ou vazio se inválido
-    """
-    try:
-        # Converter para string
-        if isinstance(code, float):
-            code = int(code)
-        code_str = str(code).strip()
-        
-        # Remover zeros à esquerda e repadronizar
-        code_int = int(code_str)
-        normalized = str(code_int).zfill(7)
-        
-        return normalized if len(normalized) == 7 else ""
-    except (ValueError, TypeError):
-        return ""
-
-
 def is_valid_city(codigo_ibge: str) -> bool:
     """Verifica se o código do município é válido (7 dígitos) - QUALQUER município brasileiro."""
     if not codigo_ibge or len(codigo_ibge) != 7:
@@ -288,10 +263,9 @@ class DataProcessor:
             chunks_densidades = {}  # Dict[codigo_ibge] -> list[densidade]
             
             for chunk in pd.read_csv(csv_path, sep=";", chunksize=10000, dtype={"Código IBGE": str}):
-                for _, row in chunk.iterrows():
+                codigos = resolve_ibge_codes(chunk.get("Código IBGE", [""] * len(chunk)))
+                for (_, row), codigo in zip(chunk.iterrows(), codigos):
                     try:
-                        codigo = normalize_municipio_code(row.get("Código IBGE", ""))
-                        
                         if not codigo or not is_valid_city(codigo):
                             continue
                         
@@ -407,10 +381,9 @@ class DataProcessor:
                 
                 # Extrair dados por município
                 count = 0
-                for _, row in df_data.iterrows():
+                codigos = resolve_ibge_codes(df_data[col_codigo])
+                for (_, row), codigo in zip(df_data.iterrows(), codigos):
                     try:
-                        codigo = normalize_municipio_code(row.get(col_codigo, ""))
-                        
                         if not codigo or not is_valid_city(codigo):
                             continue
                         
@@ -728,10 +701,9 @@ class DataProcessor:
                 
                 # Extrair dados
                 count = 0
-                for _, row in df.iterrows():
+                codigos = resolve_ibge_codes(df[col_codigo])
+                for (_, row), codigo in zip(df.iterrows(), codigos):
                     try:
-                        codigo = normalize_municipio_code(row.get(col_codigo, ""))
-                        
                         if not codigo or not is_valid_city(codigo):
                             continue
                         